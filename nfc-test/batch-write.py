@@ -0,0 +1,64 @@
+import argparse
+import json
+
+from batch import BatchProvisioner, format_for_path, parse_payloads
+from detect import open_detector
+from framing import FORMAT_FRAMED, FORMATS
+from journal import WriteJournal
+from reader import open_gpio, open_pn532
+from status_led import StatusLed
+
+LED_PIN = 17  # GPIO pin connected to LED
+
+parser = argparse.ArgumentParser(description="Write a list of hex payloads to successive NFC tags")
+parser.add_argument("payloads", help="CSV, JSONL or one-hex-string-per-line file")
+parser.add_argument("--format", choices=FORMATS, default=FORMAT_FRAMED,
+                    help="How each payload is laid out on the tag, as in write-pk.py (default: framed)")
+parser.add_argument("--progress", help="Progress file (default: <payloads>.progress.json)")
+parser.add_argument("--journal", help="Write journal for interrupted tags (default: <payloads>.journal.json)")
+args = parser.parse_args()
+
+with open(args.payloads) as f:
+    hex_payloads = parse_payloads(f.read(), format_for_path(args.payloads))
+
+try:
+    batch = BatchProvisioner(hex_payloads, args.progress or args.payloads + ".progress.json", fmt=args.format)
+except ValueError as e:
+    print(f"Error: {e}")
+    exit(1)
+
+# Initialize the PN532 (I2C, or the simulator with NFC_BACKEND=sim)
+pn532 = open_pn532()
+
+GPIO = open_gpio()
+GPIO.setmode(GPIO.BCM)  # Use BCM GPIO numbering
+GPIO.setup(LED_PIN, GPIO.OUT)  # Set pin as output
+
+# Heartbeat while idle, solid while a tag is handled, blink codes for the outcome
+led = StatusLed(GPIO, LED_PIN)
+
+# Wait for tags on the PN532 IRQ line when NFC_IRQ_PIN is set, polling otherwise
+detector = open_detector(pn532, GPIO)
+
+# Get firmware version
+ic, ver, rev, support = pn532.firmware_version
+print(f"Found PN532 with firmware version: {ver}.{rev}")
+
+# Configure PN532 to read RFID/NFC tags
+pn532.SAM_configuration()
+
+# Confirmed pages of an interrupted tag, kept across restarts like the batch progress
+journal = WriteJournal(args.journal or args.payloads + ".journal.json")
+
+print(f"Loaded {len(batch.payloads)} payloads. Present tags one after another...")
+
+try:
+    while not batch.finished:
+        batch.provision_next(pn532, detector, journal, timeout=1.0, led=led.set)
+except KeyboardInterrupt:
+    print("\nStopped, progress saved.")
+finally:
+    led.stop()
+    GPIO.cleanup()
+
+print(json.dumps(batch.report(), indent=2))
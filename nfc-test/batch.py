@@ -0,0 +1,223 @@
+"""Batch provisioning: write a list of payloads to successive tags.
+
+Used by batch-write.py and the /batch endpoints in main.py. Each payload
+goes to the next tag presented whose UID has not been provisioned yet, so
+there is no removal wait or pause between tags: the operator swapping
+tags is the only thing the line waits for. Progress is saved after every
+tag so a restarted batch with the same payloads carries on where it
+stopped.
+"""
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+
+from framing import FORMAT_FRAMED, FORMATS, encode
+from journal import journaled_write
+from metrics import percentiles
+from ntag import USER_START_PAGE
+from status_led import BUSY, ERROR, SUCCESS
+from tagid import MAX_USER_BYTES, TagIdentifier
+
+log = logging.getLogger(__name__)
+
+
+def parse_payloads(text, fmt="lines"):
+    """Parse hex payloads from CSV, JSONL or one-per-line text.
+
+    CSV uses a hex_string column if there is a header with one, otherwise
+    the first column. JSONL lines are objects with a hex_string field or
+    bare JSON strings. Returns a list of hex strings.
+    """
+    if fmt == "csv":
+        rows = [row for row in csv.reader(io.StringIO(text)) if row]
+        if rows and "hex_string" in rows[0]:
+            column = rows[0].index("hex_string")
+            rows = rows[1:]
+        else:
+            column = 0
+        return [row[column].strip() for row in rows]
+    if fmt == "jsonl":
+        payloads = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            payloads.append(item["hex_string"] if isinstance(item, dict) else item)
+        return payloads
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def format_for_path(path):
+    """Guess the payload format from a file extension"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    return "lines"
+
+
+class BatchProvisioner:
+    """Hand out payloads to new tags in order and keep the tally"""
+
+    def __init__(self, hex_payloads, progress_path=None, tag_ids=None, fmt=FORMAT_FRAMED):
+        """Raises ValueError if a payload is empty, not valid hex or too long for any tag as fmt
+
+        Every payload is encoded as fmt (see framing.FORMATS), like /write-pk.
+
+        tag_ids is the TagIdentifier to share with other readers of the
+        same tags; the batch keeps its own by default.
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown payload format {fmt!r}, expected one of {', '.join(FORMATS)}")
+        self.payloads = []
+        for index, hex_string in enumerate(hex_payloads):
+            if not hex_string:
+                raise ValueError(f"Payload {index} is empty")
+            try:
+                data = bytes.fromhex(hex_string)
+            except ValueError as e:
+                raise ValueError(f"Payload {index} is not valid hex: {e}")
+            # Length header / NDEF TLV, padded to whole pages
+            try:
+                encoded = encode(data, fmt)
+            except ValueError as e:
+                raise ValueError(f"Payload {index}: {e}")
+            if len(encoded) > MAX_USER_BYTES:
+                raise ValueError(f"Payload {index} takes {len(encoded)} bytes as {fmt}, "
+                                 f"more than any supported tag holds ({MAX_USER_BYTES} bytes)")
+            self.payloads.append(encoded)
+
+        self._progress_path = progress_path
+        self._tag_ids = tag_ids or TagIdentifier()
+        self._rejected = {}  # uid -> payload index it was turned away for
+        self._digest = hashlib.sha256(b"".join(
+            len(p).to_bytes(2, "big") + p for p in self.payloads)).hexdigest()
+        self.next_index = 0
+        self.done = {}  # uid -> payload index
+        self.failures = []
+        self.latencies = []  # Seconds from tag detection to verified write
+        self.started_at = time.time()
+        self.finished_at = None
+        self._load()
+
+    @property
+    def finished(self):
+        return self.next_index >= len(self.payloads)
+
+    def provision_next(self, pn532, detector, journal, timeout, led=None):
+        """Wait up to timeout seconds for an unprovisioned tag and write the next payload.
+
+        Tags are waited for with detector (a detect.TagDetector on pn532),
+        on the IRQ line when it has one. Tags already in the batch are
+        ignored while they stay on the reader. A tag that is not
+        NTAG/Ultralight or too small for the payload is counted as a
+        failure without being written, and ignored until the next payload
+        is up. led(state) is called with status_led states (BUSY, then
+        SUCCESS or ERROR). Returns the UID hex of the tag handled, or None.
+        """
+        deadline = time.monotonic() + timeout
+        while not self.finished:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            target = detector.wait(remaining)
+            if not target:
+                continue
+            uid = target.uid
+            uid_hex = uid.hex().upper()
+            index = self.next_index
+            if uid_hex in self.done or self._rejected.get(uid_hex) == index:
+                # Nothing to do until it is swapped for the next tag
+                detector.wait_removed(target, timeout=max(0.0, deadline - time.monotonic()))
+                continue
+
+            start = time.perf_counter()
+            if led:
+                led(BUSY)
+            try:
+                info = self._tag_ids.identify(pn532, target)
+                if info.family not in ("ntag", "ultralight"):
+                    self._rejected[uid_hex] = index
+                    raise ValueError(f"{info.tag_type} is not supported, only NTAG2xx/Ultralight tags are")
+                if len(self.payloads[index]) > info.user_bytes:
+                    self._rejected[uid_hex] = index
+                    raise ValueError(f"{len(self.payloads[index])} bytes do not fit the "
+                                     f"{info.user_bytes} bytes of user memory on this {info.tag_type}")
+                journaled_write(pn532, journal, uid, USER_START_PAGE, self.payloads[index])
+            except Exception as e:
+                # The payload stays queued; a tag that was written to resumes it when presented again
+                self.failures.append({"uid": uid_hex, "index": index, "error": str(e), "timestamp": time.time()})
+                log.warning("Payload %d failed on %s: %s", index, uid_hex, e)
+                if led:
+                    led(ERROR)
+                self.save()
+                return uid_hex
+            if led:
+                led(SUCCESS)
+
+            self.latencies.append(time.perf_counter() - start)
+            self.done[uid_hex] = index
+            self.next_index += 1
+            if self.finished:
+                self.finished_at = time.time()
+            log.info("Payload %d written to %s (%d/%d)", index, uid_hex, self.next_index, len(self.payloads))
+            self.save()
+            return uid_hex
+        return None
+
+    def report(self):
+        end = self.finished_at or time.time()
+        elapsed_minutes = (end - self.started_at) / 60
+        latency = {k: round(v, 4) if v is not None else None for k, v in percentiles(self.latencies).items()}
+        return {
+            "total": len(self.payloads),
+            "written": len(self.done),
+            "remaining": len(self.payloads) - self.next_index,
+            "finished": self.finished,
+            "failures": len(self.failures),
+            "recent_failures": self.failures[-10:],
+            "tags_per_minute": round(len(self.latencies) / elapsed_minutes, 2) if elapsed_minutes > 0 else 0.0,
+            "latency_seconds": latency,
+        }
+
+    def save(self):
+        if not self._progress_path:
+            return
+        state = {
+            "digest": self._digest,
+            "next_index": self.next_index,
+            "done": self.done,
+            "failures": self.failures,
+            "latencies": self.latencies,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        tmp_path = self._progress_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._progress_path)
+
+    def _load(self):
+        if not self._progress_path or not os.path.exists(self._progress_path):
+            return
+        try:
+            with open(self._progress_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable batch progress %s: %s", self._progress_path, e)
+            return
+        # Progress only carries over to the exact same payload list
+        if state.get("digest") != self._digest:
+            return
+        self.next_index = state["next_index"]
+        self.done = state["done"]
+        self.failures = state["failures"]
+        self.latencies = state["latencies"]
+        self.started_at = state["started_at"]
+        self.finished_at = state["finished_at"]
+        log.info("Resuming batch at payload %d/%d", self.next_index, len(self.payloads))
@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from metrics import percentiles
+
+# End-to-end /read-pk and /write-pk benchmark: drives the FastAPI app from
+# main.py in-process (no uvicorn, no network) against the simulated PN532,
+# so the numbers include the hardware worker queue, tag identification,
+# framing and the simulated I2C frame timing. Results are printed (or
+# written with --out) as JSON so runs can be compared across commits.
+
+parser = argparse.ArgumentParser(description="Benchmark the REST API against the simulated PN532")
+parser.add_argument("--readers", default="1", help="Simulated reader counts; clients are spread over the readers")
+parser.add_argument("--clients", default="1,4,16", help="Concurrent client counts")
+parser.add_argument("--sizes", default="4,64,144,504,888", help="Payload sizes in bytes (up to 888)")
+parser.add_argument("--read-ratios", default="1.0,0.9,0.5,0.0", help="Fraction of requests that are reads")
+parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+parser.add_argument("--frame-latency", type=float, default=0.003, help="Simulated seconds per PN532 frame")
+parser.add_argument("--byte-latency", type=float, default=0.00009, help="Simulated seconds per byte on the bus")
+parser.add_argument("--tracker", action="store_true",
+                    help="Run the presence tracker, so reads of an unchanged tag come from the cache")
+parser.add_argument("--seed", type=int, default=1)
+parser.add_argument("--out", help="Write the JSON report here instead of stdout")
+args = parser.parse_args()
+
+reader_counts = [int(n) for n in args.readers.split(",")]
+
+# The simulated readers have to be configured before main.py creates its pool
+os.environ["NFC_BACKEND"] = "sim"
+os.environ["NFC_READERS"] = ",".join(f"sim{i}=sim:tags=ntag216" for i in range(max(reader_counts)))
+os.environ["NFC_SIM_FRAME_LATENCY"] = str(args.frame_latency)
+os.environ["NFC_SIM_BYTE_LATENCY"] = str(args.byte_latency)
+os.environ["NFC_SIM_SEED"] = str(args.seed)
+# Logging per request (main.py, and httpx at INFO) would be timed along with it
+os.environ.setdefault("NFC_LOG_LEVEL", "WARNING")
+
+# main.py logs every block it reads or writes; keep that off the JSON on stdout
+quiet = contextlib.redirect_stdout(open(os.devnull, "w"))
+
+import httpx  # noqa: E402
+
+with quiet:
+    import main  # noqa: E402
+from framing import FRAME_HEADER_SIZE  # noqa: E402
+from journal import WriteJournal  # noqa: E402
+from simulator import make_tag  # noqa: E402
+
+# Keep benchmark writes out of the real journal file
+main.write_journal = WriteJournal()
+sims = [slot.pn532.driver for slot in main.pool]
+rng = random.Random(args.seed)
+TAG_BYTES = 888  # NTAG216 user memory
+
+
+def make_payloads(size):
+    """Two payloads of the given size that differ in every page, so diff writes always write"""
+    a = bytes(rng.randrange(1, 256) for _ in range(size))
+    b = bytes((x % 255) + 1 for x in a)
+    # A payload too big for the 4-byte length header falls back to the raw layout
+    fmt = "framed" if size + FRAME_HEADER_SIZE <= TAG_BYTES else "raw"
+    return [a.hex(), b.hex()], fmt
+
+
+async def run_scenario(client, readers, clients, size, read_ratio):
+    payloads, fmt = make_payloads(size)
+    names = [slot.name for slot in list(main.pool)[:readers]]
+    # Fresh tags holding the first payload, then a clean cache and counters
+    for name, sim in zip(names, sims):
+        sim.present(make_tag("ntag216:04" + "%012X" % rng.randrange(1 << 48)))
+        response = await client.post("/write-pk", params={"reader": name},
+                                     json={"hex_string": payloads[0], "format": fmt})
+        response.raise_for_status()
+        main.tag_cache.invalidate(sim.field[0].uid.hex().upper())
+
+    ops = ["read" if rng.random() < read_ratio else "write" for _ in range(args.requests)]
+    latencies = {"read": [], "write": []}
+    errors = {}
+    next_op = 0
+    writes = {name: 0 for name in names}
+
+    async def worker(name):
+        nonlocal next_op
+        while next_op < len(ops):
+            op = ops[next_op]
+            next_op += 1
+            start = time.perf_counter()
+            if op == "read":
+                response = await client.get("/read-pk", params={"reader": name})
+            else:
+                # Alternate per reader, so every write changes the tag
+                writes[name] += 1
+                body = {"hex_string": payloads[writes[name] % 2], "format": fmt}
+                response = await client.post("/write-pk", params={"reader": name}, json=body)
+            elapsed = time.perf_counter() - start
+            if response.status_code == 200:
+                latencies[op].append(elapsed * 1000)
+            else:
+                errors[response.status_code] = errors.get(response.status_code, 0) + 1
+
+    frames_before = sum(sim.frames for sim in sims)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(names[i % readers]) for i in range(clients)))
+    wall = time.perf_counter() - start
+    frames = sum(sim.frames for sim in sims) - frames_before
+
+    every = latencies["read"] + latencies["write"]
+    return {
+        "readers": readers,
+        "clients": clients,
+        "size": size,
+        "format": fmt,
+        "read_ratio": read_ratio,
+        "requests": len(ops),
+        "ok": len(every),
+        "errors": errors,
+        "seconds": round(wall, 3),
+        "req_per_s": round(len(every) / wall, 2) if wall else None,
+        "frames_per_op": round(frames / len(ops), 2),
+        "latency_ms": {
+            "all": {k: v and round(v, 2) for k, v in percentiles(every).items()},
+            "read": {k: v and round(v, 2) for k, v in percentiles(latencies["read"]).items()},
+            "write": {k: v and round(v, 2) for k, v in percentiles(latencies["write"]).items()},
+        },
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+async def run():
+    main.pool.start()
+    if args.tracker:
+        for slot in main.pool:
+            slot.tracker.start()
+    results = []
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for readers in reader_counts:
+                for clients in [int(c) for c in args.clients.split(",")]:
+                    for size in [int(s) for s in args.sizes.split(",")]:
+                        for read_ratio in [float(r) for r in args.read_ratios.split(",")]:
+                            result = await run_scenario(client, readers, clients, size, read_ratio)
+                            print(f"readers={readers:<2} clients={clients:<3} size={size:<4} reads={read_ratio:<4} "
+                                  f"{result['req_per_s']} req/s p50={result['latency_ms']['all']['p50']} ms "
+                                  f"frames/op={result['frames_per_op']}", file=sys.stderr)
+                            results.append(result)
+    finally:
+        if args.tracker:
+            for slot in main.pool:
+                await slot.tracker.stop()
+        main.pool.stop()
+    return results
+
+
+report = {
+    "commit": git_commit(),
+    "config": {
+        "requests": args.requests,
+        "frame_latency": args.frame_latency,
+        "byte_latency": args.byte_latency,
+        "tracker": args.tracker,
+        "seed": args.seed,
+    },
+}
+with quiet:
+    report["results"] = asyncio.run(run())
+
+if args.out:
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}", file=sys.stderr)
+else:
+    print(json.dumps(report, indent=2))
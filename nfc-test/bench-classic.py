@@ -0,0 +1,66 @@
+import argparse
+import time
+
+from classic import KeyCache, authenticate_sector, load_key_file, read_sector
+from reader import open_pn532
+from tagid import identify, select_target
+
+# Full Mifare Classic dump with a cold key cache (dictionary order, as
+# read.py used to do) and then a warm one (keys learned by the cold run).
+
+parser = argparse.ArgumentParser(description="Benchmark Mifare Classic dumps with cold and warm key caches")
+parser.add_argument("--keys", help="Extra Mifare Classic keys, one 12-digit hex key per line")
+parser.add_argument("--rounds", type=int, default=3, help="Warm runs to average")
+args = parser.parse_args()
+
+# Initialize the PN532 (I2C, or the simulator with NFC_BACKEND=sim)
+pn532 = open_pn532()
+
+# Get firmware version
+ic, ver, rev, support = pn532.firmware_version
+print(f"Found PN532 with firmware version: {ver}.{rev}")
+
+# Configure PN532 to read RFID/NFC tags
+pn532.SAM_configuration()
+
+def dump(uid, num_sectors, family, key_cache):
+    """Authenticate and read every sector, return (seconds, auth attempts, sectors read)"""
+    pn532.read_passive_target(timeout=0.5)
+    start = time.perf_counter()
+    attempts = 0
+    opened = 0
+    for sector in range(num_sectors):
+        key, key_type, tries = authenticate_sector(pn532, uid, sector, family, key_cache)
+        attempts += tries
+        if key is not None:
+            opened += 1
+            read_sector(pn532, sector)
+    return time.perf_counter() - start, attempts, opened
+
+print("Place a Mifare Classic card on the reader...")
+target = None
+while not target:
+    target = select_target(pn532, timeout=0.5)
+uid = target.uid
+print(f"Found NFC card with UID: {uid.hex().upper()}")
+
+info = identify(pn532, target)
+if info.family != "classic":
+    print(f"{info.tag_type} is not a Mifare Classic card")
+    exit(1)
+num_sectors = info.sectors
+family = info.key_family
+
+# In-memory cache so earlier runs of read.py do not warm the cold run
+key_cache = KeyCache()
+if args.keys:
+    key_cache.add_keys(load_key_file(args.keys))
+
+cold = dump(uid, num_sectors, family, key_cache)
+warm = [dump(uid, num_sectors, family, key_cache) for _ in range(args.rounds)]
+
+print(f"\n{family}, {num_sectors} sectors")
+print(f"{'cache':>6} {'seconds':>9} {'auths':>6} {'sectors':>8}")
+print(f"{'cold':>6} {cold[0]:>9.3f} {cold[1]:>6} {cold[2]:>8}")
+print(f"{'warm':>6} {sum(r[0] for r in warm) / len(warm):>9.3f} "
+      f"{sum(r[1] for r in warm) // len(warm):>6} {warm[-1][2]:>8}")
@@ -0,0 +1,132 @@
+import argparse
+import random
+import threading
+import time
+
+from detect import TagDetector
+from metrics import percentiles
+from simulator import SimulatedGPIO, SimulatedPN532, make_tag
+
+# Tag detection by polling vs. on the PN532 IRQ line, against the
+# simulator: CPU time and bus traffic while no tag is present, then the
+# delay between a tag entering the field and wait() returning it. The
+# simulator models the driver's 10 ms status-byte polling, so bus reads
+# count what a real I2C PN532 would see; CPU times are those of this
+# process and only comparable with each other.
+#
+# Then tag swaps: the time from lifting a tag to the scripts being ready
+# for the next one, with the old removal loop (read_passive_target every
+# 0.2 s, then a 1 s pause) and with TagDetector.wait_removed().
+
+parser = argparse.ArgumentParser(description="Compare tag detection and removal checks on the simulated PN532")
+parser.add_argument("--idle", type=float, default=5.0, help="Seconds to measure with no tag present")
+parser.add_argument("--trials", type=int, default=20, help="Tag arrivals to time per mode")
+parser.add_argument("--frame-latency", type=float, default=0.003, help="Simulated seconds per PN532 frame")
+parser.add_argument("--byte-latency", type=float, default=0.00009, help="Simulated seconds per byte on the bus")
+parser.add_argument("--seed", type=int, default=1)
+args = parser.parse_args()
+
+IRQ_PIN = 25
+rng = random.Random(args.seed)
+
+
+def make_detector(mode):
+    sim = SimulatedPN532(frame_latency=args.frame_latency, byte_latency=args.byte_latency, seed=args.seed)
+    detector = TagDetector(sim)
+    if mode == "irq":
+        gpio = SimulatedGPIO()
+        sim.attach_irq(gpio, IRQ_PIN)
+        detector.enable_irq(gpio, IRQ_PIN)
+    return sim, detector
+
+
+def idle(mode):
+    """CPU seconds per second and bus reads per second with an empty field"""
+    sim, detector = make_detector(mode)
+    before = sim.stats()
+    cpu = time.process_time()
+    start = time.monotonic()
+    while time.monotonic() - start < args.idle:
+        # The scripts' loop: wait half a second, go round again
+        detector.wait(timeout=0.5)
+    wall = time.monotonic() - start
+    cpu = time.process_time() - cpu
+    after = sim.stats()
+    return {
+        "cpu_percent": round(100 * cpu / wall, 2),
+        "frames_per_s": round((after["frames"] - before["frames"]) / wall, 1),
+        "status_reads_per_s": round((after["status_reads"] - before["status_reads"]) / wall, 1),
+    }
+
+
+def detection_latency(mode):
+    """Milliseconds from a tag arriving to wait() returning it"""
+    sim, detector = make_detector(mode)
+    latencies = []
+    for _ in range(args.trials):
+        sim.remove()
+        arrived = []
+
+        def arrive():
+            arrived.append(time.perf_counter())
+            sim.present(make_tag("ntag215", rng))
+
+        timer = threading.Timer(rng.uniform(0.1, 0.6), arrive)
+        timer.start()
+        target = None
+        while not target:
+            target = detector.wait(timeout=0.5)
+        latencies.append((time.perf_counter() - arrived[0]) * 1000)
+        timer.join()
+    return {k: v and round(v, 1) for k, v in percentiles(latencies).items()}
+
+
+def legacy_wait_removed(sim):
+    # The removal loop write.py, write-pk.py, read-pk.py and tag-info.py used to have
+    while True:
+        if not sim.read_passive_target(timeout=0.5):
+            time.sleep(1)
+            break
+        time.sleep(0.2)
+
+
+def swap_to_ready(method):
+    """Milliseconds from a tag leaving the field to the removal wait returning"""
+    sim, detector = make_detector("poll")
+    latencies = []
+    frames = []
+    for _ in range(args.trials):
+        sim.present(make_tag("ntag215", rng))
+        detector.wait(timeout=0.5)
+        removed = []
+
+        def lift():
+            removed.append(time.perf_counter())
+            sim.remove()
+
+        timer = threading.Timer(rng.uniform(0.1, 0.6), lift)
+        before = sim.frames
+        timer.start()
+        if method == "before":
+            legacy_wait_removed(sim)
+        else:
+            detector.wait_removed()
+        latencies.append((time.perf_counter() - removed[0]) * 1000)
+        frames.append(sim.frames - before)
+        timer.join()
+    result = {k: v and round(v, 1) for k, v in percentiles(latencies).items()}
+    result["frames"] = round(sum(frames) / len(frames), 1)
+    return result
+
+
+print(f"{'mode':>5} {'idle CPU %':>11} {'frames/s':>9} {'status reads/s':>15} {'latency p50':>12} {'p95':>7}")
+for mode in ("poll", "irq"):
+    quiet = idle(mode)
+    latency = detection_latency(mode)
+    print(f"{mode:>5} {quiet['cpu_percent']:>11} {quiet['frames_per_s']:>9} {quiet['status_reads_per_s']:>15} "
+          f"{latency['p50']:>9} ms {latency['p95']:>4} ms")
+
+print(f"\n{'removal':>7} {'swap-to-ready p50':>18} {'p95':>9} {'frames':>7}")
+for method in ("before", "after"):
+    swap = swap_to_ready(method)
+    print(f"{method:>7} {swap['p50']:>15} ms {swap['p95']:>6} ms {swap['frames']:>7}")
@@ -0,0 +1,71 @@
+import time
+
+from ntag import PAGE_SIZE, USER_START_PAGE, read_pages
+from reader import open_pn532
+
+# Compare per-page ntag2xx_read_block reads against bulk FAST_READ reads.
+# 64 bytes is what /read-pk reads, 144 bytes is a full NTAG213 and
+# 888 bytes a full NTAG216. Sizes beyond the presented tag will come back short.
+SIZES = [64, 144, 888]
+ROUNDS = 5
+
+# Initialize the PN532 (I2C, or the simulator with NFC_BACKEND=sim)
+pn532 = open_pn532()
+
+# Get firmware version
+ic, ver, rev, support = pn532.firmware_version
+print(f"Found PN532 with firmware version: {ver}.{rev}")
+
+# Configure PN532 to read RFID/NFC tags
+pn532.SAM_configuration()
+
+# Count every command frame sent to the PN532
+frames = 0
+_call_function = pn532.call_function
+
+def counting_call_function(*args, **kwargs):
+    global frames
+    frames += 1
+    return _call_function(*args, **kwargs)
+
+pn532.call_function = counting_call_function
+
+def read_per_page(num_pages):
+    """Baseline: one ntag2xx_read_block call per page"""
+    data = bytearray()
+    for block_num in range(USER_START_PAGE, USER_START_PAGE + num_pages):
+        block_data = pn532.ntag2xx_read_block(block_num)
+        if not block_data:
+            break
+        data.extend(block_data)
+    return data
+
+def measure(read_fn, num_pages):
+    """Return (frames per read, best wall-clock seconds, bytes read)"""
+    global frames
+    best = None
+    for _ in range(ROUNDS):
+        # Re-select first, a read past the end of the tag leaves it halted
+        pn532.read_passive_target(timeout=0.5)
+        frames = 0
+        start = time.perf_counter()
+        data = read_fn(num_pages)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return frames, best, len(data)
+
+print("Place an NTAG216 (or the largest tag available) on the reader...")
+uid = None
+while not uid:
+    uid = pn532.read_passive_target(timeout=0.5)
+print(f"Found NFC card with UID: {uid.hex().upper()}")
+
+print(f"\n{'bytes':>6} {'method':>9} {'frames':>7} {'ms':>9} {'read':>6}")
+for size in SIZES:
+    num_pages = size // PAGE_SIZE
+    for name, fn in [
+        ("per-page", read_per_page),
+        ("bulk", lambda n: read_pages(pn532, USER_START_PAGE, n)),
+    ]:
+        count, elapsed, got = measure(fn, num_pages)
+        print(f"{size:>6} {name:>9} {count:>7} {elapsed * 1000:>9.1f} {got:>6}")
@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import base64
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+# Serialization overhead per request: /read-pk and /write-pk (hex string in
+# JSON) against /read-pk/raw and /write-pk/raw (application/octet-stream),
+# driven in-process like bench-api.py. The simulated PN532 runs with no
+# frame or byte latency and reads are answered from the presence tracker's
+# cache, so what is left is the HTTP/JSON handling on each side. A second
+# table times just the encode/decode steps, without the app.
+
+parser = argparse.ArgumentParser(description="Compare hex/JSON and octet-stream request overhead")
+parser.add_argument("--sizes", default="4,64,144,504,888", help="Payload sizes in bytes (up to 888)")
+parser.add_argument("--requests", type=int, default=300, help="Requests per endpoint and size")
+parser.add_argument("--loops", type=int, default=20000, help="Iterations per encode/decode microbenchmark")
+parser.add_argument("--seed", type=int, default=1)
+parser.add_argument("--out", help="Write the JSON report here instead of stdout")
+args = parser.parse_args()
+
+# The simulated reader has to be configured before main.py creates its pool
+os.environ["NFC_BACKEND"] = "sim"
+os.environ["NFC_READERS"] = "sim0=sim:tags=ntag216"
+os.environ["NFC_SIM_FRAME_LATENCY"] = "0"
+os.environ["NFC_SIM_BYTE_LATENCY"] = "0"
+os.environ["NFC_SIM_SEED"] = str(args.seed)
+# Logging per request (main.py, and httpx at INFO) would be timed along with it
+os.environ.setdefault("NFC_LOG_LEVEL", "WARNING")
+
+# main.py logs every write; keep that off the JSON on stdout
+quiet = contextlib.redirect_stdout(open(os.devnull, "w"))
+
+import httpx  # noqa: E402
+
+with quiet:
+    import main  # noqa: E402
+from journal import WriteJournal  # noqa: E402
+
+# Keep benchmark writes out of the real journal file
+main.write_journal = WriteJournal()
+slot = main.pool.default
+rng = random.Random(args.seed)
+
+
+def make_payloads(size):
+    """Two raw payloads of the given size that differ in every page, so diff writes always write"""
+    a = bytes(rng.randrange(1, 256) for _ in range(size))
+    b = bytes((x % 255) + 1 for x in a)
+    return [a, b]
+
+
+async def timed(requests, send):
+    """Mean microseconds per request and bytes on the wire (request + response body) of the last one"""
+    start = time.perf_counter()
+    for i in range(requests):
+        response = await send(i)
+        response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    wire = len(response.request.content) + len(response.content)
+    return round(elapsed / requests * 1e6, 1), wire
+
+
+async def run_size(client, size):
+    payloads = make_payloads(size)
+    hex_payloads = [p.hex() for p in payloads]
+
+    async def write_hex(i):
+        return await client.post("/write-pk", json={"hex_string": hex_payloads[i % 2], "format": "raw"})
+
+    async def write_raw(i):
+        return await client.post("/write-pk/raw", params={"format": "raw"}, content=payloads[i % 2],
+                                 headers={"Content-Type": "application/octet-stream"})
+
+    async def read_hex(i):
+        return await client.get("/read-pk")
+
+    async def read_raw(i):
+        return await client.get("/read-pk/raw")
+
+    result = {"size": size}
+    result["write_hex_us"], result["write_hex_wire"] = await timed(args.requests, write_hex)
+    result["write_raw_us"], result["write_raw_wire"] = await timed(args.requests, write_raw)
+    # Reads of the unchanged tag come from the tracker's cache once it has seen the last write
+    await client.get("/read-pk")
+    result["read_hex_us"], result["read_hex_wire"] = await timed(args.requests, read_hex)
+    result["read_raw_us"], result["read_raw_wire"] = await timed(args.requests, read_raw)
+    return result
+
+
+def microbench(size):
+    """Encode/decode cost of the payload alone, in microseconds"""
+    payload = make_payloads(size)[0]
+    hex_body = json.dumps({"hex_data": payload.hex()}).encode()
+    b64_body = json.dumps({"data": base64.b64encode(payload).decode()}).encode()
+
+    def per_call(fn):
+        start = time.perf_counter()
+        for _ in range(args.loops):
+            fn()
+        return round((time.perf_counter() - start) / args.loops * 1e6, 3)
+
+    return {
+        "size": size,
+        "hex_json_encode_us": per_call(lambda: json.dumps({"hex_data": payload.hex()}).encode()),
+        "hex_json_decode_us": per_call(lambda: bytes.fromhex(json.loads(hex_body)["hex_data"])),
+        "base64_json_encode_us": per_call(lambda: json.dumps({"data": base64.b64encode(payload).decode()}).encode()),
+        "base64_json_decode_us": per_call(lambda: base64.b64decode(json.loads(b64_body)["data"])),
+        "raw_us": per_call(lambda: bytes(payload)),
+        "hex_json_bytes": len(hex_body),
+        "base64_json_bytes": len(b64_body),
+        "raw_bytes": len(payload),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+async def run():
+    main.pool.start()
+    slot.tracker.start()
+    results = []
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for size in [int(s) for s in args.sizes.split(",")]:
+                result = await run_size(client, size)
+                print(f"size={size:<4} write hex={result['write_hex_us']} us raw={result['write_raw_us']} us  "
+                      f"read hex={result['read_hex_us']} us raw={result['read_raw_us']} us  "
+                      f"wire read {result['read_hex_wire']} -> {result['read_raw_wire']} bytes", file=sys.stderr)
+                results.append(result)
+    finally:
+        await slot.tracker.stop()
+        main.pool.stop()
+    return results
+
+
+report = {
+    "commit": git_commit(),
+    "config": {
+        "requests": args.requests,
+        "loops": args.loops,
+        "seed": args.seed,
+    },
+}
+with quiet:
+    report["requests"] = asyncio.run(run())
+report["encoding"] = [microbench(int(s)) for s in args.sizes.split(",")]
+
+if args.out:
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}", file=sys.stderr)
+else:
+    print(json.dumps(report, indent=2))
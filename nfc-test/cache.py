@@ -0,0 +1,58 @@
+"""UID-keyed cache of tag contents for main.py.
+
+The presence tracker fills it as soon as a tag enters the field, so a
+/read-pk for a tag that is already on the reader skips the RF round-trips.
+Entries are dropped when they expire, when the tag is written or removed,
+and least-recently-used first once the cache is full.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TagCache:
+    """LRU cache with a per-entry TTL, safe to share between threads"""
+
+    def __init__(self, max_entries=256, ttl=30.0):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._entries = OrderedDict()  # uid -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, uid):
+        """Return the cached value for uid, or None"""
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(uid)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[uid]
+            self.misses += 1
+            return None
+
+    def put(self, uid, value):
+        with self._lock:
+            self._entries[uid] = (time.monotonic() + self._ttl, value)
+            self._entries.move_to_end(uid)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, uid):
+        with self._lock:
+            self._entries.pop(uid, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self._max_entries,
+                "ttl_seconds": self._ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
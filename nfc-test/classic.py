@@ -0,0 +1,170 @@
+"""Mifare Classic sector authentication and reads.
+
+Shared by read.py and bench-classic.py. KeyCache remembers which key and
+key type opened each sector of each card, and how often every key worked
+per card family, so later reads try the likely key first instead of
+walking the whole dictionary. A failed authentication halts the card, so
+it is re-selected before the next attempt.
+"""
+import json
+import os
+import threading
+
+KEY_A = 0x60
+KEY_B = 0x61
+
+# Default keys for Mifare Classic authentication
+# Many Mifare Classic cards use these default keys
+DEFAULT_KEYS = [
+    [0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF],  # Factory default key
+    [0xA0, 0xA1, 0xA2, 0xA3, 0xA4, 0xA5],  # Common alternative key
+    [0xD3, 0xF7, 0xD3, 0xF7, 0xD3, 0xF7],  # Another common key
+    [0x00, 0x00, 0x00, 0x00, 0x00, 0x00]   # All zeros key
+]
+
+
+def sector_layout(sector):
+    """Return (first_block, blocks_in_sector) for a sector"""
+    if sector < 32:
+        # First 32 sectors have 4 blocks each
+        return sector * 4, 4
+    # Last 8 sectors have 16 blocks each (Mifare Classic 4K only)
+    return 128 + (sector - 32) * 16, 16
+
+
+def load_key_file(path):
+    """Load a key dictionary: one 12-digit hex key per line, '#' starts a comment"""
+    keys = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            try:
+                key = bytes.fromhex(line)
+            except ValueError:
+                key = b""
+            if len(key) != 6:
+                raise ValueError(f"{path}:{line_number}: expected a 6-byte hex key, got {line!r}")
+            keys.append(list(key))
+    return keys
+
+
+def format_key(key, key_type):
+    return ("A: " if key_type == KEY_A else "B: ") + " ".join(f"{k:02x}" for k in key)
+
+
+class KeyCache:
+    """Working keys per UID/sector and key success counts per card family"""
+
+    def __init__(self, path=None, keys=None, max_uids=1000):
+        self._path = path
+        self._max_uids = max_uids
+        self._lock = threading.Lock()
+        self.keys = [list(k) for k in (keys or DEFAULT_KEYS)]
+        self._sectors = {}  # uid hex -> {sector: [key hex, key type]}
+        self._family_hits = {}  # family -> {"<type>:<key hex>": count}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    state = json.load(f)
+                self._sectors = state.get("sectors", {})
+                self._family_hits = state.get("families", {})
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable key cache {path}: {e}")
+
+    def add_keys(self, keys):
+        """Append extra dictionary keys, skipping ones already known"""
+        for key in keys:
+            if list(key) not in self.keys:
+                self.keys.append(list(key))
+
+    def candidates(self, uid, sector, family):
+        """(key, key_type) pairs to try for a sector, most likely first"""
+        uid_hex = uid.hex().upper()
+        ordered = []
+        with self._lock:
+            sectors = self._sectors.get(uid_hex, {})
+            # 1. The key that opened this exact sector before
+            if str(sector) in sectors:
+                ordered.append(tuple(sectors[str(sector)]))
+            # 2. Keys that opened other sectors of the same card
+            ordered.extend(tuple(v) for v in sectors.values())
+            # 3. Keys that worked most often on this card family
+            hits = self._family_hits.get(family, {})
+            for entry, _ in sorted(hits.items(), key=lambda item: -item[1]):
+                key_type, key_hex = entry.split(":")
+                ordered.append((key_hex, int(key_type)))
+        # 4. The rest of the dictionary, key A then key B for each key
+        for key in self.keys:
+            ordered.append((bytes(key).hex(), KEY_A))
+            ordered.append((bytes(key).hex(), KEY_B))
+
+        seen = set()
+        result = []
+        for key_hex, key_type in ordered:
+            if (key_hex, key_type) in seen:
+                continue
+            seen.add((key_hex, key_type))
+            result.append((list(bytes.fromhex(key_hex)), key_type))
+        return result
+
+    def record_success(self, uid, sector, family, key, key_type):
+        uid_hex = uid.hex().upper()
+        key_hex = bytes(key).hex()
+        with self._lock:
+            sectors = self._sectors.pop(uid_hex, {})
+            sectors[str(sector)] = [key_hex, key_type]
+            self._sectors[uid_hex] = sectors  # Re-insert as most recently used
+            while len(self._sectors) > self._max_uids:
+                del self._sectors[next(iter(self._sectors))]
+            hits = self._family_hits.setdefault(family, {})
+            entry = f"{key_type}:{key_hex}"
+            hits[entry] = hits.get(entry, 0) + 1
+
+    def save(self):
+        if not self._path:
+            return
+        with self._lock:
+            snapshot = json.dumps({"sectors": self._sectors, "families": self._family_hits})
+        tmp_path = self._path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(snapshot)
+        os.replace(tmp_path, self._path)
+
+
+def authenticate_sector(pn532, uid, sector, family, key_cache):
+    """Try candidate keys until one opens the sector.
+
+    Returns (key, key_type, attempts); key is None if no key worked or the
+    card left the field.
+    """
+    first_block, _ = sector_layout(sector)
+    attempts = 0
+    for key, key_type in key_cache.candidates(uid, sector, family):
+        attempts += 1
+        try:
+            if pn532.mifare_classic_authenticate_block(uid, first_block, key_type, key):
+                key_cache.record_success(uid, sector, family, key, key_type)
+                return key, key_type, attempts
+        except Exception:
+            pass
+        # A failed authentication halts the card, select it again before the next key
+        if pn532.read_passive_target(timeout=0.1) != uid:
+            break
+    return None, None, attempts
+
+
+def read_sector(pn532, sector):
+    """Read the data blocks of an authenticated sector (skipping the trailer)
+
+    Returns a list of (block, data or None).
+    """
+    first_block, blocks_in_sector = sector_layout(sector)
+    blocks = []
+    for block in range(first_block, first_block + blocks_in_sector - 1):
+        try:
+            blocks.append((block, pn532.mifare_classic_read_block(block)))
+        except Exception:
+            blocks.append((block, None))
+    return blocks
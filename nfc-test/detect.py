@@ -0,0 +1,202 @@
+"""Waiting for a tag: on the PN532 IRQ line when it is wired up, else by polling.
+
+Polling sends InListPassiveTarget with a short timeout over and over, so
+the driver keeps reading the I2C status byte every 10 ms and the Pi never
+idles. With an IRQ pin the detector sends InListPassiveTarget once,
+sleeps until the PN532 pulls IRQ low (it does that when a tag has been
+found and the response is ready) and only then reads the response:
+
+    detector = TagDetector(pn532)
+    detector.enable_irq(GPIO, 25)  # BCM pin wired to the PN532 IRQ output
+    target = detector.wait(timeout=10)
+
+The IRQ pin comes from NFC_IRQ_PIN (open_detector, for the scripts), or
+irq=<pin> per reader in NFC_READERS (main.py). Without one, or without
+GPIO, wait() polls exactly like the scripts used to. The simulator
+drives a simulated IRQ line (see simulator.SimulatedPN532.attach_irq), so
+both modes run without a Pi.
+
+Removal is checked without re-running anticollision: still_present()
+READs page 0 of the selected NTAG/Ultralight (one short frame, and the
+page starts with the UID), and only re-selects when that fails, so
+wait_removed() notices a lifted tag within a few tens of milliseconds.
+"""
+import logging
+import os
+import threading
+import time
+
+from ntag import read_four_pages
+from reader import IRQ_ENV, ReaderUnavailableError
+from rfconfig import RFSettings, apply_rf_settings, load_rf_settings, set_rf_field
+from tagid import MAX_TARGETS, BusyError, TargetView, parse_targets, select_target, select_targets
+
+_COMMAND_INLISTPASSIVETARGET = 0x4A
+_MIFARE_ISO14443A = 0x00
+# ACK frame; sent by the host it aborts the command the PN532 is working on
+_ACK = b"\x00\x00\xff\x00\xff\x00"
+
+# How long a re-select may take to confirm a tag is gone
+_RESELECT_TIMEOUT = 0.05
+
+log = logging.getLogger(__name__)
+
+
+def still_present(pn532, target):
+    """Whether target is still in the field; one READ frame while it is"""
+    if target.sak == 0x00:
+        # Type 2 tags: page 0 starts with UID0-2 and can always be read
+        try:
+            page0 = read_four_pages(pn532 if target.tg == 1 else TargetView(pn532, target), 0)
+        except BusyError:
+            page0 = None
+        if page0 is not None and page0[:3] == bytes(target.uid[:3]):
+            return True
+    # A failed READ halts the tag and Classic cards refuse unauthenticated
+    # READs, so the answer comes from selecting it again
+    again = select_target(pn532, timeout=_RESELECT_TIMEOUT)
+    return again is not None and bytes(again.uid) == bytes(target.uid)
+
+
+def open_detector(pn532, gpio=None):
+    """TagDetector on the NFC_IRQ_PIN line when it is set (and GPIO is there), polling otherwise
+
+    Also sends the RF settings from NFC_RF_CONFIG / NFC_RF_* to the PN532.
+    """
+    settings = load_rf_settings()
+    apply_rf_settings(pn532, settings)
+    detector = TagDetector(pn532, settings)
+    pin = os.environ.get(IRQ_ENV, "").strip()
+    if pin and gpio is not None:
+        detector.enable_irq(gpio, int(pin))
+    return detector
+
+
+class TagDetector:
+    """wait() for tags with IRQ wake-ups when enabled, polling otherwise"""
+
+    def __init__(self, pn532, settings=None):
+        self._pn532 = pn532
+        self.settings = settings or RFSettings()  # poll_timeout, poll_interval, field_off_idle
+        self._gpio = None
+        self._pin = None
+        self._ready = threading.Event()
+        self.wakeups = 0  # IRQ edges seen
+        self.polls = 0  # InListPassiveTarget frames sent while polling
+        self.last = None  # The last target wait() found, checked by still_present()
+
+    @property
+    def mode(self):
+        return "irq" if self._pin is not None else "poll"
+
+    def enable_irq(self, gpio, pin):
+        """Watch pin for the PN532 pulling IRQ low; returns False if the GPIO library cannot"""
+        try:
+            gpio.setup(pin, gpio.IN, pull_up_down=gpio.PUD_UP)
+            gpio.add_event_detect(pin, gpio.FALLING, callback=self._on_irq)
+        except (AttributeError, RuntimeError, ValueError) as e:
+            log.warning("IRQ on GPIO %s unavailable (%s), polling for tags", pin, e)
+            return False
+        self._gpio = gpio
+        self._pin = pin
+        return True
+
+    def disable_irq(self):
+        if self._pin is None:
+            return
+        try:
+            self._gpio.remove_event_detect(self._pin)
+        except (AttributeError, RuntimeError, ValueError):
+            pass
+        self._gpio = None
+        self._pin = None
+
+    def _on_irq(self, channel):
+        # Runs on the GPIO library's callback thread
+        self.wakeups += 1
+        self._ready.set()
+
+    def wait(self, timeout, max_targets=1):
+        """The first tag found within timeout seconds as a tagid.Target, or None"""
+        targets = self.wait_all(timeout, max_targets)
+        return targets[0] if targets else None
+
+    def wait_all(self, timeout, max_targets=MAX_TARGETS):
+        """Up to max_targets tags found within timeout seconds, as a list of Targets"""
+        if self._pin is None:
+            targets = self._poll(timeout, max_targets)
+        else:
+            targets = self._wait_irq(timeout, max_targets)
+        if targets:
+            self.last = targets[0]
+        return targets
+
+    def still_present(self, target=None):
+        """Whether target (by default the last one found) is still in the field"""
+        target = target or self.last
+        return target is not None and still_present(self._pn532, target)
+
+    def wait_removed(self, target=None, interval=0.02, timeout=None):
+        """Block until target (by default the last one found) has left the field
+
+        Returns the seconds waited, or None if it was still there at timeout.
+        """
+        target = target or self.last
+        start = time.monotonic()
+        while target is not None and still_present(self._pn532, target):
+            if timeout is not None and time.monotonic() - start >= timeout:
+                return None
+            time.sleep(interval)
+        if target is self.last:
+            self.last = None
+        return time.monotonic() - start
+
+    def _poll(self, timeout, max_targets):
+        settings = self.settings
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            self.polls += 1
+            targets = select_targets(self._pn532, max_targets,
+                                     timeout=max(0.01, min(settings.poll_timeout, remaining)))
+            if targets or deadline - time.monotonic() <= settings.poll_interval:
+                return targets
+            if settings.field_off_idle:
+                # Nothing in the field: save power until the next poll switches it back on
+                set_rf_field(self._pn532, False)
+            time.sleep(settings.poll_interval)
+
+    def _wait_irq(self, timeout, max_targets):
+        deadline = time.monotonic() + timeout
+        while True:
+            self._ready.clear()
+            try:
+                if not self._pn532.send_command(
+                        _COMMAND_INLISTPASSIVETARGET, params=[min(max_targets, MAX_TARGETS), _MIFARE_ISO14443A]):
+                    return []
+                # The ACK also pulls IRQ low; only the edge of the response counts
+                self._ready.clear()
+                remaining = deadline - time.monotonic()
+                if self._gpio.input(self._pin) != self._gpio.LOW and not self._ready.wait(max(0.0, remaining)):
+                    self._abort()
+                    return []
+                response = self._pn532.process_response(
+                    _COMMAND_INLISTPASSIVETARGET, response_length=64, timeout=0.5)
+            except BusyError:
+                return []
+            targets = parse_targets(response)
+            # With a finite MxRtyPassiveActivation the PN532 also answers "no tag"; arm it again
+            if targets or deadline - time.monotonic() <= 0:
+                return targets
+            if self.settings.field_off_idle:
+                set_rf_field(self._pn532, False)
+            time.sleep(min(self.settings.poll_interval, max(0.0, deadline - time.monotonic())))
+
+    def _abort(self):
+        # Stop the pending InListPassiveTarget so the next command is not refused
+        driver = getattr(self._pn532, "driver", self._pn532)
+        try:
+            driver._write_data(bytearray(_ACK))
+        except (OSError, RuntimeError) as e:
+            # A raw driver call, so ManagedReader does not map the error itself
+            raise ReaderUnavailableError(f"NFC reader I/O error: {e}") from e
@@ -0,0 +1,316 @@
+"""How a payload is laid out in NTAG user memory (from page 4).
+
+Four formats are understood:
+
+- framed: one 4-byte header page [0xF7, codec, length (2 bytes, big
+  endian)] followed by exactly length bytes. Binary safe, 4 bytes overhead.
+- compressed: framed, with the body deflated when that saves at least
+  one page. The codec byte says how (CODEC_DEFLATE, or CODEC_DEFLATE_DICT
+  against a preset dictionary), length is the stored size. Bodies that
+  do not shrink are stored with CODEC_RAW, i.e. plain framed.
+- ndef: an NDEF message TLV holding one MIME record of type
+  application/octet-stream, readable by phones. Binary safe.
+- raw: the original layout, the bytes themselves padded with zeros. The
+  end is guessed from the first all-zero page, so payloads containing
+  four aligned zero bytes or ending in zeros do not round-trip.
+
+read_payload fetches the first pages, works out the format and the exact
+stored length from the header, then bulk-reads only the remaining bytes.
+Compressed bodies are inflated there, so callers get the payload back. A
+tag that stops answering before the stored length is read raises
+IncompleteReadError rather than returning part of the payload.
+
+The preset dictionary holds strings our structured payloads share, which
+lets short JSON/URL payloads compress too. NFC_COMPRESS_DICT names a file
+to use instead; it has to be the same wherever the tags are read. With a
+different one, CODEC_DEFLATE_DICT payloads inflate to the wrong bytes or
+fail with PayloadDecodeError; raw deflate has no checksum to tell.
+"""
+import os
+import zlib
+
+from ntag import PAGE_SIZE, USER_START_PAGE, read_pages
+
+FORMAT_RAW = "raw"
+FORMAT_FRAMED = "framed"
+FORMAT_NDEF = "ndef"
+FORMAT_COMPRESSED = "compressed"
+FORMATS = (FORMAT_FRAMED, FORMAT_COMPRESSED, FORMAT_NDEF, FORMAT_RAW)
+
+FRAME_MAGIC = 0xF7
+FRAME_HEADER_SIZE = 4
+CODEC_RAW = 0x00
+CODEC_DEFLATE = 0x01  # Raw deflate stream, no zlib header or checksum
+CODEC_DEFLATE_DICT = 0x02  # Raw deflate against DICTIONARY
+CODECS = {CODEC_RAW, CODEC_DEFLATE, CODEC_DEFLATE_DICT}
+
+# Largest payload a compressed frame may inflate to, same as a framed one
+MAX_EXPANDED_SIZE = 0xFFFF
+
+DICTIONARY_ENV = "NFC_COMPRESS_DICT"
+# Deflate matches against the end of the dictionary first, so the most
+# common strings go last
+DEFAULT_DICTIONARY = (
+    b'https://www.http://.html.json.com/id=&type=version'
+    b'"created":"2025-01-01T00:00:00Z","updated":"serial":"batch":"owner":"location":'
+    b'"url":"https://","data":{"count":0,"value":"","status":"ok","true,false,null,'
+    b'{"id":"","type":"","name":"'
+)
+
+_TLV_NULL = 0x00
+_TLV_NDEF = 0x03
+_TLV_TERMINATOR = 0xFE
+_TNF_MIME = 0x02
+NDEF_MIME_TYPE = b"application/octet-stream"
+
+# First read covers the header and most small payloads in one exchange
+_HEADER_PAGES = 4
+# Raw payloads are read in chunks until the first empty page
+_RAW_CHUNK_PAGES = 16
+
+
+class IncompleteReadError(RuntimeError):
+    """The header declared more bytes than the tag returned before it stopped answering"""
+
+    def __init__(self, message, read_bytes, total_bytes):
+        super().__init__(message)
+        self.read_bytes = read_bytes
+        self.total_bytes = total_bytes
+
+
+class PayloadDecodeError(ValueError):
+    """The frame header parsed, but its body does not inflate"""
+
+
+def load_dictionary(path=None):
+    """Preset dictionary from path or NFC_COMPRESS_DICT, DEFAULT_DICTIONARY otherwise"""
+    path = path or os.environ.get(DICTIONARY_ENV)
+    if not path:
+        return DEFAULT_DICTIONARY
+    with open(path, "rb") as f:
+        # Deflate only looks back 32 KiB
+        return f.read()[-32768:]
+
+
+DICTIONARY = load_dictionary()
+
+
+def pad(data):
+    """Pad to a whole number of pages"""
+    if len(data) % PAGE_SIZE:
+        data = data + b'\x00' * (PAGE_SIZE - len(data) % PAGE_SIZE)
+    return data
+
+
+def encode_framed(payload, codec=CODEC_RAW):
+    if len(payload) > 0xFFFF:
+        raise ValueError(f"Payload of {len(payload)} bytes is too long to frame")
+    return pad(bytes([FRAME_MAGIC, codec]) + len(payload).to_bytes(2, "big") + payload)
+
+
+def _deflate(payload, dictionary=None):
+    if dictionary:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15, 9, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15, 9)
+    return compressor.compress(payload) + compressor.flush()
+
+
+def compress(payload, dictionary=None):
+    """Pick the codec that stores payload in the fewest pages.
+
+    Returns (codec, body). Compression has to save at least one page,
+    otherwise the payload is kept as is with CODEC_RAW, which is also
+    quicker to read back.
+    """
+    dictionary = DICTIONARY if dictionary is None else dictionary
+    best_codec, best_body = CODEC_RAW, payload
+    candidates = [(CODEC_DEFLATE, None)]
+    if dictionary:
+        candidates.append((CODEC_DEFLATE_DICT, dictionary))
+    for codec, zdict in candidates:
+        body = _deflate(payload, zdict)
+        if len(pad(body)) < len(pad(best_body)):
+            best_codec, best_body = codec, body
+    return best_codec, best_body
+
+
+def decompress(codec, body, dictionary=None):
+    """Inverse of compress; raises ValueError for a corrupt or oversized body"""
+    if codec == CODEC_RAW:
+        return bytes(body)
+    if codec == CODEC_DEFLATE_DICT:
+        dictionary = DICTIONARY if dictionary is None else dictionary
+        inflater = zlib.decompressobj(-15, zdict=dictionary)
+    elif codec == CODEC_DEFLATE:
+        inflater = zlib.decompressobj(-15)
+    else:
+        raise ValueError(f"Unknown codec 0x{codec:02X}")
+    try:
+        payload = inflater.decompress(bytes(body), MAX_EXPANDED_SIZE)
+    except zlib.error as e:
+        raise ValueError(f"Corrupt compressed payload: {e}")
+    if not inflater.eof or inflater.unconsumed_tail:
+        raise ValueError("Compressed payload is truncated or inflates past the maximum size")
+    return payload
+
+
+def encode_ndef(payload, mime_type=NDEF_MIME_TYPE):
+    """One-record NDEF message in an NDEF TLV, followed by a terminator TLV"""
+    short = len(payload) < 256
+    # MB | ME | SR (short record) | TNF
+    header = 0x80 | 0x40 | (0x10 if short else 0) | _TNF_MIME
+    length = bytes([len(payload)]) if short else len(payload).to_bytes(4, "big")
+    message = bytes([header, len(mime_type)]) + length + mime_type + payload
+
+    if len(message) < 0xFF:
+        tlv = bytes([_TLV_NDEF, len(message)])
+    else:
+        tlv = bytes([_TLV_NDEF, 0xFF]) + len(message).to_bytes(2, "big")
+    return pad(tlv + message + bytes([_TLV_TERMINATOR]))
+
+
+def encode(payload, fmt=FORMAT_FRAMED):
+    """Lay out payload for writing from page 4, padded to whole pages"""
+    if fmt == FORMAT_FRAMED:
+        return encode_framed(payload)
+    if fmt == FORMAT_COMPRESSED:
+        if len(payload) > MAX_EXPANDED_SIZE:
+            raise ValueError(f"Payload of {len(payload)} bytes is too long to compress")
+        codec, body = compress(payload)
+        return encode_framed(body, codec)
+    if fmt == FORMAT_NDEF:
+        return encode_ndef(payload)
+    if fmt == FORMAT_RAW:
+        return pad(payload)
+    raise ValueError(f"Unknown payload format {fmt!r}, expected one of {', '.join(FORMATS)}")
+
+
+def parse_header(head, capacity):
+    """Work out the format and total stored size from the first bytes.
+
+    Returns (fmt, total_bytes, start, length) where the payload (or NDEF
+    message) is head[start:start + length]; for raw, total_bytes and
+    length are None because the end is not known up front.
+    """
+    if len(head) >= FRAME_HEADER_SIZE and head[0] == FRAME_MAGIC and head[1] in CODECS:
+        length = int.from_bytes(head[2:4], "big")
+        if FRAME_HEADER_SIZE + length <= capacity:
+            return FORMAT_FRAMED, FRAME_HEADER_SIZE + length, FRAME_HEADER_SIZE, length
+
+    # Walk TLVs: NULL TLVs are skipped, lock/memory control TLVs have a length
+    pos = 0
+    while pos < len(head):
+        tag = head[pos]
+        if tag == _TLV_NULL:
+            pos += 1
+            continue
+        if pos + 1 >= len(head):
+            break
+        if head[pos + 1] == 0xFF:
+            if pos + 4 > len(head):
+                break
+            length = int.from_bytes(head[pos + 2:pos + 4], "big")
+            start = pos + 4
+        else:
+            length = head[pos + 1]
+            start = pos + 2
+        if tag == _TLV_NDEF:
+            if length and start + length <= capacity:
+                return FORMAT_NDEF, start + length, start, length
+            break
+        if tag in (0x01, 0x02):
+            pos = start + length
+            continue
+        break
+
+    return FORMAT_RAW, None, 0, None
+
+
+def decode_ndef_message(message):
+    """Payload of the first record of an NDEF message
+
+    Raises ValueError if the record structure does not add up.
+    """
+    if len(message) < 3:
+        raise ValueError("NDEF message too short")
+    header = message[0]
+    type_length = message[1]
+    pos = 2
+    if header & 0x10:
+        payload_length = message[pos]
+        pos += 1
+    else:
+        payload_length = int.from_bytes(message[pos:pos + 4], "big")
+        pos += 4
+    if header & 0x08:
+        # Skip the ID length byte and the ID itself
+        id_length = message[pos]
+        pos += 1
+    else:
+        id_length = 0
+    pos += type_length + id_length
+    if pos + payload_length > len(message):
+        raise ValueError("NDEF record runs past the end of the message")
+    return bytes(message[pos:pos + payload_length])
+
+
+def _has_empty_page(data):
+    return any(data[o:o + PAGE_SIZE] == b'\x00' * PAGE_SIZE for o in range(0, len(data), PAGE_SIZE))
+
+
+def decode_raw(data):
+    """Legacy layout: up to the first all-zero page, trailing zeros stripped"""
+    end = len(data)
+    for offset in range(0, len(data), PAGE_SIZE):
+        if data[offset:offset + PAGE_SIZE] == b'\x00' * PAGE_SIZE:
+            end = offset
+            break
+    return bytes(data[:end]).rstrip(b'\x00')
+
+
+def read_payload(pn532, user_pages):
+    """Read and decode the payload of the selected tag.
+
+    Returns (payload, fmt, page_data) where page_data is everything read
+    from page 4 onwards. Raises IncompleteReadError if the tag stops
+    answering before the length its header declares has been read, and
+    PayloadDecodeError if a compressed body does not inflate.
+    """
+    capacity = user_pages * PAGE_SIZE
+    data = read_pages(pn532, USER_START_PAGE, min(_HEADER_PAGES, user_pages))
+    fmt, total, start, length = parse_header(data, capacity)
+
+    if fmt != FORMAT_RAW:
+        # Exactly the declared length, nothing more
+        needed_pages = -(-total // PAGE_SIZE)
+        read_so_far = len(data) // PAGE_SIZE
+        if needed_pages > read_so_far:
+            data += read_pages(pn532, USER_START_PAGE + read_so_far, needed_pages - read_so_far)
+        if len(data) < total:
+            raise IncompleteReadError(
+                f"Tag stopped answering after {len(data)} of the {total} bytes its {fmt} header declares",
+                len(data), total)
+        body = data[start:start + length]
+        if fmt == FORMAT_FRAMED:
+            if data[1] == CODEC_RAW:
+                return bytes(body), fmt, data
+            try:
+                return decompress(data[1], body), FORMAT_COMPRESSED, data
+            except ValueError as e:
+                # Corrupt, cut short, or deflated against a different NFC_COMPRESS_DICT
+                raise PayloadDecodeError(str(e))
+        try:
+            return decode_ndef_message(body), fmt, data
+        except ValueError:
+            # Not really NDEF, just raw data that starts like an NDEF TLV: read it as raw below
+            fmt = FORMAT_RAW
+
+    # Raw: keep reading until an empty page shows up or memory runs out
+    while len(data) < capacity and not _has_empty_page(data):
+        pages = min(_RAW_CHUNK_PAGES, user_pages - len(data) // PAGE_SIZE)
+        chunk = read_pages(pn532, USER_START_PAGE + len(data) // PAGE_SIZE, pages)
+        if not chunk:
+            break
+        data += chunk
+    return decode_raw(data), FORMAT_RAW, data
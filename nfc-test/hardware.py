@@ -0,0 +1,158 @@
+"""Dedicated worker thread that owns the PN532.
+
+The adafruit driver is synchronous and a tag wait can block for seconds,
+so main.py never calls it from the asyncio event loop. Handlers submit
+jobs here and await the result; every job runs on the same thread, which
+also keeps I2C frames from different requests from interleaving.
+
+Jobs are scheduled by priority (lower runs first, FIFO within a priority),
+the number of queued jobs is bounded, and jobs submitted with the same
+coalescing key while one is still pending share a single execution.
+Each job runs in a copy of the submitter's context variables (the trace
+operation of the request, see tracing.py); a coalesced job keeps the
+context of the caller that queued it.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import itertools
+import queue
+import threading
+import time
+
+PRIORITY_WRITE = 0  # Writes jump ahead of queued reads
+PRIORITY_READ = 10
+PRIORITY_POLL = 20  # Background presence polling only runs when idle
+
+DEFAULT_MAX_PENDING = 32
+
+
+class QueueFullError(RuntimeError):
+    """Raised by submit when the worker already has max_pending jobs queued"""
+
+
+class HardwareWorker:
+    """Run callables one at a time on a single background thread"""
+
+    def __init__(self, name="pn532-worker", max_pending=DEFAULT_MAX_PENDING):
+        self._name = name
+        self._max_pending = max_pending
+        self._jobs = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        # Pending (queued or running) futures by coalescing key
+        self._coalesce = {}
+
+        # Monitoring counters, guarded by _lock
+        self._pending = 0
+        self._running = False
+        self._submitted = 0
+        self._coalesced = 0
+        self._rejected = 0
+        self._completed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._last_wait = 0.0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Finish the queued jobs, then stop the thread"""
+        if not self._thread:
+            return
+        # Sorts after every real job so the queue drains first
+        self._jobs.put((float("inf"), next(self._seq), None))
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, fn, *args, priority=PRIORITY_READ, key=None):
+        """Queue fn(*args) and return a concurrent.futures.Future
+
+        If key is given and a job with the same key is still queued or
+        running, its future is returned instead of queueing a new job.
+        Raises QueueFullError when max_pending jobs are already queued.
+        """
+        with self._lock:
+            if key is not None and key in self._coalesce:
+                self._coalesced += 1
+                return self._coalesce[key]
+            if self._pending >= self._max_pending:
+                self._rejected += 1
+                raise QueueFullError(f"Reader queue is full ({self._max_pending} jobs pending)")
+            future = concurrent.futures.Future()
+            if key is not None:
+                self._coalesce[key] = future
+            self._pending += 1
+            self._submitted += 1
+        context = contextvars.copy_context()
+        self._jobs.put((priority, next(self._seq), (future, fn, args, key, context, time.monotonic())))
+        return future
+
+    async def run(self, fn, *args, priority=PRIORITY_READ, key=None):
+        """Queue fn(*args) and await its result from the event loop"""
+        future = self.submit(fn, *args, priority=priority, key=key)
+        if key is None:
+            return await asyncio.wrap_future(future)
+        # A shared job must keep running if one of its callers disconnects
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def stats(self):
+        """Snapshot of queue depth, wait times and job counters"""
+        with self._lock:
+            started = self._completed + (1 if self._running else 0)
+            return {
+                "queue_depth": self._pending,
+                "running": self._running,
+                "max_pending": self._max_pending,
+                "submitted": self._submitted,
+                "coalesced": self._coalesced,
+                "rejected": self._rejected,
+                "completed": self._completed,
+                "last_wait_seconds": round(self._last_wait, 4),
+                "avg_wait_seconds": round(self._total_wait / started, 4) if started else 0.0,
+                "max_wait_seconds": round(self._max_wait, 4),
+            }
+
+    def _run(self):
+        while True:
+            _, _, job = self._jobs.get()
+            if job is None:
+                break
+            future, fn, args, key, context, submitted_at = job
+
+            wait = time.monotonic() - submitted_at
+            with self._lock:
+                self._pending -= 1
+                self._running = True
+                self._last_wait = wait
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+            # Skip jobs whose caller has already gone away
+            run = future.set_running_or_notify_cancel()
+            result = error = None
+            if run:
+                try:
+                    result = context.run(fn, *args)
+                except BaseException as e:
+                    error = e
+
+            # Drop the coalescing key before resolving, so a caller arriving
+            # now starts a fresh job instead of getting this result
+            with self._lock:
+                self._running = False
+                self._completed += 1
+                if key is not None and self._coalesce.get(key) is future:
+                    del self._coalesce[key]
+
+            if run:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
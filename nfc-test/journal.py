@@ -0,0 +1,147 @@
+"""Resumable NTAG writes for main.py.
+
+WriteJournal remembers, per tag UID, which payload was being written and
+the last page confirmed by the tag. If the tag leaves the field part way
+through, presenting it again with the same payload resumes from the next
+page instead of starting over. journaled_write retries and re-selects on
+a failed page and finishes with a bulk read-back to verify the result.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from ntag import PAGE_SIZE, read_pages
+from reader import ReaderUnavailableError
+from tracing import span
+
+log = logging.getLogger(__name__)
+
+
+class IncompleteWriteError(RuntimeError):
+    """The tag stopped answering before every page was written and verified"""
+
+    def __init__(self, message, next_page):
+        super().__init__(message)
+        self.next_page = next_page
+
+
+def payload_hash(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+class WriteJournal:
+    """Last confirmed page per (UID, payload hash), persisted as JSON"""
+
+    def __init__(self, path=None):
+        self._path = path
+        self._entries = {}  # uid -> {"payload": hash, "page": last confirmed page, "updated": time}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                log.warning("Ignoring unreadable write journal %s: %s", path, e)
+
+    def resume_page(self, uid, payload):
+        """Last page confirmed for this UID and payload hash, or None"""
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry and entry["payload"] == payload:
+                return entry["page"]
+            return None
+
+    def record(self, uid, payload, page):
+        """Remember a confirmed page (in memory, see save)"""
+        with self._lock:
+            self._entries[uid] = {"payload": payload, "page": page, "updated": time.time()}
+
+    def complete(self, uid):
+        with self._lock:
+            if self._entries.pop(uid, None) is None:
+                return
+        self.save()
+
+    def save(self):
+        """Persist the journal; called when a write stops, not on every page"""
+        if not self._path:
+            return
+        with self._lock:
+            snapshot = json.dumps(self._entries)
+        tmp_path = self._path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(snapshot)
+        os.replace(tmp_path, self._path)
+
+
+def _write_page(pn532, uid, page, chunk, retries):
+    """Write one page, re-selecting the tag between attempts"""
+    for attempt in range(retries):
+        try:
+            with span("write_page", page=page, attempt=attempt + 1):
+                if pn532.ntag2xx_write_block(page, chunk):
+                    return True
+        except ReaderUnavailableError:
+            raise
+        except RuntimeError:
+            # The driver raises for a frame the tag did not answer properly; retried like a NAK.
+            # OSError (the bus itself) and a reader that is down propagate
+            pass
+        # A failed exchange leaves the tag halted, wake it before the next attempt
+        if pn532.read_passive_target(timeout=0.1) != uid:
+            return False
+    return False
+
+
+def journaled_write(pn532, journal, uid, start_page, data, diff=True, retries=3):
+    """Write data from start_page, resuming an earlier interrupted write.
+
+    uid is the raw UID of the selected tag. Returns (pages_written,
+    resumed_from) where resumed_from is the first page of this attempt if
+    an earlier attempt was resumed, else None. Raises IncompleteWriteError
+    if the tag leaves the field; the journal keeps the progress so far.
+    """
+    uid_hex = uid.hex().upper()
+    payload = payload_hash(data)
+    num_pages = len(data) // PAGE_SIZE
+    end_page = start_page + num_pages
+
+    last_page = journal.resume_page(uid_hex, payload)
+    first_page = start_page
+    if last_page is not None and start_page <= last_page < end_page:
+        first_page = last_page + 1
+    resumed_from = first_page if first_page != start_page else None
+
+    current = read_pages(pn532, first_page, end_page - first_page) if diff else b""
+    written = []
+
+    try:
+        for page in range(first_page, end_page):
+            chunk = data[(page - start_page) * PAGE_SIZE:(page - start_page + 1) * PAGE_SIZE]
+            current_chunk = current[(page - first_page) * PAGE_SIZE:(page - first_page + 1) * PAGE_SIZE]
+            if current_chunk != chunk:
+                if not _write_page(pn532, uid, page, chunk, retries):
+                    raise IncompleteWriteError(f"Tag stopped answering at block {page}", page)
+                written.append(page)
+            journal.record(uid_hex, payload, page)
+
+        # Verify everything in one bulk read, rewriting any page that did not stick
+        with span("verify"):
+            check = read_pages(pn532, start_page, num_pages)
+        for page in range(start_page, end_page):
+            part = slice((page - start_page) * PAGE_SIZE, (page - start_page + 1) * PAGE_SIZE)
+            if check[part] == data[part]:
+                continue
+            if not _write_page(pn532, uid, page, data[part], retries):
+                journal.record(uid_hex, payload, page - 1)
+                raise IncompleteWriteError(f"Verify failed at block {page}", page)
+            written.append(page)
+    except Exception:
+        journal.save()
+        raise
+
+    journal.complete(uid_hex)
+    return written, resumed_from
@@ -1,14 +1,32 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import board
-import busio
-from digitalio import DigitalInOut
-from adafruit_pn532.i2c import PN532_I2C
-import RPi.GPIO as GPIO
-import time
 import asyncio
-from typing import Optional
+import json
+import hashlib
+import logging
+import math
+import os
+import time
+from functools import partial
+from typing import List, Optional
+
+import metrics
+import scanlog
+import tracing
+from batch import BatchProvisioner, parse_payloads
+from cache import TagCache
+from framing import FORMAT_COMPRESSED, FORMAT_FRAMED, FORMATS, MAX_EXPANDED_SIZE, encode, read_payload
+from hardware import PRIORITY_WRITE, QueueFullError
+from journal import IncompleteWriteError, WriteJournal, journaled_write
+from ntag import PAGE_SIZE, USER_START_PAGE
+from pool import ANY_READER, ReaderPool
+from presence import PresenceTracker
+from reader import ReaderUnavailableError, open_gpio
+from rfconfig import apply_rf_settings
+from status_led import BUSY, ERROR, SUCCESS, TIMEOUT, StatusLed
+from tagid import MAX_TARGETS, MAX_USER_BYTES, TagIdentifier, TargetView, UnsupportedTagError
 
 app = FastAPI(title="NFC Hex Reader/Writer API", version="1.0.0")
 
@@ -19,43 +37,118 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    # ETag lets browser clients send If-None-Match, X-* describe /read-pk/raw bodies
+    expose_headers=["ETag", "X-Tag-UID", "X-Reader", "X-Tag-Type", "X-Payload-Format", "X-Successful-Blocks"],
 )
 
+if metrics.ENABLED:
+    @app.middleware("http")
+    async def record_request(request: Request, call_next):
+        """End-to-end latency and status of every request, by route"""
+        start = time.perf_counter()
+        response = await call_next(request)
+        route = request.scope.get("route")
+        path = route.path if route else "unmatched"  # The template, so /read-pk?... is one series
+        metrics.REQUEST.observe(time.perf_counter() - start, path=path, method=request.method)
+        metrics.RESPONSES.inc(path=path, method=request.method, status=str(response.status_code))
+        return response
+
+if tracing.ENABLED:
+    @app.middleware("http")
+    async def trace_request(request: Request, call_next):
+        """One trace operation per request; kept when it recorded spans (used a reader)"""
+        with tracing.operation(f"{request.method} {request.url.path}", keep_empty=False) as op:
+            response = await call_next(request)
+            route = request.scope.get("route")
+            if route:
+                op.name = f"{request.method} {route.path}"
+            op.attrs["status"] = response.status_code
+        return response
+
+# Reads and writes are logged at INFO, tag waits and per-block lines at DEBUG (NFC_LOG_LEVEL=DEBUG)
+tracing.setup_logging()
+log = logging.getLogger(__name__)
+
 LED_PIN = 17  # GPIO pin connected to LED
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))  # Journal and batch progress files
+
+# The readers of this host (NFC_READERS, or one reader on NFC_BACKEND).
+# Each PN532 connects on first use from its own worker thread, so waiting
+# for a tag never blocks the event loop or the other readers, and
+# reconnects by itself after I2C failures
+pool = ReaderPool()
+if pool.default.led_pin is None:
+    pool.default.led_pin = LED_PIN
+if metrics.ENABLED:
+    # Time every PN532 frame; without metrics the driver calls are not wrapped at all
+    for _slot in pool:
+        _slot.pn532.observer = partial(metrics.observe_frame, _slot.name)
+
+# Set up at startup; stays None when there is no GPIO (LED is optional)
+GPIO = None
+
+# Tag contents by UID, filled as soon as a tag enters the field
+tag_cache = TagCache(max_entries=256, ttl=30.0)
 
-# Initialize I2C communication and PN532
-i2c = busio.I2C(board.SCL, board.SDA)
-pn532 = PN532_I2C(i2c, debug=False)
+# Tag type and user memory size by UID, so repeat presentations skip probing
+tag_ids = TagIdentifier()
 
-# Setup GPIO
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(LED_PIN, GPIO.OUT)
+# Progress of interrupted writes, so re-presenting the tag resumes them
+write_journal = WriteJournal(os.path.join(DATA_DIR, "write-journal.json"))
 
-# Configure PN532
-pn532.SAM_configuration()
+# Every read and its outcome, kept in SQLite (NFC_SCAN_LOG, scans.db by default)
+scan_log = scanlog.open_scan_log(start=False)
 
-# Get firmware version
-ic, ver, rev, support = pn532.firmware_version
-print(f"Found PN532 with firmware version: {ver}.{rev}")
+# HTTP errors of a read, as scan log outcomes
+SCAN_OUTCOMES = {404: scanlog.EMPTY, 408: scanlog.TIMEOUT, 415: scanlog.UNSUPPORTED}
+
+# The running batch provisioning job, if any
+batch = None
+batch_task = None
 
 # Request/Response models
 class WriteHexRequest(BaseModel):
     hex_string: str
+    diff_write: bool = True  # Only write pages whose contents differ
+    format: str = FORMAT_FRAMED  # "framed" (length header), "compressed" (deflated if smaller), "ndef" or "raw" (zero padded)
 
 class ReadHexResponse(BaseModel):
     uid: str
+    reader: Optional[str] = None
+    tag_type: Optional[str] = None
+    format: Optional[str] = None
     hex_data: str
     total_bytes: int
     successful_blocks: int
     message: str
 
-class WriteHexResponse(BaseModel):
+class UidResponse(BaseModel):
     uid: str
-    hex_string: str
+    reader: str
+    atqa: Optional[str] = None
+    sak: Optional[str] = None
+    cached: bool  # Answered from the presence tracker without touching the reader
+
+class ReadAllResponse(BaseModel):
+    reader: str
+    tags: List[ReadHexResponse]
+    skipped: List[str] = []  # UIDs of tags that were listed but could not be read
+    message: str
+
+class WriteResponse(BaseModel):
+    uid: str
+    reader: Optional[str] = None
+    format: str
     total_bytes: int
     total_blocks: int
+    blocks_written: int
+    blocks_skipped: int
+    resumed_from_block: Optional[int] = None
     message: str
 
+class WriteHexResponse(WriteResponse):
+    hex_string: str
+
 class ErrorResponse(BaseModel):
     error: str
     details: Optional[str] = None
@@ -68,170 +161,903 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "read": "/read-pk",
-            "write": "/write-pk"
+            "read_all": "/read-pk/all",
+            "read_raw": "/read-pk/raw",
+            "write": "/write-pk",
+            "write_raw": "/write-pk/raw",
+            "queue": "/queue",
+            "cache": "/cache",
+            "events": "/events",
+            "batch": "/batch",
+            "health": "/health",
+            "readers": "/readers",
+            "events_ws": "/ws/events",
+            "uid": "/uid",
+            "config_rf": "/config/rf",
+            "metrics": "/metrics",
+            "trace": "/debug/trace",
+            "scans": "/scans"
         }
     }
 
-@app.get("/read-pk", response_model=ReadHexResponse)
-async def read_hex_from_nfc():
-    """Read hex data from NFC tag"""
+def wait_for_tag(reader, timeout):
+    """Wait up to timeout seconds for an NFC tag (runs on the reader's worker)
+    
+    Sleeps on the PN532 IRQ line when the reader has one, polls otherwise.
+    Returns a tagid.Target (uid, atqa, sak), or None on timeout.
+    """
+    start = time.perf_counter()
+    with tracing.span("detect", mode=reader.detector.mode):
+        target = reader.detector.wait(timeout)
+    metrics.TAG_WAIT.observe(time.perf_counter() - start, reader=reader.name, found=str(bool(target)).lower())
+    return target
+
+def wait_for_tags(reader, timeout):
+    """Like wait_for_tag, but lists up to two tags that are in the field together
+    
+    Returns a list of tagid.Targets, empty on timeout.
+    """
+    start = time.perf_counter()
+    with tracing.span("detect", mode=reader.detector.mode):
+        targets = reader.detector.wait_all(timeout, MAX_TARGETS)
+    metrics.TAG_WAIT.observe(time.perf_counter() - start, reader=reader.name, found=str(bool(targets)).lower())
+    return targets
+
+def identify_ntag(reader, target, pn532=None):
+    """Identify the tag and make sure it is NTAG/Ultralight (runs on the reader's worker)"""
+    with tracing.span("identify"):
+        info = tag_ids.identify(pn532 or reader.pn532, target)
+    log.debug("Tag type: %s (%d bytes user memory)", info.tag_type, info.user_bytes)
+    if info.family not in ("ntag", "ultralight"):
+        set_led(reader, ERROR)
+        raise UnsupportedTagError(f"{info.tag_type} is not supported, only NTAG2xx/Ultralight tags are")
+    return info
+
+def read_tag_data(reader, info, pn532=None):
+    """Read the payload of the selected tag (runs on the reader's worker)
+    
+    pn532 defaults to the reader's PN532; pass a TargetView to read the
+    second of two listed tags. Returns (payload, successful_reads, fmt).
+    """
+    set_led(reader, BUSY)
     try:
-        print("Waiting for an NFC tag to read hex data...")
-        
-        # Wait for NFC tag with timeout
-        start_time = time.time()
-        timeout = 10  # 10 seconds timeout
-        uid = None
-        
-        while time.time() - start_time < timeout:
-            uid = pn532.read_passive_target(timeout=0.5)
-            if uid:
-                break
-            await asyncio.sleep(0.1)
-        
-        if not uid:
-            raise HTTPException(status_code=408, detail="Timeout: No NFC tag found within 10 seconds")
-        
-        print(f"Found NFC card with UID: {uid.hex().upper()}")
-        GPIO.output(LED_PIN, GPIO.HIGH)
-        
-        # Read hex data from blocks starting at block 4
-        read_data = bytearray()
-        blocks_to_read = 16  # Read up to 64 bytes
-        successful_reads = 0
-        
-        print("Reading hex data blocks:")
-        for block_num in range(4, 4 + blocks_to_read):
-            try:
-                block_data = pn532.ntag2xx_read_block(block_num)
-                if block_data:
-                    print(f"Block {block_num}: {block_data.hex()}")
-                    read_data.extend(block_data)
-                    successful_reads += 1
-                    
-                    # Check if we've hit all null bytes (end of data)
-                    if block_data == b'\x00\x00\x00\x00':
-                        print(f"Reached end of data at block {block_num}")
-                        break
-                else:
-                    print(f"Failed to read block {block_num} - returned None")
-                    break
-            except Exception as e:
-                print(f"Error reading block {block_num}: {e}")
-                continue
-        
-        GPIO.output(LED_PIN, GPIO.LOW)
-        
-        if not read_data:
-            raise HTTPException(status_code=404, detail="No data could be read from the tag")
-        
-        # Remove trailing null bytes (padding)
-        while read_data and read_data[-1] == 0:
-            read_data.pop()
-        
-        if not read_data:
-            raise HTTPException(status_code=404, detail="No valid hex data found (all null bytes)")
-        
-        # Convert to hex string
-        hex_string = read_data.hex()
-        
-        return ReadHexResponse(
-            uid=uid.hex().upper(),
-            hex_data=hex_string,
-            total_bytes=len(read_data),
-            successful_blocks=successful_reads,
-            message="Hex data successfully read from NFC tag"
+        # Header page first, then exactly the stored length in bulk
+        start = time.perf_counter()
+        with tracing.span("read_payload"):
+            payload, fmt, page_data = read_payload(pn532 or reader.pn532, info.user_pages)
+        pages = max(1, len(page_data) // PAGE_SIZE)
+        metrics.PAGE_READ.observe((time.perf_counter() - start) / pages, count=pages, reader=reader.name)
+        metrics.READS.inc(reader=reader.name, format=fmt)
+        if log.isEnabledFor(logging.DEBUG):
+            for offset in range(0, len(page_data), PAGE_SIZE):
+                block_num = USER_START_PAGE + offset // PAGE_SIZE
+                log.debug("Block %d: %s", block_num, page_data[offset:offset + PAGE_SIZE].hex())
+        log.info("Read %d bytes of %s payload", len(payload), fmt)
+    except Exception:
+        set_led(reader, ERROR)
+        raise
+    set_led(reader, SUCCESS)
+    
+    return payload, len(page_data) // PAGE_SIZE, fmt
+
+def read_hex_blocks(reader, timeout):
+    """Wait for a tag and read its hex data blocks (runs on the reader's worker)
+    
+    Returns (uid, payload, successful_reads, tag_type, fmt), or (None, None, 0, None, None) on timeout.
+    """
+    log.debug("Waiting for an NFC tag on %s to read hex data...", reader.name)
+    target = wait_for_tag(reader, timeout)
+    if not target:
+        return None, None, 0, None, None
+    
+    uid = target.uid
+    log.debug("Found NFC card with UID: %s", uid.hex().upper())
+    tracing.annotate(uid=uid.hex().upper())
+    info = identify_ntag(reader, target)
+    payload, successful_reads, fmt = read_tag_data(reader, info)
+    tag_cache.put(uid.hex().upper(), (payload, successful_reads, info.tag_type, fmt))
+    return uid, payload, successful_reads, info.tag_type, fmt
+
+def read_all_tags(reader, timeout):
+    """Wait for tags and read every tag in the field in one session (runs on the reader's worker)
+    
+    Both tags of a pair are listed by one InListPassiveTarget and read one
+    after the other through InSelect, with no re-detection in between.
+    Returns (results, skipped) where results holds (uid, payload,
+    successful_reads, tag_type, fmt) per tag and skipped the UIDs of
+    tags that are not NTAG/Ultralight or stopped answering.
+    """
+    log.debug("Waiting for NFC tags on %s to read hex data...", reader.name)
+    targets = wait_for_tags(reader, timeout)
+    results = []
+    skipped = []
+    for target in targets:
+        uid = target.uid
+        log.debug("Reading target %d with UID: %s", target.tg, uid.hex().upper())
+        view = TargetView(reader.pn532, target)
+        try:
+            if not view.activate():
+                raise UnsupportedTagError(f"Target {target.tg} did not answer InSelect")
+            info = identify_ntag(reader, target, view)
+            payload, successful_reads, fmt = read_tag_data(reader, info, view)
+        except UnsupportedTagError as e:
+            log.info("Skipping %s: %s", uid.hex().upper(), e)
+            skipped.append(uid.hex().upper())
+            continue
+        tag_cache.put(uid.hex().upper(), (payload, successful_reads, info.tag_type, fmt))
+        results.append((uid, payload, successful_reads, info.tag_type, fmt))
+    return results, skipped
+
+def poll_tag(reader, known_uid):
+    """Single presence check for a reader's tracker (runs on the reader's worker)
+    
+    Returns (uid, payload); the payload is only read for a newly arrived tag.
+    """
+    last = reader.detector.last
+    if known_uid and last is not None and bytes(last.uid) == bytes(known_uid):
+        # The tag we know about: one READ frame tells whether it is still there
+        return (known_uid if reader.detector.still_present() else None), None
+    
+    target = reader.detector.wait(0.2)
+    uid = target.uid if target else None
+    if not uid or uid == known_uid:
+        return uid, None
+    
+    log.debug("Tag arrived on %s with UID: %s", reader.name, uid.hex().upper())
+    start = time.perf_counter()
+    scan = partial(scan_log.record, uid=uid.hex().upper(), reader=reader.name, source="prefetch")
+    with tracing.operation("prefetch", reader=reader.name, uid=uid.hex().upper()):
+        with tracing.span("identify"):
+            info = tag_ids.identify(reader.pn532, target)
+        if info.family not in ("ntag", "ultralight"):
+            # Still reported as present, there is just no payload to prefetch
+            scan(scanlog.UNSUPPORTED, tag_type=info.tag_type, duration=time.perf_counter() - start)
+            return uid, b""
+        # Prefetch the contents so a following /read-pk is served from the cache
+        try:
+            payload, successful_reads, fmt = read_tag_data(reader, info)
+        except Exception as e:
+            scan(scanlog.ERROR, tag_type=info.tag_type, duration=time.perf_counter() - start, detail=str(e))
+            raise
+    scan(scanlog.OK if payload else scanlog.EMPTY, tag_type=info.tag_type, fmt=fmt, payload=payload,
+         duration=time.perf_counter() - start)
+    tag_cache.put(uid.hex().upper(), (payload, successful_reads, info.tag_type, fmt))
+    return uid, payload
+
+# Each reader is polled whenever no request is using it and streams tag events
+for _reader in pool:
+    # A failed presence check already re-selects to confirm, so one miss means removed
+    _reader.tracker = PresenceTracker(
+        _reader.hardware, partial(poll_tag, _reader), removal_misses=1, present_interval=0.05,
+        on_removed=tag_cache.invalidate, name=_reader.name)
+
+def write_hex_blocks(reader, data_bytes, timeout, diff=True):
+    """Wait for a tag and write the encoded data_bytes from block 4 (runs on the reader's worker)
+    
+    Returns (uid, blocks_written, resumed_from), or (None, 0, None) on timeout.
+    """
+    log.debug("Waiting for an NFC tag on %s...", reader.name)
+    target = wait_for_tag(reader, timeout)
+    if not target:
+        return None, 0, None
+    
+    uid = target.uid
+    log.debug("Found NFC card with UID: %s", uid.hex().upper())
+    tracing.annotate(uid=uid.hex().upper())
+    info = identify_ntag(reader, target)
+    if len(data_bytes) > info.user_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{len(data_bytes)} bytes do not fit the {info.user_bytes} bytes of user memory on this {info.tag_type}"
         )
+    # Drop the cached contents before touching the tag, even a failed write may change it
+    tag_cache.invalidate(uid.hex().upper())
+    set_led(reader, BUSY)
+    try:
+        # Write in 4-byte chunks, skipping blocks that already match when diffing
+        total_blocks = len(data_bytes) // 4
+        log.debug("Writing %d bytes in %d blocks...", len(data_bytes), total_blocks)
+        start = time.perf_counter()
+        with tracing.span("write", pages=total_blocks, diff=diff):
+            written, resumed_from = journaled_write(
+                reader.pn532, write_journal, uid, USER_START_PAGE, data_bytes, diff=diff)
+        if written:
+            # Includes the diff reads and verification, the cost per page that changed
+            metrics.PAGE_WRITE.observe((time.perf_counter() - start) / len(written), count=len(written),
+                                       reader=reader.name)
+        metrics.WRITES.inc(reader=reader.name)
+        if resumed_from is not None:
+            log.info("Resumed interrupted write at block %d", resumed_from)
         
+        # A block rewritten during verify shows up twice
+        written = sorted(set(written))
+        if log.isEnabledFor(logging.DEBUG):
+            for block_number in written:
+                start_pos = (block_number - USER_START_PAGE) * PAGE_SIZE
+                log.debug("Wrote block %d: %s", block_number, data_bytes[start_pos:start_pos + PAGE_SIZE].hex())
+        log.info("%d blocks written, %d unchanged", len(written), total_blocks - len(written))
+    except Exception:
+        set_led(reader, ERROR)
+        raise
+    set_led(reader, SUCCESS)
+    
+    return uid, len(written), resumed_from
+
+def reader_unavailable(e):
+    """503 with Retry-After, so clients back off while the reader reconnects"""
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+    )
+
+def tag_timeout(slot, op, timeout):
+    """408 for a request that found no tag in time"""
+    metrics.TIMEOUTS.inc(reader=slot.name, op=op)
+    set_led(slot, TIMEOUT)
+    return HTTPException(status_code=408, detail=f"Timeout: No NFC tag found within {timeout:g} seconds")
+
+def request_deadline(slot, timeout):
+    """The request's timeout in seconds, or the reader's default; 422 beyond its maximum"""
+    if timeout is None:
+        return slot.rf.default_deadline
+    if not 0 < timeout <= slot.rf.max_deadline:
+        raise HTTPException(
+            status_code=422,
+            detail=f"timeout must be more than 0 and at most {slot.rf.max_deadline:g} seconds on {slot.name}"
+        )
+    return timeout
+
+def pick_reader(name):
+    """Route a request to the named reader, or the best one for "any" """
+    try:
+        return pool.pick(name)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+def payload_etag(uid, payload, representation="json"):
+    """Strong ETag for the contents of one tag in one representation"""
+    return '"' + hashlib.sha1(f"{representation}:{uid}:".encode() + payload).hexdigest()[:20] + '"'
+
+def etag_matches(etag, if_none_match):
+    return bool(if_none_match) and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+async def fetch_tag_payload(slot, timeout):
+    """The payload of the tag on slot, from the presence tracker's cache or a fresh read
+    
+    Returns (uid, payload, successful_reads, tag_type, fmt, cached) with
+    uid in hex; failures are raised as HTTPExceptions.
+    """
+    try:
+        # A tag already in the field was prefetched by the presence tracker
+        current = slot.tracker.current
+        with tracing.span("cache"):
+            cached = tag_cache.get(current["uid"]) if current else None
+        if cached:
+            uid = current["uid"]
+            tracing.annotate(reader=slot.name, uid=uid, cached=True)
+            payload, successful_reads, tag_type, fmt = cached
+        else:
+            # Concurrent reads with the same deadline share one tag wait and one memory read
+            uid, payload, successful_reads, tag_type, fmt = await slot.run(
+                "read", read_hex_blocks, slot, timeout, key=f"read-pk:{timeout}")
+            
+            if not uid:
+                raise tag_timeout(slot, "read", timeout)
+            uid = uid.hex().upper()
     except HTTPException:
         raise
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ReaderUnavailableError as e:
+        raise reader_unavailable(e)
+    except UnsupportedTagError as e:
+        raise HTTPException(status_code=415, detail=str(e))
     except Exception as e:
-        GPIO.output(LED_PIN, GPIO.LOW)
         raise HTTPException(status_code=500, detail=f"Error reading NFC tag: {str(e)}")
+    return uid, payload, successful_reads, tag_type, fmt, bool(cached)
 
-@app.post("/write-pk", response_model=WriteHexResponse)
-async def write_hex_to_nfc(request: WriteHexRequest):
-    """Write hex data to NFC tag"""
+async def read_tag_payload(slot, timeout, source):
+    """The payload of the tag on slot, for /read-pk and /read-pk/raw
+    
+    Returns (uid, payload, successful_reads, tag_type, fmt) with uid in
+    hex; failures, an empty tag included, are raised as HTTPExceptions.
+    Every outcome goes to the scan log under source.
+    """
+    start = time.perf_counter()
     try:
-        hex_string = request.hex_string.strip()
-        
-        # Validate input
-        if not hex_string:
-            raise HTTPException(status_code=400, detail="No hex string provided")
+        uid, payload, successful_reads, tag_type, fmt, cached = await fetch_tag_payload(slot, timeout)
+    except HTTPException as e:
+        scan_log.record(SCAN_OUTCOMES.get(e.status_code, scanlog.ERROR), reader=slot.name, source=source,
+                        duration=time.perf_counter() - start, detail=str(e.detail))
+        raise
+    scan_log.record(scanlog.OK if payload else scanlog.EMPTY, uid=uid, reader=slot.name, source=source,
+                    tag_type=tag_type, fmt=fmt, payload=payload, duration=time.perf_counter() - start,
+                    cached=cached)
+    
+    # Framed and NDEF payloads come back at their exact length, raw
+    # ones already have the zero padding stripped
+    if not payload:
+        metrics.EMPTY_TAGS.inc(reader=slot.name)
+        raise HTTPException(status_code=404, detail="No valid hex data found (empty payload or all null bytes)")
+    return uid, payload, successful_reads, tag_type, fmt
+
+@app.get("/read-pk", response_model=ReadHexResponse)
+async def read_hex_from_nfc(response: Response, reader: str = ANY_READER, timeout: Optional[float] = None,
+                            if_none_match: Optional[str] = Header(None)):
+    """Read hex data from NFC tag
+    
+    reader names the reader to use; "any" takes a reader that already has
+    a tag in its field, otherwise the least busy one. timeout is how many
+    seconds to wait for a tag (default_deadline of the reader if not given).
+    """
+    slot = pick_reader(reader)
+    timeout = request_deadline(slot, timeout)
+    uid, payload, successful_reads, tag_type, fmt = await read_tag_payload(slot, timeout, "read-pk")
+    
+    with tracing.span("response"):
+        # Let clients that already hold this payload skip the body
+        etag = payload_etag(uid, payload)
+        if etag_matches(etag, if_none_match):
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
         
-        print(f"Hex string to write: {hex_string}")
-        print(f"Length: {len(hex_string)} characters")
+        return ReadHexResponse(
+            uid=uid,
+            reader=slot.name,
+            tag_type=tag_type,
+            format=fmt,
+            hex_data=payload.hex(),
+            total_bytes=len(payload),
+            successful_blocks=successful_reads,
+            message="Hex data successfully read from NFC tag"
+        )
+
+@app.get("/read-pk/raw", response_class=Response,
+         responses={200: {"content": {"application/octet-stream": {}}, "description": "The payload bytes"}})
+async def read_raw_from_nfc(reader: str = ANY_READER, timeout: Optional[float] = None,
+                            if_none_match: Optional[str] = Header(None)):
+    """Read the tag's payload as application/octet-stream
+    
+    Like /read-pk without the hex encoding and JSON: the body is the
+    payload itself, up to the whole user memory of the tag (888 bytes on
+    an NTAG216). UID, reader, tag type, format and block count come in
+    X-Tag-UID, X-Reader, X-Tag-Type, X-Payload-Format and
+    X-Successful-Blocks headers.
+    """
+    slot = pick_reader(reader)
+    timeout = request_deadline(slot, timeout)
+    uid, payload, successful_reads, tag_type, fmt = await read_tag_payload(slot, timeout, "read-pk/raw")
+    
+    with tracing.span("response"):
+        etag = payload_etag(uid, payload, "raw")
+        if etag_matches(etag, if_none_match):
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(
+            content=bytes(payload),
+            media_type="application/octet-stream",
+            headers={
+                "ETag": etag,
+                "X-Tag-UID": uid,
+                "X-Reader": slot.name,
+                "X-Tag-Type": tag_type or "",
+                "X-Payload-Format": fmt or "",
+                "X-Successful-Blocks": str(successful_reads),
+            }
+        )
+
+@app.get("/read-pk/all", response_model=ReadAllResponse)
+async def read_all_from_nfc(reader: str = ANY_READER, timeout: Optional[float] = None):
+    """Read every tag in the field of one reader (up to two) in one go
+    
+    Paired tags are listed together and read back to back, instead of
+    one /read-pk per tag with the other one lifted off the reader.
+    """
+    slot = pick_reader(reader)
+    timeout = request_deadline(slot, timeout)
+    start = time.perf_counter()
+    scan = partial(scan_log.record, reader=slot.name, source="read-pk/all")
+    try:
+        results, skipped = await slot.run("read_all", read_all_tags, slot, timeout, key=f"read-pk-all:{timeout}")
+        # One session for all tags, so each is logged with its duration
+        duration = time.perf_counter() - start
+        if not results and not skipped:
+            scan(scanlog.TIMEOUT, duration=duration)
+            raise tag_timeout(slot, "read_all", timeout)
+        for uid, payload, successful_reads, tag_type, fmt in results:
+            scan(scanlog.OK if payload else scanlog.EMPTY, uid=uid.hex().upper(), tag_type=tag_type, fmt=fmt,
+                 payload=payload, duration=duration)
+        for uid in skipped:
+            scan(scanlog.UNSUPPORTED, uid=uid, duration=duration)
         
-        # Convert hex string to bytes
-        try:
-            data_bytes = bytes.fromhex(hex_string)
-            print(f"Converted to {len(data_bytes)} bytes")
-        except ValueError as e:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Invalid hex string: {str(e)}. Please ensure the string contains only valid hexadecimal characters (0-9, a-f, A-F)"
+        with tracing.span("response"):
+            tags = [
+                ReadHexResponse(
+                    uid=uid.hex().upper(),
+                    reader=slot.name,
+                    tag_type=tag_type,
+                    format=fmt,
+                    hex_data=payload.hex(),
+                    total_bytes=len(payload),
+                    successful_blocks=successful_reads,
+                    message="Hex data successfully read from NFC tag" if payload else "Tag holds no data"
+                )
+                for uid, payload, successful_reads, tag_type, fmt in results
+            ]
+            return ReadAllResponse(
+                reader=slot.name,
+                tags=tags,
+                skipped=skipped,
+                message=f"Read {len(tags)} of {len(tags) + len(skipped)} tags in the field"
             )
         
-        # Ensure data is padded to a multiple of 4 bytes for NFC writing
-        original_length = len(data_bytes)
-        if len(data_bytes) % 4 != 0:
-            padding = 4 - (len(data_bytes) % 4)
-            data_bytes = data_bytes + (b'\x00' * padding)
-            print(f"Padded to {len(data_bytes)} bytes with {padding} null bytes")
-        
-        print("Waiting for an NFC tag...")
-        
-        # Wait for NFC tag with timeout
-        start_time = time.time()
-        timeout = 10  # 10 seconds timeout
-        uid = None
-        
-        while time.time() - start_time < timeout:
-            uid = pn532.read_passive_target(timeout=0.5)
-            if uid:
-                break
-            await asyncio.sleep(0.1)
-        
-        if not uid:
-            raise HTTPException(status_code=408, detail="Timeout: No NFC tag found within 10 seconds")
-        
-        print(f"Found NFC card with UID: {uid.hex().upper()}")
-        GPIO.output(LED_PIN, GPIO.HIGH)
-        
-        # Write in 4-byte chunks
-        total_blocks = len(data_bytes) // 4
-        print(f"Writing {len(data_bytes)} bytes in {total_blocks} blocks...")
-        
-        for i in range(0, len(data_bytes), 4):
-            block_number = 4 + (i // 4)  # Start at block 4, increment every 4 bytes
-            chunk = data_bytes[i:i+4]
-            # Get the original hex string chunk (preserving case)
-            start_pos = i * 2
-            end_pos = (i + 4) * 2
-            original_chunk = hex_string[start_pos:end_pos] if end_pos <= len(hex_string) else hex_string[start_pos:]
-            print(f"Writing to block {block_number}: {original_chunk}")
-            pn532.ntag2xx_write_block(block_number, chunk)
-        
-        GPIO.output(LED_PIN, GPIO.LOW)
-        
-        return WriteHexResponse(
-            uid=uid.hex().upper(),
-            hex_string=hex_string,
-            total_bytes=original_length,
-            total_blocks=total_blocks,
-            message="Hex string successfully written to NFC tag"
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ReaderUnavailableError as e:
+        raise reader_unavailable(e)
+    except Exception as e:
+        scan(scanlog.ERROR, duration=time.perf_counter() - start, detail=str(e))
+        raise HTTPException(status_code=500, detail=f"Error reading NFC tags: {str(e)}")
+
+def payload_limit(fmt):
+    """Largest payload accepted for fmt; compressed ones only have to fit once deflated"""
+    return MAX_EXPANDED_SIZE if fmt == FORMAT_COMPRESSED else MAX_USER_BYTES
+
+async def write_tag_payload(slot, data, fmt, diff, timeout):
+    """Encode data as fmt and write it to the next tag on slot
+    
+    Shared by /write-pk and /write-pk/raw. Returns (uid, total_blocks,
+    blocks_written, resumed_from) with uid in hex; failures are raised as
+    HTTPExceptions.
+    """
+    if not data:
+        raise HTTPException(status_code=400, detail="No data provided")
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format {fmt!r}, expected one of {', '.join(FORMATS)}")
+    if len(data) > payload_limit(fmt):
+        raise HTTPException(
+            status_code=413,
+            detail=f"{len(data)} bytes do not fit on any supported tag (at most {payload_limit(fmt)} bytes as {fmt})"
         )
+    # Add the length header / NDEF TLV (compressing the body if that saves pages)
+    # and pad to a multiple of 4 bytes for NFC writing
+    encoded = encode(data, fmt)
+    if len(encoded) > MAX_USER_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{len(data)} bytes take {len(encoded)} as {fmt}, more than any supported tag holds ({MAX_USER_BYTES} bytes)"
+        )
+    log.info("Writing %d bytes, encoded as %s: %d bytes", len(data), fmt, len(encoded))
+    try:
+        uid, blocks_written, resumed_from = await slot.run(
+            "write", write_hex_blocks, slot, encoded, timeout, diff, priority=PRIORITY_WRITE)
         
+        if not uid:
+            raise tag_timeout(slot, "write", timeout)
     except HTTPException:
         raise
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ReaderUnavailableError as e:
+        raise reader_unavailable(e)
+    except UnsupportedTagError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except IncompleteWriteError as e:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Write interrupted: {str(e)}. Present the same tag and retry to resume from block {e.next_page}"
+        )
     except Exception as e:
-        GPIO.output(LED_PIN, GPIO.LOW)
         raise HTTPException(status_code=500, detail=f"Error writing to NFC tag: {str(e)}")
+    return uid.hex().upper(), len(encoded) // PAGE_SIZE, blocks_written, resumed_from
+
+@app.post("/write-pk", response_model=WriteHexResponse)
+async def write_hex_to_nfc(request: WriteHexRequest, reader: str = ANY_READER, timeout: Optional[float] = None):
+    """Write hex data to NFC tag on the named reader, or any free one
+    
+    timeout is how many seconds to wait for a tag, as for /read-pk.
+    """
+    slot = pick_reader(reader)
+    timeout = request_deadline(slot, timeout)
+    hex_string = request.hex_string.strip()
+    
+    # Validate input
+    if not hex_string:
+        raise HTTPException(status_code=400, detail="No hex string provided")
+    log.debug("Hex string to write: %s", hex_string)
+    
+    # Convert hex string to bytes
+    try:
+        data_bytes = bytes.fromhex(hex_string)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Invalid hex string: {str(e)}. Please ensure the string contains only valid hexadecimal characters (0-9, a-f, A-F)"
+        )
+    
+    uid, total_blocks, blocks_written, resumed_from = await write_tag_payload(
+        slot, data_bytes, request.format, request.diff_write, timeout)
+    
+    if blocks_written:
+        message = "Hex string successfully written to NFC tag"
+    else:
+        message = "Tag already contains this hex string, nothing written"
+    
+    with tracing.span("response"):
+        return WriteHexResponse(
+            uid=uid,
+            reader=slot.name,
+            hex_string=hex_string,
+            format=request.format,
+            total_bytes=len(data_bytes),
+            total_blocks=total_blocks,
+            blocks_written=blocks_written,
+            blocks_skipped=total_blocks - blocks_written,
+            resumed_from_block=resumed_from,
+            message=message
+        )
+
+@app.post("/write-pk/raw", response_model=WriteResponse)
+async def write_raw_to_nfc(request: Request, reader: str = ANY_READER, timeout: Optional[float] = None,
+                           format: str = FORMAT_FRAMED, diff_write: bool = True):
+    """Write the request body (application/octet-stream) to NFC tag as is
+    
+    Like /write-pk without the hex string: format and diff_write are query
+    parameters. Payloads may fill the whole user memory of the tag (888
+    bytes on an NTAG216 with format=raw), or more with format=compressed
+    if they deflate to fit; larger bodies are refused before they are read.
+    """
+    slot = pick_reader(reader)
+    timeout = request_deadline(slot, timeout)
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > payload_limit(format):
+        raise HTTPException(
+            status_code=413,
+            detail=f"{length} bytes do not fit on any supported tag (at most {payload_limit(format)} bytes as {format})"
+        )
+    data_bytes = await request.body()
+    
+    uid, total_blocks, blocks_written, resumed_from = await write_tag_payload(
+        slot, data_bytes, format, diff_write, timeout)
+    
+    with tracing.span("response"):
+        return WriteResponse(
+            uid=uid,
+            reader=slot.name,
+            format=format,
+            total_bytes=len(data_bytes),
+            total_blocks=total_blocks,
+            blocks_written=blocks_written,
+            blocks_skipped=total_blocks - blocks_written,
+            resumed_from_block=resumed_from,
+            message="Payload successfully written to NFC tag" if blocks_written
+            else "Tag already contains this payload, nothing written"
+        )
+
+@app.get("/uid", response_model=UidResponse)
+async def read_uid(reader: str = ANY_READER, timeout: Optional[float] = None):
+    """UID of the tag in the field, without reading its memory
+    
+    A tag the presence tracker already knows is answered without I/O;
+    otherwise one anticollision run, which with a small
+    mx_rty_passive_activation also reports an empty field in milliseconds.
+    """
+    slot = pick_reader(reader)
+    timeout = request_deadline(slot, timeout)
+    current = slot.tracker.current
+    if current:
+        return UidResponse(uid=current["uid"], reader=slot.name, cached=True)
+    try:
+        target = await slot.run("uid", wait_for_tag, slot, timeout, key=f"uid:{timeout}")
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ReaderUnavailableError as e:
+        raise reader_unavailable(e)
+    if not target:
+        raise tag_timeout(slot, "uid", timeout)
+    return UidResponse(
+        uid=target.uid.hex().upper(),
+        reader=slot.name,
+        atqa=f"{target.atqa:04X}",
+        sak=f"{target.sak:02X}",
+        cached=False
+    )
+
+def set_led(reader, state):
+    """Post a status_led state to a reader's LED; returns at once, the pattern plays on its own thread"""
+    if reader.led:
+        with tracing.span("led", state=state):
+            reader.led.set(state)
+
+async def run_batch(provisioner, reader):
+    """Feed the batch through one reader's worker one tag at a time
+    
+    Each job waits at most a second for a tag, so other requests can use
+    the reader between tags.
+    """
+    while not provisioner.finished:
+        try:
+            uid = await reader.run(
+                "batch", provisioner.provision_next, reader.pn532, reader.detector, write_journal, 1.0,
+                partial(set_led, reader), priority=PRIORITY_WRITE)
+        except QueueFullError:
+            await asyncio.sleep(0.2)
+            continue
+        except ReaderUnavailableError as e:
+            await asyncio.sleep(max(0.2, e.retry_after))
+            continue
+        except Exception as e:
+            log.warning("Batch provisioning error: %s", e)
+            await asyncio.sleep(0.2)
+            continue
+        if uid:
+            tag_cache.invalidate(uid)
+
+@app.post("/batch")
+async def start_batch(request: Request, reader: str = ANY_READER, format: str = FORMAT_FRAMED):
+    """Start writing a list of hex payloads to successive new tags
+    
+    The body is JSON ({"payloads": [...], "format": "framed"}), CSV
+    (text/csv), JSONL (application/x-ndjson) or one hex string per line
+    (text/plain). Payloads are encoded like /write-pk; the format comes
+    from the JSON body or the format query parameter. The whole batch
+    runs on one reader, picked when it starts.
+    """
+    global batch, batch_task
+    if batch_task and not batch_task.done():
+        raise HTTPException(status_code=409, detail="A batch is already running")
+    slot = pick_reader(reader)
+    
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    try:
+        body = (await request.body()).decode()
+        if content_type == "application/json":
+            body = json.loads(body)
+            hex_payloads = body["payloads"]
+            format = body.get("format", format)
+        elif content_type == "text/csv":
+            hex_payloads = parse_payloads(body, "csv")
+        elif content_type in ("application/x-ndjson", "application/jsonl"):
+            hex_payloads = parse_payloads(body, "jsonl")
+        else:
+            hex_payloads = parse_payloads(body)
+        if not hex_payloads:
+            raise ValueError("No payloads provided")
+        batch = BatchProvisioner(hex_payloads, os.path.join(DATA_DIR, "batch-progress.json"),
+                                 tag_ids=tag_ids, fmt=format)
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch: {str(e)}")
+    
+    batch_task = asyncio.create_task(run_batch(batch, slot))
+    return batch.report()
+
+@app.get("/batch")
+async def batch_status():
+    """Progress, tags/minute, latency percentiles and failures of the current batch"""
+    if not batch:
+        raise HTTPException(status_code=404, detail="No batch has been started")
+    return batch.report()
+
+@app.delete("/batch")
+async def stop_batch():
+    """Stop the current batch; its progress is kept for a later restart"""
+    if not batch:
+        raise HTTPException(status_code=404, detail="No batch has been started")
+    if batch_task:
+        batch_task.cancel()
+    return batch.report()
+
+@app.get("/health")
+async def health(response: Response):
+    """Reader connection state and last successful frame; 503 when no reader is up"""
+    readers = {slot.name: slot.pn532.health() for slot in pool}
+    ready = sum(1 for reader in readers.values() if reader["state"] == "ready")
+    if not ready:
+        response.status_code = 503
+    return {
+        "status": "ok" if ready == len(readers) else "degraded",
+        "readers_ready": ready,
+        "readers": readers,
+    }
+
+@app.get("/readers")
+async def readers_status():
+    """Per-reader connection state, queue, tag presence and request counts/latency"""
+    return pool.stats()
+
+@app.get("/config/rf")
+async def rf_config():
+    """RF settings (RFConfiguration retries and timeouts, polling, deadlines) of each reader"""
+    return {slot.name: slot.rf.as_dict() for slot in pool}
+
+@app.put("/config/rf")
+async def update_rf_config(request: Request, reader: Optional[str] = None):
+    """Change RF settings of one reader, or all readers without ?reader=
+    
+    The body is a JSON object with the fields to change. They are sent
+    to the PN532 right away, kept across reconnects, and not written
+    back to NFC_RF_CONFIG.
+    """
+    slots = [pick_reader(reader)] if reader else list(pool)
+    try:
+        values = await request.json()
+        if not isinstance(values, dict):
+            raise ValueError("Expected a JSON object of settings")
+        updated = [(slot, slot.rf.copy().update(values)) for slot in slots]
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid RF settings: {str(e)}")
+    
+    for slot, settings in updated:
+        slot.configure(settings)
+        try:
+            await slot.run("configure", apply_rf_settings, slot.pn532, settings, priority=PRIORITY_WRITE)
+        except ReaderUnavailableError as e:
+            # Stored all the same, the next connect sends it
+            log.warning("[%s] RF settings saved, reader unavailable: %s", slot.name, e)
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+    return {slot.name: slot.rf.as_dict() for slot in slots}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrics: frame, page, tag wait and request histograms, counters, reader gauges"""
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (NFC_METRICS=0)")
+    metrics.READER_STATE.clear()
+    for slot in pool:
+        health = slot.pn532.health()
+        for state in ("disconnected", "ready", "recovering"):
+            metrics.READER_STATE.set(1 if health["state"] == state else 0, reader=slot.name, state=state)
+        metrics.READER_UP.set(1 if health["state"] == "ready" else 0, reader=slot.name)
+        metrics.QUEUE_DEPTH.set(slot.hardware.stats()["queue_depth"], reader=slot.name)
+        metrics.TAG_PRESENT.set(1 if slot.tracker and slot.tracker.current else 0, reader=slot.name)
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/trace")
+async def debug_trace(limit: int = 50, format: str = "json"):
+    """The last limit traced operations with their spans, newest first
+    
+    format=chrome returns Chrome trace events instead, for
+    chrome://tracing or ui.perfetto.dev.
+    """
+    if not tracing.ENABLED:
+        raise HTTPException(status_code=404, detail="Tracing is disabled (NFC_TRACE=0)")
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    operations = tracing.recent(limit)
+    if format == "chrome":
+        return tracing.chrome_trace(operations)
+    if format != "json":
+        raise HTTPException(status_code=400, detail=f"Unknown format {format!r}, expected json or chrome")
+    return {
+        "capacity": tracing.CAPACITY,
+        "operations": [op.as_dict() for op in reversed(operations)],
+    }
+
+@app.get("/scans")
+async def scans(uid: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+                outcome: Optional[str] = None, limit: int = 100, payloads: bool = False):
+    """Logged scans newest first, by UID and time range
+    
+    since and until are Unix seconds or ISO 8601 times. payloads=true
+    adds each scan's payload in hex. Scans show up about a second after
+    they happen, once the writer has stored them.
+    """
+    if not scan_log.enabled:
+        raise HTTPException(status_code=404, detail="The scan log is disabled (NFC_SCAN_LOG=0)")
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000")
+    try:
+        since = scanlog.parse_time(since)
+        until = scanlog.parse_time(until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # The SD card may be slow; keep the query off the event loop
+    rows = await asyncio.to_thread(scan_log.query, uid, since, until, outcome, limit, payloads)
+    for row in rows:
+        if "payload" in row:
+            row["payload"] = row["payload"].hex() if row["payload"] is not None else None
+    return {"scans": rows, "log": scan_log.stats()}
+
+@app.get("/queue")
+async def queue_status():
+    """Job queue depth, wait times and coalescing counters of each reader"""
+    return {slot.name: slot.hardware.stats() for slot in pool}
+
+@app.get("/cache")
+async def cache_status():
+    """Tag content cache size and hit/miss counters"""
+    return tag_cache.stats()
+
+def subscribe_all():
+    """One event queue fed by the trackers of all readers"""
+    events = None
+    for slot in pool:
+        events = slot.tracker.subscribe(events)
+    return events
+
+def unsubscribe_all(events):
+    for slot in pool:
+        slot.tracker.unsubscribe(events)
+
+@app.get("/events")
+async def tag_events():
+    """Server-Sent Events stream of tag_arrived / tag_removed events from every reader"""
+    events = subscribe_all()
+    
+    async def stream():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            unsubscribe_all(events)
+    
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+@app.websocket("/ws/events")
+async def tag_events_ws(websocket: WebSocket):
+    """WebSocket stream of tag_arrived / tag_removed events from every reader"""
+    await websocket.accept()
+    events = subscribe_all()
+    try:
+        while True:
+            await websocket.send_json(await events.get())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        unsubscribe_all(events)
+
+@app.on_event("startup")
+async def startup_event():
+    """Start each reader's worker thread and presence tracker
+    
+    Readers connect on their workers in the background, so startup never
+    waits for a PN532.
+    """
+    global GPIO
+    try:
+        GPIO = open_gpio()
+        GPIO.setmode(GPIO.BCM)
+        for slot in pool:
+            if slot.led_pin is not None and slot.led_pin >= 0:
+                GPIO.setup(slot.led_pin, GPIO.OUT)
+                # Idle heartbeat, solid while busy, blink codes for success/timeout/error
+                slot.led = StatusLed(GPIO, slot.led_pin, name=f"led-{slot.name}")
+    except (ImportError, RuntimeError) as e:
+        log.warning("GPIO unavailable, LED disabled: %s", e)
+        GPIO = None
+    for slot in pool:
+        # Readers without an IRQ pin (or GPIO) keep polling for tags
+        if GPIO and slot.irq_pin is not None and slot.detector.enable_irq(GPIO, slot.irq_pin):
+            log.info("[%s] Waiting for tags on the PN532 IRQ line (GPIO %d)", slot.name, slot.irq_pin)
+    scan_log.start()
+    pool.start()
+    for slot in pool:
+        slot.tracker.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Cleanup GPIO on shutdown"""
-    GPIO.cleanup()
+    """Stop the presence trackers and reader workers, cleanup GPIO on shutdown"""
+    if batch_task:
+        batch_task.cancel()
+    for slot in pool:
+        await slot.tracker.stop()
+    pool.stop()
+    for slot in pool:
+        slot.detector.disable_irq()
+        if slot.led:
+            slot.led.stop()
+    if GPIO:
+        GPIO.cleanup()
+    scan_log.stop()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,186 @@
+"""Prometheus metrics for main.py, rendered in the text exposition format.
+
+A few counters, gauges and histograms with labels, small enough to not
+need prometheus_client. main.py serves them at /metrics and feeds them
+from the request handlers, the HTTP middleware and ManagedReader's call
+observer (every PN532 frame). NFC_METRICS=0 turns all of it into no-ops:
+nothing is observed and /metrics answers 404.
+"""
+import os
+import threading
+
+ENABLED = os.environ.get("NFC_METRICS", "1").strip().lower() not in ("0", "false", "no", "off")
+
+# Upper bounds in seconds
+FRAME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+WAIT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_COMMAND_NAMES = {
+    0x02: "GetFirmwareVersion",
+    0x14: "SAMConfiguration",
+    0x32: "RFConfiguration",
+    0x40: "InDataExchange",
+    0x4A: "InListPassiveTarget",
+    0x54: "InSelect",
+}
+_COMMAND_INDATAEXCHANGE = 0x40
+_STATUS_AUTH_ERROR = 0x14
+
+def percentiles(values, points=(50, 95, 99)):
+    """Nearest-rank percentiles, e.g. {"p50": ..., "p95": ..., "p99": ...}"""
+    if not values:
+        return {f"p{p}": None for p in points}
+    ordered = sorted(values)
+    result = {}
+    for p in points:
+        rank = max(1, -(-p * len(ordered) // 100))  # ceil(p/100 * n)
+        result[f"p{p}"] = ordered[rank - 1]
+    return result
+
+
+_registry = []
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}  # sorted label items -> value
+        _registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not ENABLED:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=WAIT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, count=1, **labels):
+        """Record count observations of value (count > 1 for per-page averages)"""
+        if not ENABLED:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += count
+                    break
+            series[1] += value * count
+            series[2] += count
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = {key: (list(s[0]), s[1], s[2]) for key, s in self._values.items()}
+        for labels, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+def render():
+    """Every metric in the Prometheus text format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Hot-path histograms
+TAG_WAIT = Histogram("nfc_tag_wait_seconds", "Time spent waiting for a tag to be presented", WAIT_BUCKETS)
+FRAME = Histogram("nfc_pn532_frame_seconds", "Duration of one PN532 command/response exchange", FRAME_BUCKETS)
+PAGE_READ = Histogram("nfc_page_read_seconds", "Time per 4-byte page read from a tag", FRAME_BUCKETS)
+PAGE_WRITE = Histogram("nfc_page_write_seconds", "Time per 4-byte page written to a tag", FRAME_BUCKETS)
+REQUEST = Histogram("nfc_http_request_seconds", "End-to-end HTTP request latency", WAIT_BUCKETS)
+
+# Counters
+READS = Counter("nfc_tag_reads_total", "Tag memory reads")
+WRITES = Counter("nfc_tag_writes_total", "Tag writes")
+TIMEOUTS = Counter("nfc_timeouts_total", "Requests that found no tag before their deadline (408)")
+EMPTY_TAGS = Counter("nfc_empty_tags_total", "Reads of tags without a payload (404)")
+BLOCK_ERRORS = Counter("nfc_block_errors_total", "Tag commands that were not answered (NAK, removed tag, I/O error)")
+AUTH_FAILURES = Counter("nfc_auth_failures_total", "Tag commands refused with an authentication error (PN532 status 0x14)")
+RESPONSES = Counter("nfc_http_responses_total", "HTTP responses by route and status")
+
+# Gauges, set when /metrics is scraped
+QUEUE_DEPTH = Gauge("nfc_queue_depth", "Jobs waiting for the reader's worker")
+READER_STATE = Gauge("nfc_reader_state", "1 for the reader's current state")
+READER_UP = Gauge("nfc_reader_up", "1 when the reader is connected")
+TAG_PRESENT = Gauge("nfc_tag_present", "1 while the presence tracker sees a tag")
+
+
+def observe_frame(reader, method, args, result, seconds, error=None):
+    """ManagedReader observer: time every PN532 call, count failed tag commands"""
+    command = args[0] if method == "call_function" and args else None
+    if command is None:
+        name = method
+    else:
+        name = _COMMAND_NAMES.get(command, f"0x{command:02X}")
+    FRAME.observe(seconds, reader=reader, command=name)
+    if error is not None:
+        BLOCK_ERRORS.inc(reader=reader, reason="io_error")
+    elif command == _COMMAND_INDATAEXCHANGE:
+        status = result[0] if result else None
+        if status == _STATUS_AUTH_ERROR:
+            AUTH_FAILURES.inc(reader=reader)
+        elif status != 0x00:
+            BLOCK_ERRORS.inc(reader=reader, reason="no_answer")
@@ -0,0 +1,90 @@
+"""NTAG2xx page access helpers shared by main.py and the scripts.
+
+The adafruit driver only exposes ``ntag2xx_read_block``, which sends one
+READ command per 4-byte page. These helpers talk to the tag through
+``pn532.call_function`` directly so a whole page range can come back in a
+single InDataExchange round-trip.
+"""
+from tracing import span
+
+PAGE_SIZE = 4  # NTAG2xx pages are 4 bytes
+USER_START_PAGE = 4  # First user-writable page on NTAG2xx / Ultralight
+
+_COMMAND_INDATAEXCHANGE = 0x40
+_NTAG_CMD_READ = 0x30  # Returns 16 bytes (4 pages), wraps past the last page
+_NTAG_CMD_FAST_READ = 0x3A  # Returns an arbitrary inclusive page range
+
+# A normal PN532 frame carries at most 255 bytes including TFI, command code
+# and the InDataExchange status byte, so one FAST_READ is capped at 60 pages
+# (240 bytes) to stay inside a single frame.
+MAX_FAST_READ_PAGES = 60
+READ_PAGES = 4
+
+
+def _data_exchange(pn532, params, response_length):
+    """Send an InDataExchange to target 1 and return the data, or None on error"""
+    response = pn532.call_function(
+        _COMMAND_INDATAEXCHANGE,
+        params=[0x01] + params,
+        response_length=response_length + 1,
+    )
+    # First byte is the PN532 status, 0x00 means the tag answered
+    if not response or response[0] != 0x00:
+        return None
+    return bytes(response[1:1 + response_length])
+
+
+def fast_read(pn532, start_page, end_page):
+    """FAST_READ pages start_page..end_page (inclusive) in one exchange"""
+    num_pages = end_page - start_page + 1
+    with span("fast_read", first_page=start_page, last_page=end_page):
+        return _data_exchange(
+            pn532,
+            [_NTAG_CMD_FAST_READ, start_page & 0xFF, end_page & 0xFF],
+            num_pages * PAGE_SIZE,
+        )
+
+
+def read_four_pages(pn532, start_page):
+    """READ 4 consecutive pages (16 bytes) in one exchange"""
+    with span("read", first_page=start_page):
+        return _data_exchange(pn532, [_NTAG_CMD_READ, start_page & 0xFF], READ_PAGES * PAGE_SIZE)
+
+
+def read_pages(pn532, start_page, num_pages):
+    """Read num_pages pages starting at start_page with as few exchanges as possible.
+
+    Uses FAST_READ in frame-sized chunks. A tag that rejects FAST_READ
+    (e.g. original Mifare Ultralight) drops back to IDLE, so it is
+    re-selected and the rest of the range is read with READ, which still
+    returns 4 pages per exchange. The result is shorter than requested if
+    the tag stops answering (NAKs) part way through; bus and reader errors
+    are raised, not taken for a NAK.
+    """
+    data = bytearray()
+    page = start_page
+    end = start_page + num_pages
+    use_fast_read = True
+
+    while page < end:
+        if use_fast_read:
+            count = min(MAX_FAST_READ_PAGES, end - page)
+            chunk = fast_read(pn532, page, page + count - 1)
+            if chunk is None:
+                # Tag NAKed FAST_READ, wake it up again and fall back to READ
+                use_fast_read = False
+                if not pn532.read_passive_target(timeout=0.5):
+                    break
+                continue
+        else:
+            count = min(READ_PAGES, end - page)
+            chunk = read_four_pages(pn532, page)
+            if chunk is None:
+                break
+            # READ always returns 4 pages, drop the extra ones on the last chunk
+            chunk = chunk[:count * PAGE_SIZE]
+
+        data.extend(chunk)
+        page += count
+
+    return data
@@ -0,0 +1,198 @@
+"""Several PN532 readers on one host, each with its own worker thread.
+
+Readers are listed in NFC_READERS as comma-separated name=backend
+entries with colon-separated options, e.g.
+
+    NFC_READERS="gate1=i2c,gate2=i2c:bus=3,gate3=uart:port=/dev/ttyUSB0,bench=sim:tags=ntag216"
+
+Without NFC_READERS there is a single reader named "reader0" on the
+NFC_BACKEND backend (and NFC_IRQ_PIN), which is how main.py always worked.
+RF settings (see rfconfig.py) can be given per reader as options too,
+e.g. gate1=i2c:mx_rty_passive_activation=16:field_off_idle=true. Every reader
+gets a ManagedReader and a HardwareWorker of its own, so a slow or
+recovering reader only holds up the requests routed to it.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from detect import TagDetector
+from hardware import HardwareWorker
+from metrics import percentiles
+from reader import BACKENDS, ManagedReader, default_options
+from rfconfig import FIELDS as RF_FIELDS, apply_rf_settings, load_rf_settings
+from tracing import annotate, record
+
+READERS_ENV = "NFC_READERS"
+DEFAULT_READER = "reader0"
+ANY_READER = "any"
+
+# Per-reader latency samples kept for the percentiles in stats()
+_LATENCY_WINDOW = 1000
+
+
+def parse_reader_specs(text):
+    """Parse NFC_READERS into [(name, backend, options)]"""
+    specs = []
+    for entry in text.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, sep, spec = entry.partition("=")
+        if not sep or not name.strip():
+            raise ValueError(f"Reader entry {entry!r} should look like name=backend[:option=value...]")
+        backend, *option_parts = spec.split(":")
+        backend = backend.strip().lower()
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r} for reader {name.strip()!r}, "
+                             f"expected one of {', '.join(BACKENDS)}")
+        options = {}
+        for part in option_parts:
+            key, sep, value = part.partition("=")
+            if not sep:
+                raise ValueError(f"Reader option {part!r} in {entry!r} should look like option=value")
+            options[key.strip()] = value.strip()
+        specs.append((name.strip(), backend, options))
+    names = [name for name, _, _ in specs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Reader names must be unique: {', '.join(names)}")
+    return specs
+
+
+class ReaderSlot:
+    """One reader: its PN532, worker thread, LED pin and request metrics"""
+
+    def __init__(self, name, backend=None, options=None):
+        options = dict(options or {})
+        self.name = name
+        # Optional per-reader LED, e.g. led=27; -1 turns it off
+        self.led_pin = int(options.pop("led")) if "led" in options else None
+        # Optional IRQ pin, e.g. irq=25; stays in options so the simulator can wire it
+        self.irq_pin = int(options["irq"]) if options.get("irq") else None
+        # RF settings, sent to the PN532 on every (re)connect
+        self.rf = load_rf_settings({key: options.pop(key) for key in list(options) if key in RF_FIELDS})
+        self.pn532 = ManagedReader(backend, dict(options, name=name), setup=self._apply_rf)
+        self.detector = TagDetector(self.pn532, self.rf)  # Polls until main.py enables the IRQ
+        self.hardware = HardwareWorker(name=f"pn532-{name}")
+        self.tracker = None  # Set by main.py, it needs the poll function
+        self.led = None  # status_led.StatusLed, set by main.py when there is GPIO
+        self._lock = threading.Lock()
+        self._ops = {}  # op -> {"ok": n, "errors": n}
+        self._latencies = {}  # op -> deque of milliseconds
+
+    def _apply_rf(self, driver):
+        apply_rf_settings(driver, self.rf)
+
+    def configure(self, settings):
+        """Use settings from now on (the caller sends them to the PN532)"""
+        self.rf = settings
+        self.detector.settings = settings
+
+    @property
+    def load(self):
+        """Queued plus running jobs, used to pick the least busy reader"""
+        stats = self.hardware.stats()
+        return stats["queue_depth"] + (1 if stats["running"] else 0)
+
+    @property
+    def ready(self):
+        return self.pn532.state == "ready"
+
+    async def run(self, op, fn, *args, **kwargs):
+        """hardware.run with the outcome and latency recorded under op"""
+        start = time.perf_counter()
+        annotate(reader=self.name, op=op)
+
+        def job(*job_args):
+            # The time spent waiting for the worker shows up in the trace
+            record("queue", start, time.perf_counter())
+            return fn(*job_args)
+
+        ok = False
+        try:
+            result = await self.hardware.run(job, *args, **kwargs)
+            ok = True
+            return result
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                counts = self._ops.setdefault(op, {"ok": 0, "errors": 0})
+                counts["ok" if ok else "errors"] += 1
+                if ok:
+                    self._latencies.setdefault(op, deque(maxlen=_LATENCY_WINDOW)).append(elapsed)
+
+    def stats(self):
+        with self._lock:
+            ops = {
+                op: dict(counts, latency_ms={k: v and round(v, 2) for k, v in
+                                             percentiles(list(self._latencies.get(op, ()))).items()})
+                for op, counts in self._ops.items()
+            }
+        return {
+            "name": self.name,
+            "reader": self.pn532.health(),
+            "queue": self.hardware.stats(),
+            "tag_present": bool(self.tracker and self.tracker.current),
+            "detection": self.detector.mode,
+            "ops": ops,
+        }
+
+
+class ReaderPool:
+    """The readers of this host, by name"""
+
+    def __init__(self, specs=None):
+        if specs is None:
+            text = os.environ.get(READERS_ENV, "")
+            specs = parse_reader_specs(text) if text.strip() else [(DEFAULT_READER, None, default_options())]
+        if not specs:
+            raise ValueError("No readers configured")
+        self.readers = {name: ReaderSlot(name, backend, options) for name, backend, options in specs}
+        self._next = 0
+
+    def __iter__(self):
+        return iter(self.readers.values())
+
+    def __len__(self):
+        return len(self.readers)
+
+    @property
+    def default(self):
+        return next(iter(self.readers.values()))
+
+    def get(self, name):
+        """The named reader; raises KeyError for unknown names"""
+        if name not in self.readers:
+            raise KeyError(f"Unknown reader {name!r}, expected one of {', '.join(self.readers)} or {ANY_READER}")
+        return self.readers[name]
+
+    def pick(self, name=None):
+        """Route a request: the named reader, or for "any" the best free one
+
+        "any" prefers a reader that already has a tag in its field, then
+        the least loaded connected reader, rotating between equals so
+        requests spread over the pool.
+        """
+        if name and name != ANY_READER:
+            return self.get(name)
+        slots = list(self.readers.values())
+        with_tag = [s for s in slots if s.tracker and s.tracker.current]
+        if with_tag:
+            return min(with_tag, key=lambda s: s.load)
+        self._next = (self._next + 1) % len(slots)
+        rotated = slots[self._next:] + slots[:self._next]
+        return min(rotated, key=lambda s: (not s.ready, s.load))
+
+    def start(self):
+        for slot in self:
+            slot.hardware.start()
+            # Connect in the background on the reader's own thread
+            slot.hardware.submit(slot.pn532.connect)
+
+    def stop(self):
+        for slot in self:
+            slot.hardware.stop()
+
+    def stats(self):
+        return {slot.name: slot.stats() for slot in self}
@@ -0,0 +1,137 @@
+"""Background tag-presence tracker for main.py.
+
+Polls the reader through the hardware worker at the lowest priority, keeps
+track of the tag currently in the field and publishes tag_arrived /
+tag_removed events. Subscribers only read from in-memory queues, so any
+number of dashboards can listen without adding I2C traffic.
+"""
+import logging
+import asyncio
+import time
+
+from hardware import PRIORITY_POLL, QueueFullError
+from reader import ReaderUnavailableError
+
+log = logging.getLogger(__name__)
+
+
+class PresenceTracker:
+    """Turn periodic reader polls into tag_arrived / tag_removed events"""
+
+    def __init__(self, hardware, poll_fn, interval=0.2, removal_misses=2, max_backlog=100,
+                 on_removed=None, name=None, present_interval=None):
+        """poll_fn(known_uid) runs on the hardware worker and returns
+        (uid, payload): uid is None when no tag answered, payload is only
+        read (and not None) when uid differs from known_uid.
+        present_interval, if given, is the poll interval while a tag is
+        present, for poll functions whose removal check is cheap.
+        on_removed(uid_hex) is called whenever a tag leaves the field.
+        name, if given, is added to every event as "reader".
+        """
+        self._hardware = hardware
+        self._poll_fn = poll_fn
+        self._interval = interval
+        self._present_interval = interval if present_interval is None else present_interval
+        self._removal_misses = removal_misses  # Consecutive empty polls before a tag counts as removed
+        self._max_backlog = max_backlog
+        self._on_removed = on_removed
+        self._name = name
+        self._subscribers = set()
+        self._task = None
+        self._uid = None
+        self.current = None  # The last tag_arrived event while the tag is present
+
+    def start(self):
+        """Start polling (must be called from the running event loop)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def subscribe(self, events=None):
+        """Return a queue that receives every future event
+
+        If a tag is in the field, its tag_arrived event is queued first.
+        Passing the queue from another tracker merges both streams.
+        """
+        if events is None:
+            events = asyncio.Queue(maxsize=self._max_backlog)
+        if self.current:
+            events.put_nowait(self.current)
+        self._subscribers.add(events)
+        return events
+
+    def unsubscribe(self, events):
+        self._subscribers.discard(events)
+
+    def _publish(self, event):
+        for events in self._subscribers:
+            # A slow subscriber loses its oldest events rather than stalling the rest
+            if events.full():
+                events.get_nowait()
+            events.put_nowait(event)
+
+    async def _run(self):
+        misses = 0
+        while True:
+            try:
+                uid, payload = await self._hardware.run(
+                    self._poll_fn, self._uid, priority=PRIORITY_POLL, key="presence-poll")
+            except QueueFullError:
+                # Requests are waiting for the reader, let them go first
+                await asyncio.sleep(self._interval)
+                continue
+            except ReaderUnavailableError as e:
+                # Polling again before the reconnect is due would only fail again
+                await asyncio.sleep(max(self._interval, e.retry_after))
+                continue
+            except Exception as e:
+                log.warning("Presence poll failed: %s", e)
+                await asyncio.sleep(self._interval)
+                continue
+
+            if uid and uid == self._uid:
+                misses = 0
+            elif uid:
+                if self._uid:
+                    self._tag_removed()
+                self._uid = uid
+                misses = 0
+                self.current = self._event({
+                    "event": "tag_arrived",
+                    "uid": uid.hex().upper(),
+                    "hex_data": payload.hex() if payload else "",
+                    "timestamp": time.time(),
+                })
+                self._publish(self.current)
+            elif self._uid:
+                misses += 1
+                if misses >= self._removal_misses:
+                    self._tag_removed()
+
+            await asyncio.sleep(self._present_interval if self._uid else self._interval)
+
+    def _event(self, event):
+        if self._name:
+            event["reader"] = self._name
+        return event
+
+    def _tag_removed(self):
+        event = self._event({
+            "event": "tag_removed",
+            "uid": self._uid.hex().upper(),
+            "timestamp": time.time(),
+        })
+        self._uid = None
+        self.current = None
+        if self._on_removed:
+            self._on_removed(event["uid"])
+        self._publish(event)
@@ -1,19 +1,32 @@
-import board
-import busio
-from digitalio import DigitalInOut
-from adafruit_pn532.i2c import PN532_I2C
-import RPi.GPIO as GPIO
 import time
 
+import scanlog
+from detect import open_detector
+from framing import read_payload
+from ntag import PAGE_SIZE, USER_START_PAGE
+from reader import open_gpio, open_pn532
+from status_led import BUSY, ERROR, SUCCESS, StatusLed
+from tagid import TagIdentifier
+from tracing import log, setup_logging
+
 LED_PIN = 17  # GPIO pin connected to LED
 
-# Initialize I2C communication
-i2c = busio.I2C(board.SCL, board.SDA)
-pn532 = PN532_I2C(i2c, debug=False)
+# Per-block lines are logged at DEBUG, NFC_LOG_LEVEL=DEBUG shows them
+setup_logging()
+
+# Initialize the PN532 (I2C, or the simulator with NFC_BACKEND=sim)
+pn532 = open_pn532()
 
+GPIO = open_gpio()
 GPIO.setmode(GPIO.BCM)  # Use BCM GPIO numbering
 GPIO.setup(LED_PIN, GPIO.OUT)  # Set pin as output
 
+# Heartbeat while idle, solid while a tag is handled, blink codes for the outcome
+led = StatusLed(GPIO, LED_PIN)
+
+# Wait for tags on the PN532 IRQ line when NFC_IRQ_PIN is set, polling otherwise
+detector = open_detector(pn532, GPIO)
+
 # Get firmware version
 ic, ver, rev, support = pn532.firmware_version
 print(f"Found PN532 with firmware version: {ver}.{rev}")
@@ -21,76 +34,62 @@ print(f"Found PN532 with firmware version: {ver}.{rev}")
 # Configure PN532 to read RFID/NFC tags
 pn532.SAM_configuration()
 
+# Tag type per UID, so presenting the same tag again skips the probing
+tag_ids = TagIdentifier()
+
+# Every read goes to the scan log (scans.db, shared with main.py)
+scan_log = scanlog.open_scan_log()
+
 print("Waiting for an NFC tag to read hex data...")
 
 while True:
-    uid = pn532.read_passive_target(timeout=0.5)
-    if uid:
+    target = detector.wait(timeout=0.5)
+    if target:
+        uid = target.uid
         print(f"Found NFC card with UID: {uid.hex().upper()}")
-        GPIO.output(LED_PIN, GPIO.HIGH)
-        time.sleep(0.5)
-        
-        # Read hex data from blocks starting at block 4
-        read_data = bytearray()
+        led.set(BUSY)
+        start = time.perf_counter()
         
         try:
-            # Read user data blocks directly (simplified for hex string reading)
-            blocks_to_read = 16  # Read up to 64 bytes (16 blocks * 4 bytes each)
-            successful_reads = 0
+            # Exact size from tag identification
+            info = tag_ids.identify(pn532, target)
+            print(f"Tag type: {info.tag_type} ({info.user_bytes} bytes user memory)")
+            if info.family not in ("ntag", "ultralight"):
+                raise RuntimeError(f"{info.tag_type} is not an NTAG2xx/Ultralight tag")
             
             print("Reading hex data blocks:")
-            for block_num in range(4, 4 + blocks_to_read):
-                try:
-                    block_data = pn532.ntag2xx_read_block(block_num)
-                    if block_data:
-                        print(f"Block {block_num}: {block_data.hex()}")
-                        read_data.extend(block_data)
-                        successful_reads += 1
-                        
-                        # Check if we've hit all null bytes (end of data)
-                        if block_data == b'\x00\x00\x00\x00':
-                            print(f"Reached end of data at block {block_num}")
-                            break
-                    else:
-                        print(f"Failed to read block {block_num} - returned None")
-                        break
-                except Exception as e:
-                    print(f"Error reading block {block_num}: {e}")
-                    # Try to continue reading other blocks
-                    continue
+            # Header page first, then exactly the stored length in bulk
+            read_data, fmt, page_data = read_payload(pn532, info.user_pages)
+            for offset in range(0, len(page_data), PAGE_SIZE):
+                block_num = USER_START_PAGE + offset // PAGE_SIZE
+                log.debug("Block %d: %s", block_num, page_data[offset:offset + PAGE_SIZE].hex())
+            successful_reads = len(page_data) // PAGE_SIZE
             
             if read_data:
-                # Remove trailing null bytes (padding)
-                while read_data and read_data[-1] == 0:
-                    read_data.pop()
+                # Convert to hex string
+                hex_string = read_data.hex()
                 
-                if read_data:
-                    # Convert to hex string (preserving original case)
-                    hex_string = read_data.hex()
-                    
-                    print(f"\n--- HEX DATA RESULTS ---")
-                    print(f"Total bytes read: {len(read_data)}")
-                    print(f"Successful block reads: {successful_reads}")
-                    print(f"Original hex string: {hex_string}")
-                    print(f"Hex string length: {len(hex_string)} characters")
-                    
-                else:
-                    print("No valid hex data found (all null bytes)")
+                print(f"\n--- HEX DATA RESULTS ---")
+                print(f"Format: {fmt}")
+                print(f"Total bytes read: {len(read_data)}")
+                print(f"Successful block reads: {successful_reads}")
+                print(f"Original hex string: {hex_string}")
+                print(f"Hex string length: {len(hex_string)} characters")
             else:
-                print("No data could be read from the tag")
+                print("No valid hex data found (empty payload or all null bytes)")
+            scan_log.record(scanlog.OK if read_data else scanlog.EMPTY, uid=uid.hex().upper(), source="read-pk.py",
+                            tag_type=info.tag_type, fmt=fmt, payload=read_data, duration=time.perf_counter() - start)
+            led.set(SUCCESS)
                 
         except Exception as e:
             print(f"Error reading NFC tag: {e}")
+            scan_log.record(scanlog.ERROR, uid=uid.hex().upper(), source="read-pk.py",
+                            duration=time.perf_counter() - start, detail=str(e))
+            led.set(ERROR)
         
-        GPIO.output(LED_PIN, GPIO.LOW)
         print("\nRead complete! Remove the NFC tag.")
         
         # Wait for card to be removed before starting next cycle
         print("Waiting for card to be removed...")
-        while True:
-            check_uid = pn532.read_passive_target(timeout=0.5)
-            if not check_uid:
-                print("Card removed! Ready for next tag.")
-                time.sleep(1)  # Brief pause before starting next cycle
-                break
-            time.sleep(0.2)  # Small delay before checking again
+        detector.wait_removed()
+        print("Card removed! Ready for next tag.")
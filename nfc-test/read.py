@@ -1,18 +1,38 @@
-import board
-import busio
-from adafruit_pn532.i2c import PN532_I2C
-import RPi.GPIO as GPIO
+import argparse
+import os
 import time
 
+import scanlog
+from classic import KeyCache, authenticate_sector, format_key, load_key_file, read_sector
+from detect import open_detector
+from ntag import PAGE_SIZE, USER_START_PAGE, read_pages
+from reader import open_gpio, open_pn532
+from status_led import BUSY, ERROR, SUCCESS, StatusLed
+from tagid import TagIdentifier
+from tracing import log, setup_logging
+
 LED_PIN = 17  # GPIO pin connected to LED
 
-# Initialize I2C communication
-i2c = busio.I2C(board.SCL, board.SDA)
-pn532 = PN532_I2C(i2c, debug=False)
+# Per-block lines are logged at DEBUG, NFC_LOG_LEVEL=DEBUG shows them
+setup_logging()
+
+parser = argparse.ArgumentParser(description="Read NTAG2xx and Mifare Classic tags")
+parser.add_argument("--keys", help="Extra Mifare Classic keys, one 12-digit hex key per line")
+args = parser.parse_args()
+
+# Initialize the PN532 (I2C, or the simulator with NFC_BACKEND=sim)
+pn532 = open_pn532()
 
+GPIO = open_gpio()
 GPIO.setmode(GPIO.BCM)  # Use BCM GPIO numbering
 GPIO.setup(LED_PIN, GPIO.OUT)  # Set pin as output
 
+# Heartbeat while idle, solid while a tag is handled, blink codes for the outcome
+led = StatusLed(GPIO, LED_PIN)
+
+# Wait for tags on the PN532 IRQ line when NFC_IRQ_PIN is set, polling otherwise
+detector = open_detector(pn532, GPIO)
+
 # Get firmware version
 ic, ver, rev, support = pn532.firmware_version
 print(f"Found PN532 with firmware version: {ver}.{rev}")
@@ -20,31 +40,34 @@ print(f"Found PN532 with firmware version: {ver}.{rev}")
 # Configure PN532 to read RFID/NFC tags
 pn532.SAM_configuration()
 
-# Default keys for Mifare Classic authentication
-# Many Mifare Classic cards use these default keys
-DEFAULT_KEYS = [
-    [0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF],  # Factory default key
-    [0xA0, 0xA1, 0xA2, 0xA3, 0xA4, 0xA5],  # Common alternative key
-    [0xD3, 0xF7, 0xD3, 0xF7, 0xD3, 0xF7],  # Another common key
-    [0x00, 0x00, 0x00, 0x00, 0x00, 0x00]   # All zeros key
-]
+# Remembers which key opened each sector, so repeat reads skip failed attempts
+key_cache = KeyCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), "mifare-keys.json"))
+if args.keys:
+    key_cache.add_keys(load_key_file(args.keys))
 
-def read_ntag2xx(uid):
+# Tag type per UID, so presenting the same tag again skips the probing
+tag_ids = TagIdentifier()
+
+# Every read goes to the scan log (scans.db, shared with main.py)
+scan_log = scanlog.open_scan_log()
+
+def read_ntag2xx(info):
     """Read data from NTAG2xx tags (like NTAG213/215/216)"""
-    print("Reading NTAG2xx tag...")
+    print(f"Reading {info.tag_type} tag...")
     
-    # Read blocks starting from block 4 (first user writable block in most NTAG)
-    num_blocks_to_read = 8
+    # Read the whole user memory, starting from block 4 (first user writable block)
+    num_blocks_to_read = info.user_pages
     all_data = bytearray()
     
-    for block_number in range(4, 4 + num_blocks_to_read):
-        try:
-            block_data = pn532.ntag2xx_read_block(block_number)
-            print(f"Block {block_number}: {block_data}")
-            all_data.extend(block_data)
-        except Exception as e:
-            print(f"Error reading block {block_number}: {e}")
-            break
+    page_data = read_pages(pn532, USER_START_PAGE, num_blocks_to_read)
+    for offset in range(0, len(page_data), PAGE_SIZE):
+        block_number = USER_START_PAGE + offset // PAGE_SIZE
+        block_data = page_data[offset:offset + PAGE_SIZE]
+        log.debug("Block %d: %s", block_number, block_data)
+        all_data.extend(block_data)
+    
+    if len(page_data) < num_blocks_to_read * PAGE_SIZE:
+        print(f"Error reading block {USER_START_PAGE + len(page_data) // PAGE_SIZE}")
     
     # Convert bytes to string and strip null bytes
     try:
@@ -52,117 +75,79 @@ def read_ntag2xx(uid):
         print(f"\nComplete data read: {data_string}")
     except UnicodeDecodeError:
         print(f"\nRaw data (not ASCII): {all_data}")
+    return bytes(all_data)
 
-def read_mifare_classic(uid):
+def read_mifare_classic(info):
     """Read data from Mifare Classic cards"""
-    print("Reading Mifare Classic card...")
-    
-    # Check card size based on UID
-    if len(uid) == 4:
-        # Mifare Classic 1K has 16 sectors with 4 blocks each
-        num_sectors = 16
-        print("Detected Mifare Classic 1K")
-    elif len(uid) == 7:
-        # Mifare Classic 4K has 40 sectors
-        num_sectors = 40
-        print("Detected Mifare Classic 4K")
-    else:
-        print(f"Unknown Mifare card type with UID length: {len(uid)}")
-        num_sectors = 16  # Default to 1K
+    print(f"Reading {info.tag_type} card...")
     
+    uid = info.uid
+    num_sectors = info.sectors
+    family = info.key_family
     all_data = []
+    total_attempts = 0
     
     # Iterate through sectors
     for sector in range(num_sectors):
         print(f"\nSector {sector}:")
         
-        # Determine block range for this sector
-        if sector < 32:
-            # First 32 sectors have 4 blocks each
-            blocks_in_sector = 4
-            first_block = sector * 4
-        else:
-            # Last 8 sectors have 16 blocks each (Mifare Classic 4K only)
-            blocks_in_sector = 16
-            first_block = 128 + (sector - 32) * 16
-        
-        # Try each key until one works for this sector
-        authenticated = False
-        key_used = None
-        
-        for key in DEFAULT_KEYS:
-            try:
-                # Try to authenticate with key A
-                if pn532.mifare_classic_authenticate_block(
-                    uid, first_block, 0x60, key):
-                    authenticated = True
-                    key_used = "A: " + " ".join([hex(k)[2:].zfill(2) for k in key])
-                    break
-            except Exception:
-                pass
-            
-            try:
-                # Try to authenticate with key B
-                if pn532.mifare_classic_authenticate_block(
-                    uid, first_block, 0x61, key):
-                    authenticated = True
-                    key_used = "B: " + " ".join([hex(k)[2:].zfill(2) for k in key])
-                    break
-            except Exception:
-                pass
+        # Try cached keys first, then the rest of the dictionary
+        key, key_type, attempts = authenticate_sector(pn532, uid, sector, family, key_cache)
+        total_attempts += attempts
         
-        if not authenticated:
+        if key is None:
             print(f"  Authentication failed for sector {sector}")
             continue
         
-        print(f"  Authenticated with key {key_used}")
+        print(f"  Authenticated with key {format_key(key, key_type)}")
         
         # Read blocks in this sector (skip the sector trailer for safety)
-        for i in range(blocks_in_sector - 1):
-            block = first_block + i
-            try:
-                data = pn532.mifare_classic_read_block(block)
-                hex_data = ' '.join([hex(b)[2:].zfill(2) for b in data])
-                
-                # Try to interpret as ASCII
-                try:
-                    ascii_data = ''.join([chr(b) if 32 <= b <= 126 else '.' for b in data])
-                except:
-                    ascii_data = "....."
-                
-                print(f"  Block {block}: {hex_data} | {ascii_data}")
-                all_data.append((block, data, ascii_data))
-            except Exception as e:
-                print(f"  Error reading block {block}: {e}")
+        for block, data in read_sector(pn532, sector):
+            if data is None:
+                print(f"  Error reading block {block}")
+                continue
+            hex_data = ' '.join([hex(b)[2:].zfill(2) for b in data])
+            
+            # Try to interpret as ASCII
+            ascii_data = ''.join([chr(b) if 32 <= b <= 126 else '.' for b in data])
+            
+            print(f"  Block {block}: {hex_data} | {ascii_data}")
+            all_data.append((block, data, ascii_data))
+    
+    print(f"\n{total_attempts} authentication attempts for {num_sectors} sectors")
+    key_cache.save()
+    return b"".join(data for _, data, _ in all_data)
 
 print("\nNFC Tag Reader")
 print("Waiting for an NFC tag...")
 
 while True:
     # Try to read a tag
-    uid = pn532.read_passive_target(timeout=0.5)
+    target = detector.wait(timeout=0.5)
     
-    if uid:
-        print(f"\nFound NFC card with UID: {uid.hex().upper()}")
-        GPIO.output(LED_PIN, GPIO.HIGH)
+    if target:
+        print(f"\nFound NFC card with UID: {target.uid.hex().upper()}")
+        led.set(BUSY)
+        start = time.perf_counter()
         
-        # Detect card type based on UID length and attempt to read
-        if len(uid) == 7:
-            # NTAG2xx typically has 7-byte UIDs
-            read_ntag2xx(uid)
-        elif len(uid) == 4 or len(uid) == 7:
-            # Mifare Classic 1K has 4-byte UIDs, Mifare Classic 4K can have 7-byte UIDs
-            read_mifare_classic(uid)
+        # Identify the card from SAK/ATQA and GET_VERSION, then read its full user memory
+        info = tag_ids.identify(pn532, target)
+        print(f"Tag type: {info.tag_type} (ATQA {info.atqa:04X}, SAK {info.sak:02X}, {info.user_bytes} bytes user memory)")
+        data = None
+        if info.family in ("ntag", "ultralight"):
+            data = read_ntag2xx(info)
+        elif info.family == "classic":
+            data = read_mifare_classic(info)
         else:
-            print(f"Unknown card type with UID length: {len(uid)}")
+            print(f"Unsupported card type: {info.tag_type}")
+        scan_log.record(scanlog.UNSUPPORTED if data is None else scanlog.OK if data.strip(b"\x00") else scanlog.EMPTY,
+                        uid=target.uid.hex().upper(), source="read.py", tag_type=info.tag_type, payload=data,
+                        duration=time.perf_counter() - start)
+        led.set(SUCCESS if info.family in ("ntag", "ultralight", "classic") else ERROR)
         
-        GPIO.output(LED_PIN, GPIO.LOW)
         print("\nRemove the tag to read another...")
         
         # Wait until tag is removed
-        while pn532.read_passive_target(timeout=0.5):
-            time.sleep(0.1)
+        detector.wait_removed()
             
-        print("\nWaiting for next NFC tag...")
-    
-    time.sleep(0.1)  # Short delay to prevent CPU overuse
\ No newline at end of file
+        print("\nWaiting for next NFC tag...")
\ No newline at end of file
@@ -1,19 +1,33 @@
-import board
-import busio
-from digitalio import DigitalInOut
-from adafruit_pn532.i2c import PN532_I2C
-import RPi.GPIO as GPIO
 import time
 
+import scanlog
+from detect import open_detector
+from ntag import PAGE_SIZE, USER_START_PAGE, read_pages
+from reader import open_gpio, open_pn532
+from status_led import BUSY, ERROR, SUCCESS, StatusLed
+from tracing import log, setup_logging
+
 LED_PIN = 17  # GPIO pin connected to LED
 
-# Initialize I2C communication
-i2c = busio.I2C(board.SCL, board.SDA)
-pn532 = PN532_I2C(i2c, debug=False)
+# Per-block lines are logged at DEBUG, NFC_LOG_LEVEL=DEBUG shows them
+setup_logging()
+
+# Initialize the PN532 (I2C, or the simulator with NFC_BACKEND=sim)
+pn532 = open_pn532()
 
+GPIO = open_gpio()
 GPIO.setmode(GPIO.BCM)  # Use BCM GPIO numbering
 GPIO.setup(LED_PIN, GPIO.OUT)  # Set pin as output
 
+# Heartbeat while idle, solid while a tag is handled, blink codes for the outcome
+led = StatusLed(GPIO, LED_PIN)
+
+# Wait for tags on the PN532 IRQ line when NFC_IRQ_PIN is set, polling otherwise
+detector = open_detector(pn532, GPIO)
+
+# Every read goes to the scan log (scans.db, shared with main.py)
+scan_log = scanlog.open_scan_log()
+
 # Get firmware version
 ic, ver, rev, support = pn532.firmware_version
 print(f"Found PN532 with firmware version: {ver}.{rev}")
@@ -24,11 +38,12 @@ pn532.SAM_configuration()
 print("Waiting for an NFC tag to read...")
 
 while True:
-    uid = pn532.read_passive_target(timeout=0.5)
+    target = detector.wait(timeout=0.5)
+    uid = target.uid if target else None
     if uid:
         print(f"Found NFC card with UID: {uid.hex().upper()}")
-        GPIO.output(LED_PIN, GPIO.HIGH)
-        time.sleep(0.5)
+        led.set(BUSY)
+        start = time.perf_counter()
         
         # Read data from blocks starting at block 4
         # Assuming the data was written in the same format as write.py
@@ -37,18 +52,16 @@ while True:
         try:
             # Read multiple blocks to get the full message
             # Start from block 4 and read enough blocks to get the full message
-            for block_num in range(4, 8):  # Read blocks 4-7 (16 bytes total)
-                try:
-                    block_data = pn532.ntag2xx_read_block(block_num)
-                    if block_data:
-                        print(f"Block {block_num}: {block_data.hex()} -> {block_data}")
-                        read_data.extend(block_data)
-                    else:
-                        print(f"Failed to read block {block_num}")
-                        break
-                except Exception as e:
-                    print(f"Error reading block {block_num}: {e}")
-                    break
+            # Blocks 4-7 (16 bytes total) come back in a single exchange
+            page_data = read_pages(pn532, USER_START_PAGE, 4)
+            for offset in range(0, len(page_data), PAGE_SIZE):
+                block_num = USER_START_PAGE + offset // PAGE_SIZE
+                block_data = page_data[offset:offset + PAGE_SIZE]
+                log.debug("Block %d: %s -> %s", block_num, block_data.hex(), block_data)
+                read_data.extend(block_data)
+            
+            if len(page_data) < 4 * PAGE_SIZE:
+                print(f"Failed to read block {USER_START_PAGE + len(page_data) // PAGE_SIZE}")
             
             if read_data:
                 # Remove null padding and convert to string
@@ -69,10 +82,15 @@ while True:
                 print(f"Raw data: {read_data.hex()}")
             else:
                 print("No data could be read from the tag")
+            scan_log.record(scanlog.OK if read_data.strip(b"\x00") else scanlog.EMPTY, uid=uid.hex().upper(), source="read2.py",
+                            fmt="raw", payload=read_data, duration=time.perf_counter() - start)
+            led.set(SUCCESS)
                 
         except Exception as e:
             print(f"Error reading NFC tag: {e}")
+            scan_log.record(scanlog.ERROR, uid=uid.hex().upper(), source="read2.py",
+                            duration=time.perf_counter() - start, detail=str(e))
+            led.set(ERROR)
         
-        GPIO.output(LED_PIN, GPIO.LOW)
         print("Read complete! Remove the NFC tag.")
-        time.sleep(2)  # Wait before reading again
+        detector.wait_removed()  # Wait for the tag to be lifted before reading again
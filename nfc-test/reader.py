@@ -0,0 +1,306 @@
+"""Where the PN532 (and the LED GPIO) come from.
+
+main.py and the scripts call open_pn532() / open_gpio() instead of
+building PN532_I2C on busio themselves, so the backend can be swapped
+with the NFC_BACKEND environment variable:
+
+- i2c (default): adafruit PN532_I2C on the Raspberry Pi I2C bus
+- spi: adafruit PN532_SPI on the SPI0 bus
+- uart: adafruit PN532_UART on a serial port
+- sim: simulator.SimulatedPN532, configured with
+  NFC_SIM_TAGS="ntag215,classic-1k:DEADBEEF"  tags in the field from the start
+  NFC_SIM_SCRIPT="0=ntag213,5=,6=classic-4k"  arrivals/removals at seconds
+  NFC_SIM_FRAME_LATENCY=0.003  seconds per frame
+  NFC_SIM_BYTE_LATENCY=0.00009  seconds per byte on the bus
+  NFC_SIM_ERROR_RATE=0.01  fraction of frames that fail
+  NFC_SIM_SEED=1  makes UIDs and injected errors reproducible
+
+Each backend takes options, given per reader in NFC_READERS (see
+pool.py): i2c bus=<n> (extra buses need adafruit-extended-bus), spi
+cs=<board pin name>, uart port=<device> baudrate=<n>, sim tags=<a+b>
+seed/frame_latency/byte_latency/error_rate. Other backends can be added
+with register_backend. irq=<BCM pin> (NFC_IRQ_PIN for a single reader)
+names the GPIO wired to the PN532 IRQ output, see detect.py; the
+simulator wires its IRQ line to that pin of the simulated GPIO.
+
+ManagedReader wraps the PN532 for long-running processes: it connects
+on first use instead of at import, tracks the last successful frame, and
+after repeated I2C errors drops the driver and re-initializes it with
+exponential backoff.
+"""
+import logging
+import os
+import threading
+import time
+
+BACKEND_ENV = "NFC_BACKEND"
+DEFAULT_BACKEND = "i2c"
+IRQ_ENV = "NFC_IRQ_PIN"
+
+log = logging.getLogger(__name__)
+
+
+def _open_i2c(options):
+    import board
+    import busio
+    from adafruit_pn532.i2c import PN532_I2C
+
+    if "bus" in options:
+        # The PN532 I2C address is fixed, so a second module needs its own bus (/dev/i2c-<n>)
+        from adafruit_extended_bus import ExtendedI2C
+
+        i2c = ExtendedI2C(int(options["bus"]))
+    else:
+        i2c = busio.I2C(board.SCL, board.SDA)
+    return PN532_I2C(i2c, debug=False)
+
+
+def _open_spi(options):
+    import board
+    import busio
+    from digitalio import DigitalInOut
+    from adafruit_pn532.spi import PN532_SPI
+
+    spi = busio.SPI(board.SCK, board.MOSI, board.MISO)
+    cs = DigitalInOut(getattr(board, options.get("cs", "D5")))
+    return PN532_SPI(spi, cs, debug=False)
+
+
+def _open_uart(options):
+    import serial
+    from adafruit_pn532.uart import PN532_UART
+
+    uart = serial.Serial(options.get("port", "/dev/ttyS0"),
+                         baudrate=int(options.get("baudrate", 115200)), timeout=0.1)
+    return PN532_UART(uart, debug=False)
+
+
+_simulators = {}
+_simulators_lock = threading.Lock()
+
+
+def _open_sim(options):
+    # Reconnecting must not swap out the simulated tags, so there is one per reader name.
+    # The worker's connect and a caller reaching for .driver may both get here first
+    name = options.get("name", "")
+    with _simulators_lock:
+        if name not in _simulators:
+            from simulator import SimulatedPN532
+
+            _simulators[name] = SimulatedPN532.from_env(options)
+            if options.get("irq"):
+                _simulators[name].attach_irq(open_gpio("sim"), int(options["irq"]))
+        return _simulators[name]
+
+
+BACKENDS = {
+    "i2c": _open_i2c,
+    "spi": _open_spi,
+    "uart": _open_uart,
+    "sim": _open_sim,
+}
+
+
+def register_backend(name, factory):
+    """Make factory(options) available as NFC_BACKEND=name"""
+    BACKENDS[name] = factory
+
+
+def backend_name(backend=None):
+    return (backend or os.environ.get(BACKEND_ENV) or DEFAULT_BACKEND).lower()
+
+
+def default_options():
+    """Options of the single reader configured without NFC_READERS"""
+    irq = os.environ.get(IRQ_ENV, "").strip()
+    return {"irq": irq} if irq else {}
+
+
+def open_pn532(backend=None, options=None):
+    """Create the PN532 for the selected backend"""
+    name = backend_name(backend)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown {BACKEND_ENV} {name!r}, expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](default_options() if options is None else options)
+
+
+_sim_gpio = None
+
+
+def open_gpio(backend=None):
+    """RPi.GPIO on hardware, a recording stand-in for the simulator"""
+    global _sim_gpio
+    if backend_name(backend) == "sim":
+        from simulator import SimulatedGPIO
+
+        # One simulated header, so simulated IRQ lines and the code watching them share pins
+        if _sim_gpio is None:
+            _sim_gpio = SimulatedGPIO()
+        return _sim_gpio
+    import RPi.GPIO as GPIO
+
+    return GPIO
+
+
+class ReaderUnavailableError(RuntimeError):
+    """The reader failed a frame, or is reconnecting and the next attempt is not due yet"""
+
+    def __init__(self, message, retry_after=0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ManagedReader:
+    """PN532 stand-in that connects lazily and reconnects after I2C failures
+
+    Attribute access is forwarded to the current driver, so it can be
+    passed to every helper that takes a pn532. Only the hardware worker
+    thread should use it; health() is safe from any thread.
+    """
+
+    def __init__(self, backend=None, options=None, max_errors=3, backoff_min=0.5, backoff_max=30.0,
+                 recovery_wait=1.0, setup=None, observer=None):
+        self._backend = backend
+        self._options = options or {}
+        self._setup = setup  # setup(driver) after SAM configuration on every (re)connect
+        # observer(method, args, result, seconds, error) after every driver call, e.g. metrics.observe_frame
+        self.observer = observer
+        self.name = self._options.get("name")
+        self._max_errors = max_errors  # Consecutive I2C errors before the driver is rebuilt
+        self._backoff_min = backoff_min
+        self._backoff_max = backoff_max
+        self._recovery_wait = recovery_wait  # Wait this long for a due reconnect instead of failing
+        self._lock = threading.Lock()
+        self._driver = None
+        self._next_attempt = 0.0
+        self._failed_attempts = 0
+        self.state = "disconnected"  # disconnected -> ready <-> recovering
+        self.firmware = None
+        self.connected_since = None
+        self.last_ok = None
+        self.last_error = None
+        self.consecutive_errors = 0
+        self.total_errors = 0
+        self.reconnects = 0
+
+    def connect(self):
+        """Create and configure the driver; returns True on success"""
+        try:
+            driver = open_pn532(self._backend, self._options)
+            driver.SAM_configuration()
+            if self._setup:
+                self._setup(driver)
+            ic, ver, rev, support = driver.firmware_version
+        except Exception as e:
+            with self._lock:
+                self._failed_attempts += 1
+                delay = min(self._backoff_max, self._backoff_min * 2 ** (self._failed_attempts - 1))
+                self._next_attempt = time.monotonic() + delay
+                self.last_error = f"Connect failed: {e}"
+                if self.state == "ready":
+                    self.state = "recovering"
+            log.warning("%sPN532 connect failed (%s), next attempt in %.1fs", self._label, e, delay)
+            return False
+
+        log.info("%sFound PN532 with firmware version: %s.%s", self._label, ver, rev)
+        with self._lock:
+            if self.connected_since is not None:
+                self.reconnects += 1
+            self._driver = driver
+            self._failed_attempts = 0
+            self.state = "ready"
+            self.firmware = f"{ver}.{rev}"
+            self.connected_since = time.time()
+            self.last_ok = time.time()
+            self.consecutive_errors = 0
+        return True
+
+    @property
+    def _label(self):
+        return f"[{self.name}] " if self.name else ""
+
+    @property
+    def driver(self):
+        """The current underlying driver, connecting first if needed"""
+        return self._require_driver()
+
+    def _require_driver(self):
+        if self._driver is not None:
+            return self._driver
+        wait = self._next_attempt - time.monotonic()
+        if wait > self._recovery_wait:
+            raise ReaderUnavailableError(f"NFC reader is {self.state}, retrying in {wait:.1f}s", wait)
+        if wait > 0:
+            # A reconnect is due shortly, wait for it rather than failing the request
+            time.sleep(wait)
+        if not self.connect():
+            retry_after = max(0.0, self._next_attempt - time.monotonic())
+            raise ReaderUnavailableError(f"NFC reader unavailable: {self.last_error}", retry_after)
+        return self._driver
+
+    def _record_ok(self):
+        self.last_ok = time.time()
+        self.consecutive_errors = 0
+
+    def _record_error(self, e):
+        with self._lock:
+            self.total_errors += 1
+            self.consecutive_errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            if self.consecutive_errors < self._max_errors or self._driver is None:
+                return
+            # The PN532 most likely browned out or lost sync, start over with a new driver
+            self._driver = None
+            self.state = "recovering"
+            self._failed_attempts = 0
+            self._next_attempt = time.monotonic() + self._backoff_min
+        log.warning("%sPN532 failed %d times in a row (%s), reconnecting", self._label, self.consecutive_errors, e)
+
+    def __getattr__(self, name):
+        # Only reached for driver attributes; ManagedReader's own are found normally
+        if name.startswith("_"):
+            raise AttributeError(name)
+        driver = self._require_driver()
+        try:
+            attr = getattr(driver, name)  # Properties like firmware_version talk to the PN532
+        except (OSError, RuntimeError) as e:
+            self._record_error(e)
+            raise ReaderUnavailableError(f"NFC reader I/O error: {e}") from e
+        if not callable(attr):
+            self._record_ok()
+            return attr
+
+        observer = self.observer
+
+        def call(*args, **kwargs):
+            start = time.perf_counter() if observer else 0.0
+            try:
+                result = attr(*args, **kwargs)
+            except (OSError, RuntimeError) as e:
+                self._record_error(e)
+                if observer:
+                    observer(name, args, None, time.perf_counter() - start, e)
+                raise ReaderUnavailableError(f"NFC reader I/O error: {e}") from e
+            self._record_ok()
+            if observer:
+                observer(name, args, result, time.perf_counter() - start, None)
+            return result
+
+        return call
+
+    def health(self):
+        with self._lock:
+            next_attempt = self._next_attempt - time.monotonic() if self._driver is None else None
+            return {
+                "backend": backend_name(self._backend),
+                "state": self.state,
+                "firmware": self.firmware,
+                "connected_since": self.connected_since,
+                "last_ok": self.last_ok,
+                "last_ok_age": round(time.time() - self.last_ok, 3) if self.last_ok else None,
+                "consecutive_errors": self.consecutive_errors,
+                "total_errors": self.total_errors,
+                "reconnects": self.reconnects,
+                "last_error": self.last_error,
+                "next_attempt_in": round(max(0.0, next_attempt), 3) if next_attempt is not None else None,
+            }
@@ -0,0 +1,121 @@
+"""PN532 RF and timing settings (RFConfiguration) and request deadlines.
+
+Out of the box the PN532 retries passive activation forever
+(MxRtyPassiveActivation = 0xFF), so "no tag" is only ever learned when
+the host gives up waiting, and the field stays on all the time. These
+settings are sent with RFConfiguration whenever a reader (re)connects:
+
+- mx_rty_atr, mx_rty_psl, mx_rty_passive_activation: retry counts of
+  CfgItem 5 (0xFF = forever). A small passive activation count makes
+  InListPassiveTarget report an empty field in milliseconds.
+- atr_res_timeout, retry_timeout: CfgItem 2 timeout codes, the time is
+  100 us * 2^(code - 1), e.g. 0x0A = 51.2 ms
+- field_off_idle: switch the RF field off between polls to save power,
+  at the cost of the tags powering up again on the next poll
+- poll_timeout, poll_interval: seconds one poll may wait and the pause
+  between polls
+- default_deadline, max_deadline: the timeout of /read-pk, /write-pk and
+  /uid when the request gives none, and the longest one it may ask for
+
+Values come from the JSON file named by NFC_RF_CONFIG, then NFC_RF_<NAME>
+variables (e.g. NFC_RF_MX_RTY_PASSIVE_ACTIVATION=16), then per-reader
+options in NFC_READERS. main.py also changes them at runtime with
+PUT /config/rf.
+"""
+import json
+import os
+
+CONFIG_ENV = "NFC_RF_CONFIG"
+ENV_PREFIX = "NFC_RF_"
+
+_COMMAND_RFCONFIGURATION = 0x32
+_CFG_RF_FIELD = 0x01
+_CFG_TIMINGS = 0x02
+_CFG_MAX_RETRIES = 0x05
+
+# name -> (type, minimum, maximum, default); defaults are the PN532's own
+FIELDS = {
+    "mx_rty_atr": (int, 0, 0xFF, 0xFF),
+    "mx_rty_psl": (int, 0, 0xFF, 0x01),
+    "mx_rty_passive_activation": (int, 0, 0xFF, 0xFF),
+    "atr_res_timeout": (int, 0, 0x10, 0x0B),
+    "retry_timeout": (int, 0, 0x10, 0x0A),
+    "field_off_idle": (bool, None, None, False),
+    "poll_timeout": (float, 0.01, 5.0, 0.5),
+    "poll_interval": (float, 0.0, 5.0, 0.1),
+    "default_deadline": (float, 0.01, 300.0, 10.0),
+    "max_deadline": (float, 0.01, 300.0, 60.0),
+}
+
+
+def _convert(name, value):
+    kind, low, high, _ = FIELDS[name]
+    if kind is bool:
+        if isinstance(value, str):
+            if value.strip().lower() not in ("1", "0", "true", "false", "yes", "no", "on", "off"):
+                raise ValueError(f"{name} should be true or false, not {value!r}")
+            return value.strip().lower() in ("1", "true", "yes", "on")
+        return bool(value)
+    try:
+        value = int(value, 0) if kind is int and isinstance(value, str) else kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} should be a number, not {value!r}")
+    if not low <= value <= high:
+        raise ValueError(f"{name} should be between {low} and {high}, not {value}")
+    return value
+
+
+class RFSettings:
+    """One reader's RF settings; update() validates before changing anything"""
+
+    def __init__(self, **values):
+        for name, (_, _, _, default) in FIELDS.items():
+            setattr(self, name, default)
+        self.update(values)
+
+    def update(self, values):
+        """Set the given fields; raises ValueError for unknown names or bad values"""
+        unknown = set(values) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown RF setting {', '.join(sorted(unknown))}, expected one of {', '.join(FIELDS)}")
+        converted = {name: _convert(name, value) for name, value in values.items()}
+        default_deadline = converted.get("default_deadline", self.default_deadline)
+        if default_deadline > converted.get("max_deadline", self.max_deadline):
+            raise ValueError("default_deadline cannot be longer than max_deadline")
+        for name, value in converted.items():
+            setattr(self, name, value)
+        return self
+
+    def copy(self):
+        return RFSettings(**self.as_dict())
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in FIELDS}
+
+
+def load_rf_settings(options=None):
+    """Settings from NFC_RF_CONFIG, NFC_RF_* and the rf options of one reader"""
+    values = {}
+    path = os.environ.get(CONFIG_ENV)
+    if path:
+        with open(path) as f:
+            values.update(json.load(f))
+    for name in FIELDS:
+        if ENV_PREFIX + name.upper() in os.environ:
+            values[name] = os.environ[ENV_PREFIX + name.upper()]
+    values.update({name: value for name, value in (options or {}).items() if name in FIELDS})
+    return RFSettings(**values)
+
+
+def apply_rf_settings(pn532, settings):
+    """Send the timing and retry items of RFConfiguration"""
+    pn532.call_function(_COMMAND_RFCONFIGURATION,
+                        params=[_CFG_TIMINGS, 0x00, settings.atr_res_timeout, settings.retry_timeout])
+    pn532.call_function(_COMMAND_RFCONFIGURATION,
+                        params=[_CFG_MAX_RETRIES, settings.mx_rty_atr, settings.mx_rty_psl,
+                                settings.mx_rty_passive_activation])
+
+
+def set_rf_field(pn532, on):
+    """Switch the RF field on or off (AutoRFCA off); InListPassiveTarget switches it back on"""
+    pn532.call_function(_COMMAND_RFCONFIGURATION, params=[_CFG_RF_FIELD, 0x01 if on else 0x00])
@@ -0,0 +1,301 @@
+"""Persistent log of every tag scan, in SQLite.
+
+main.py and the read scripts call ScanLog.record for each read: UID,
+reader, tag type, format, payload hash and size, how long it took and
+how it ended. record only appends to an in-memory queue. A writer thread
+inserts the queue in batches, one transaction each, so a scan costs no
+disk I/O on the request path and the SD card sees one fsync per batch
+rather than per scan.
+
+The database runs in WAL mode, so query() (GET /scans) reads while the
+writer appends, and the scripts and main.py can share one file. Payload
+bytes are stored once per distinct hash in their own table; a tag that
+is read a thousand times with the same contents adds a thousand small
+rows, not a thousand payloads. Once an hour, scans older than the
+retention period are deleted, along with payloads no scan refers to, and
+freed pages go back to the file system.
+
+    scan_log = open_scan_log()
+    scan_log.record(uid="04A1B2C3D4E5F6", outcome=OK, payload=data, duration=0.031)
+    scan_log.query(uid="04A1B2C3D4E5F6", since=time.time() - 3600)
+
+NFC_SCAN_LOG is the database path (scans.db next to the scripts by
+default), or 0/off to disable logging; NFC_SCAN_LOG_DAYS the retention
+in days (30).
+"""
+import atexit
+import contextlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from journal import payload_hash
+
+PATH_ENV = "NFC_SCAN_LOG"
+RETENTION_ENV = "NFC_SCAN_LOG_DAYS"
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scans.db")
+
+log = logging.getLogger(__name__)
+
+# Outcomes
+OK = "ok"
+EMPTY = "empty"  # Read fine, no payload on the tag
+TIMEOUT = "timeout"  # No tag within the deadline
+UNSUPPORTED = "unsupported"
+ERROR = "error"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    uid TEXT,
+    reader TEXT,
+    source TEXT,
+    tag_type TEXT,
+    format TEXT,
+    payload_hash TEXT,
+    payload_size INTEGER,
+    duration_ms REAL,
+    cached INTEGER NOT NULL DEFAULT 0,
+    outcome TEXT NOT NULL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS scans_uid_ts ON scans (uid, ts);
+CREATE INDEX IF NOT EXISTS scans_ts ON scans (ts);
+CREATE TABLE IF NOT EXISTS payloads (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+_COLUMNS = ("id", "ts", "uid", "reader", "source", "tag_type", "format", "payload_hash",
+            "payload_size", "duration_ms", "cached", "outcome", "detail")
+
+
+class ScanLog:
+    """Append-only scan log with a background batch writer; path None disables it"""
+
+    def __init__(self, path, retention_days=30.0, batch_size=500, flush_interval=1.0,
+                 max_pending=20000, compact_interval=3600.0):
+        self.path = path
+        self.retention_days = retention_days
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._compact_interval = compact_interval
+        self._pending = deque(maxlen=max_pending)  # Oldest scans are dropped if the writer falls behind
+        self._max_pending = max_pending
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.last_flush_ms = None
+        self.last_compaction = None
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def start(self):
+        if not self.enabled or self._thread:
+            return
+        with contextlib.closing(sqlite3.connect(self.path, timeout=10.0)) as db:
+            # auto_vacuum only takes effect on a new database, before WAL mode and the first table
+            db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            db.execute("PRAGMA journal_mode = WAL")
+            db.executescript(_SCHEMA)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="scan-log", daemon=True)
+        self._thread.start()
+        # Scripts end with Ctrl+C; write what is still queued on the way out
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Write the remaining scans and end the writer thread"""
+        if not self._thread:
+            return
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join(timeout=10.0)
+        self._thread = None
+
+    def record(self, outcome, uid=None, reader=None, source=None, tag_type=None, fmt=None,
+               payload=None, duration=None, cached=False, detail=None):
+        """Queue one scan; never blocks and never touches the disk"""
+        if not self.enabled:
+            return
+        if len(self._pending) == self._max_pending:
+            self.dropped += 1
+        self._pending.append((time.time(), uid, reader, source, tag_type, fmt,
+                              bytes(payload) if payload is not None else None,
+                              duration, cached, outcome, detail))
+        if len(self._pending) >= self._batch_size:
+            self._wake.set()
+
+    def query(self, uid=None, since=None, until=None, outcome=None, limit=100, payloads=False):
+        """Scans newest first, filtered by UID, time range (Unix seconds) and outcome
+
+        Scans still queued for the writer are not included; they show up
+        within flush_interval seconds. With payloads=True every scan has
+        its payload bytes under "payload".
+        """
+        if not self.enabled:
+            return []
+        where, params = [], []
+        if uid:
+            where.append("uid = ?")
+            params.append(uid.upper())
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("ts < ?")
+            params.append(until)
+        if outcome:
+            where.append("outcome = ?")
+            params.append(outcome)
+        columns = ", ".join(f"scans.{c}" for c in _COLUMNS)
+        sql = f"SELECT {columns}{', payloads.data' if payloads else ''} FROM scans"
+        if payloads:
+            sql += " LEFT JOIN payloads ON payloads.hash = scans.payload_hash"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC LIMIT ?"
+        params.append(limit)
+
+        with contextlib.closing(self._connect()) as db:
+            rows = db.execute(sql, params).fetchall()
+        scans = []
+        for row in rows:
+            scan = dict(zip(_COLUMNS, row))
+            scan["cached"] = bool(scan["cached"])
+            if payloads:
+                scan["payload"] = row[len(_COLUMNS)]
+            scans.append(scan)
+        return scans
+
+    def compact(self, now=None):
+        """Delete scans past the retention period and unreferenced payloads, release free pages
+
+        Returns the number of scans deleted.
+        """
+        if not self.enabled:
+            return 0
+        cutoff = (now or time.time()) - self.retention_days * 86400
+        with contextlib.closing(self._connect()) as db:
+            deleted = db.execute("DELETE FROM scans WHERE ts < ?", (cutoff,)).rowcount
+            if deleted:
+                db.execute("DELETE FROM payloads WHERE hash NOT IN "
+                           "(SELECT payload_hash FROM scans WHERE payload_hash IS NOT NULL)")
+            db.commit()
+            # executescript steps the pragma to the end; execute would free one page per call
+            db.executescript("PRAGMA incremental_vacuum;")
+            # Fold the WAL back into the database so it does not keep growing
+            db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.last_compaction = time.time()
+        return deleted
+
+    def stats(self):
+        stats = {
+            "enabled": self.enabled,
+            "path": self.path,
+            "retention_days": self.retention_days,
+            "pending": len(self._pending),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "last_flush_ms": self.last_flush_ms,
+            "last_compaction": self.last_compaction,
+        }
+        if self.enabled and os.path.exists(self.path):
+            stats["file_bytes"] = os.path.getsize(self.path)
+        return stats
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10.0)
+        db.execute("PRAGMA journal_mode = WAL")
+        # In WAL mode NORMAL only syncs at checkpoints: a power cut may lose
+        # the last batches, never corrupt the file
+        db.execute("PRAGMA synchronous = NORMAL")
+        return db
+
+    def _run(self):
+        db = self._connect()
+        next_compaction = time.monotonic()
+        try:
+            while True:
+                self._wake.wait(self._flush_interval)
+                self._wake.clear()
+                stopping = self._stopped.is_set()
+                while self._pending:
+                    self._flush(db)
+                if time.monotonic() >= next_compaction and not stopping:
+                    try:
+                        log.info("Scan log: %d scans past %s days deleted", self.compact(), self.retention_days)
+                    except sqlite3.Error as e:
+                        log.warning("Scan log compaction failed: %s", e)
+                    next_compaction = time.monotonic() + self._compact_interval
+                if stopping:
+                    break
+        finally:
+            db.close()
+
+    def _flush(self, db):
+        batch = []
+        while self._pending and len(batch) < self._batch_size:
+            batch.append(self._pending.popleft())
+        start = time.perf_counter()
+        scans, payloads = [], {}
+        for ts, uid, reader, source, tag_type, fmt, payload, duration, cached, outcome, detail in batch:
+            digest = None
+            if payload is not None:
+                digest = payload_hash(payload)
+                payloads[digest] = payload
+            scans.append((ts, uid, reader, source, tag_type, fmt, digest,
+                          len(payload) if payload is not None else None,
+                          round(duration * 1000, 3) if duration is not None else None,
+                          int(cached), outcome, detail))
+        try:
+            with db:
+                db.executemany("INSERT OR IGNORE INTO payloads (hash, data) VALUES (?, ?)", payloads.items())
+                db.executemany(
+                    "INSERT INTO scans (ts, uid, reader, source, tag_type, format, payload_hash, payload_size, "
+                    "duration_ms, cached, outcome, detail) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", scans)
+        except sqlite3.Error as e:
+            # Disk full or locked for too long: these scans are lost, the next batch tries again
+            log.warning("Scan log write of %d scans failed: %s", len(batch), e)
+            self.dropped += len(batch)
+            return
+        self.written += len(batch)
+        self.batches += 1
+        self.last_flush_ms = round((time.perf_counter() - start) * 1000, 3)
+
+
+def parse_time(value):
+    """Unix seconds or an ISO 8601 time as Unix seconds; None stays None"""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid time {value!r}, expected Unix seconds or ISO 8601")
+
+
+def open_scan_log(path=None, start=True):
+    """ScanLog at path, NFC_SCAN_LOG or scans.db; a disabled one for NFC_SCAN_LOG=0"""
+    path = path or os.environ.get(PATH_ENV, "").strip() or DEFAULT_PATH
+    if path.lower() in ("0", "false", "no", "off"):
+        path = None
+    scan_log = ScanLog(path, retention_days=float(os.environ.get(RETENTION_ENV, "30")))
+    if start:
+        scan_log.start()
+    return scan_log
@@ -0,0 +1,650 @@
+"""In-memory PN532 with simulated NTAG and Mifare Classic tags.
+
+SimulatedPN532 answers the same ``call_function`` frames as the real
+module (InListPassiveTarget, InDataExchange with READ / FAST_READ /
+WRITE / GET_VERSION / Classic auth) and offers the adafruit driver's
+high-level methods on top of them, so every helper in this directory
+runs against it unchanged. Each frame costs a configurable latency and
+can be made to fail, and tags can be scripted to arrive and leave:
+
+    sim = SimulatedPN532(script=[(0, make_tag("ntag215")), (5, None)], frame_latency=0.003)
+
+Pick it for main.py and the scripts with NFC_BACKEND=sim (see reader.py);
+from_env() reads the NFC_SIM_* variables described there.
+
+send_command / process_response and an IRQ output wired to a
+SimulatedGPIO pin (attach_irq) cover interrupt-driven detection: an
+armed InListPassiveTarget pulls the pin low when a tag enters the field.
+
+RFConfiguration is honoured for the RF field (off until the next
+InListPassiveTarget, tags lose their state) and MxRtyPassiveActivation
+(a finite count answers "no tag" after that many activation attempts).
+"""
+import os
+import random
+import threading
+import time
+
+from classic import DEFAULT_KEYS, KEY_A, KEY_B, sector_layout
+
+_COMMAND_GETFIRMWAREVERSION = 0x02
+_COMMAND_SAMCONFIGURATION = 0x14
+_COMMAND_RFCONFIGURATION = 0x32
+_COMMAND_INDATAEXCHANGE = 0x40
+_COMMAND_INLISTPASSIVETARGET = 0x4A
+_COMMAND_INSELECT = 0x54
+
+_STATUS_OK = 0x00
+_STATUS_TIMEOUT = 0x01  # Target did not answer (NAK, removed or halted)
+_STATUS_AUTH_ERROR = 0x14
+
+# PN532 framing around the data bytes (preamble, length, TFI, checksums, ACK)
+_FRAME_OVERHEAD_BYTES = 14
+# The adafruit I2C driver reads the status byte this often while it waits for a response
+_STATUS_POLL_INTERVAL = 0.01
+_ACK = b"\x00\x00\xff\x00\xff\x00"
+# One passive activation attempt (REQA and its timeout), for finite MxRtyPassiveActivation
+_ACTIVATION_ATTEMPT = 0.002
+_RETRY_FOREVER = 0xFF
+
+# Model -> (GET_VERSION product, storage size byte, user pages); None = no GET_VERSION
+_NTAG_MODELS = {
+    "ntag210": (0x04, 0x0B, 12),
+    "ntag212": (0x04, 0x0E, 32),
+    "ntag213": (0x04, 0x0F, 36),
+    "ntag215": (0x04, 0x11, 126),
+    "ntag216": (0x04, 0x13, 222),
+    "ultralight-ev1": (0x03, 0x0B, 12),
+    "ultralight": (None, None, 12),
+    "ultralight-c": (None, None, 36),
+}
+# Model -> (SAK, ATQA, sectors)
+_CLASSIC_MODELS = {
+    "classic-mini": (0x09, 0x0004, 5),
+    "classic-1k": (0x08, 0x0004, 16),
+    "classic-4k": (0x18, 0x0002, 40),
+}
+MODELS = tuple(_NTAG_MODELS) + tuple(_CLASSIC_MODELS)
+
+
+class SimulatedI2CError(RuntimeError):
+    """Injected transport failure, raised like the driver's missing-ACK errors"""
+
+
+class SimNtag:
+    """NTAG2xx / Ultralight memory answering type 2 tag commands"""
+
+    atqa = 0x0044
+    sak = 0x00
+
+    def __init__(self, uid, model="ntag215", data=b""):
+        product, storage, user_pages = _NTAG_MODELS[model]
+        self.uid = bytes(uid)
+        self.model = model
+        self.user_pages = user_pages
+        # 4 header pages, user memory, then dynamic lock / config pages
+        self.pages = bytearray((4 + user_pages + 5) * 4)
+        self.pages[0:3] = self.uid[0:3]
+        self.pages[4:8] = self.uid[3:7].ljust(4, b"\x00")
+        # Capability container: NDEF magic, version, data area size / 8, read/write access
+        self.pages[12:16] = bytes([0xE1, 0x10, user_pages * 4 // 8, 0x00])
+        self.pages[16:16 + len(data)] = data
+        if product is None:
+            self.version = None
+        else:
+            self.version = bytes([0x00, 0x04, product, 0x02, 0x01, 0x00, storage, 0x03])
+
+    @property
+    def num_pages(self):
+        return len(self.pages) // 4
+
+    def reset(self):
+        """Called when the tag is (re-)selected"""
+
+    def user_data(self):
+        return bytes(self.pages[16:16 + self.user_pages * 4])
+
+    def transceive(self, command):
+        """Handle one tag command, return the answer or None for a NAK"""
+        code = command[0]
+        if code == 0x30 and len(command) >= 2:
+            # READ: 4 pages, wrapping around past the last page
+            start = command[1]
+            if start >= self.num_pages:
+                return None
+            return bytes(self.pages[((start + i) % self.num_pages) * 4 + j]
+                         for i in range(4) for j in range(4))
+        if code == 0x3A and len(command) >= 3 and self.version is not None:
+            start, end = command[1], command[2]
+            if start > end or end >= self.num_pages:
+                return None
+            return bytes(self.pages[start * 4:(end + 1) * 4])
+        if code == 0xA2 and len(command) >= 6:
+            page = command[1]
+            # Pages 0-3 hold the UID, lock bytes and CC and are not writable here
+            if page < 4 or page >= self.num_pages:
+                return None
+            self.pages[page * 4:page * 4 + 4] = bytes(command[2:6])
+            return b""
+        if code == 0x60 and self.version is not None:
+            return self.version
+        return None
+
+
+class SimClassic:
+    """Mifare Classic card with per-sector keys and authentication state"""
+
+    def __init__(self, uid, model="classic-1k", keys=None, data=b""):
+        self.sak, self.atqa, self.sectors = _CLASSIC_MODELS[model]
+        self.uid = bytes(uid)
+        self.model = model
+        first, count = sector_layout(self.sectors - 1)
+        self.blocks = [bytearray(16) for _ in range(first + count)]
+        self.blocks[0][0:len(self.uid)] = self.uid
+        # keys: {sector: (key A, key B)}, anything missing uses the factory key
+        default = bytes(DEFAULT_KEYS[0])
+        self.keys = {s: (default, default) for s in range(self.sectors)}
+        self.keys.update({s: (bytes(a), bytes(b)) for s, (a, b) in (keys or {}).items()})
+        for sector, (key_a, key_b) in self.keys.items():
+            first, count = sector_layout(sector)
+            self.blocks[first + count - 1][:] = key_a + bytes([0xFF, 0x07, 0x80, 0x69]) + key_b
+        # Fill data blocks in order, skipping block 0 and the sector trailers
+        data_blocks = [b for s in range(self.sectors) for b in range(*self._data_range(s)) if b != 0]
+        for i, block in enumerate(data_blocks):
+            chunk = data[i * 16:(i + 1) * 16]
+            if not chunk:
+                break
+            self.blocks[block][0:len(chunk)] = chunk
+        self.authenticated = None
+
+    @staticmethod
+    def _data_range(sector):
+        first, count = sector_layout(sector)
+        return first, first + count - 1
+
+    def _sector_of(self, block):
+        for sector in range(self.sectors):
+            first, count = sector_layout(sector)
+            if first <= block < first + count:
+                return sector
+        return None
+
+    def reset(self):
+        self.authenticated = None
+
+    def transceive(self, command):
+        code = command[0]
+        if code in (KEY_A, KEY_B) and len(command) >= 12:
+            sector = self._sector_of(command[1])
+            if sector is None:
+                return None
+            key_a, key_b = self.keys[sector]
+            if bytes(command[2:8]) == (key_a if code == KEY_A else key_b) and \
+                    bytes(command[8:12]) == self.uid[-4:]:
+                self.authenticated = sector
+                return b""
+            return None
+        if code in (0x30, 0xA0) and len(command) >= 2:
+            block = command[1]
+            if self.authenticated is None or self._sector_of(block) != self.authenticated:
+                return None
+            if code == 0x30:
+                return bytes(self.blocks[block])
+            if len(command) < 18:
+                return None
+            self.blocks[block][:] = bytes(command[2:18])
+            return b""
+        return None
+
+
+def make_tag(spec, rng=None):
+    """Build a tag from "model" or "model:uidhex", e.g. "ntag215:04A1B2C3D4E5F6" """
+    model, _, uid_hex = spec.strip().lower().partition(":")
+    rng = rng or random.Random()
+    if model in _NTAG_MODELS:
+        uid = bytes.fromhex(uid_hex) if uid_hex else bytes([0x04] + [rng.randrange(256) for _ in range(6)])
+        return SimNtag(uid, model)
+    if model in _CLASSIC_MODELS:
+        uid = bytes.fromhex(uid_hex) if uid_hex else bytes(rng.randrange(256) for _ in range(4))
+        return SimClassic(uid, model)
+    raise ValueError(f"Unknown simulated tag model {model!r}, expected one of {', '.join(MODELS)}")
+
+
+def parse_script(text, rng=None):
+    """Parse "0=ntag215,5=,6=classic-1k:DEADBEEF" into [(seconds, tag or None)]"""
+    script = []
+    for entry in text.split(","):
+        if not entry.strip():
+            continue
+        at, _, spec = entry.partition("=")
+        script.append((float(at), make_tag(spec, rng) if spec.strip() else None))
+    return script
+
+
+class SimulatedPN532:
+    """Drop-in stand-in for adafruit_pn532's PN532_I2C"""
+
+    def __init__(self, tags=None, script=None, frame_latency=0.0, byte_latency=0.0,
+                 error_rate=0.0, seed=None):
+        self.frame_latency = frame_latency  # Seconds per frame (PN532 + RF round-trip)
+        self.byte_latency = byte_latency  # Seconds per byte on the bus
+        self.error_rate = error_rate  # Probability that any frame fails with SimulatedI2CError
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+        self._field_changed = threading.Condition(self._lock)
+        self._field = list(tags or [])
+        self._script = sorted(script or [], key=lambda step: step[0])
+        self._script_start = time.monotonic()
+        self._selected = []  # Targets selected by the last InListPassiveTarget, in Tg order
+        self._fail_next = []  # Queued "i2c" / "nak" failures for the next frames
+        self._irq = None  # (gpio, pin) once attach_irq() wired the IRQ output
+        self._pending = None  # Command sent with send_command, waiting for its response
+        self._response = None
+        self._response_ready = threading.Event()
+        self.passive_activation_retries = _RETRY_FOREVER  # Set with RFConfiguration item 5
+        self.rf_on = True
+        self._rf_on_since = time.monotonic()
+        self._rf_on_time = 0.0
+        self.frames = 0
+        self.bytes = 0
+        self.errors = 0
+        self.status_reads = 0  # Status byte polls while waiting for a response
+
+    @classmethod
+    def from_env(cls, options=None):
+        """Configure from NFC_SIM_TAGS / NFC_SIM_SCRIPT / NFC_SIM_* latency and error variables
+
+        options (from an NFC_READERS entry) override the variables for one
+        reader: tags (joined with "+"), seed, frame_latency, byte_latency
+        and error_rate.
+        """
+        options = options or {}
+        seed = options.get("seed", os.environ.get("NFC_SIM_SEED"))
+        if seed is not None and options.get("name"):
+            # Readers sharing a seed still get different tag UIDs
+            seed = f"{seed}:{options['name']}"
+        rng = random.Random(seed)
+        script = parse_script(os.environ.get("NFC_SIM_SCRIPT", ""), rng) if "tags" not in options else []
+        tags = None
+        if not script:
+            specs = options["tags"].split("+") if "tags" in options else os.environ.get("NFC_SIM_TAGS", "ntag215").split(",")
+            tags = [make_tag(spec, rng) for spec in specs if spec.strip()]
+        return cls(
+            tags=tags,
+            script=script,
+            frame_latency=float(options.get("frame_latency", os.environ.get("NFC_SIM_FRAME_LATENCY", "0.003"))),
+            byte_latency=float(options.get("byte_latency", os.environ.get("NFC_SIM_BYTE_LATENCY", "0.00009"))),
+            error_rate=float(options.get("error_rate", os.environ.get("NFC_SIM_ERROR_RATE", "0"))),
+            seed=seed,
+        )
+
+    # Field control
+
+    def present(self, *tags):
+        """Put tags in the field, replacing whatever was there"""
+        with self._lock:
+            self._field = list(tags)
+            self._field_changed.notify_all()
+
+    def remove(self):
+        self.present()
+
+    def restart_script(self, script=None):
+        with self._lock:
+            if script is not None:
+                self._script = sorted(script, key=lambda step: step[0])
+            self._script_start = time.monotonic()
+            self._field_changed.notify_all()
+
+    def fail_next(self, count=1, kind="i2c"):
+        """Make the next count frames fail: "i2c" raises, "nak" has the tag not answer"""
+        with self._lock:
+            self._fail_next.extend([kind] * count)
+
+    @property
+    def field(self):
+        """Tags currently in the field, after applying the arrival/removal script"""
+        with self._lock:
+            elapsed = time.monotonic() - self._script_start
+            while self._script and self._script[0][0] <= elapsed:
+                _, tag = self._script.pop(0)
+                self._field = [tag] if tag else []
+            return list(self._field)
+
+    def _next_event_in(self):
+        with self._lock:
+            if not self._script:
+                return None
+            return max(0.0, self._script[0][0] - (time.monotonic() - self._script_start))
+
+    # Frames
+
+    def call_function(self, command, response_length=0, params=(), timeout=1):
+        """Send one command frame and return the response data, like the adafruit driver"""
+        params = bytes(params)
+        failure = self._start_frame(params)
+        response = self._execute(command, params, timeout, failure)
+        self._delay(len(params) + len(response or b""))
+        return response
+
+    def _start_frame(self, params):
+        """Count a frame and apply any injected failure; returns "nak" or None"""
+        with self._lock:
+            self.frames += 1
+            failure = self._fail_next.pop(0) if self._fail_next else None
+            if failure is None and self.error_rate and self._rng.random() < self.error_rate:
+                failure = "i2c"
+
+        if failure == "i2c":
+            self._delay(len(params))
+            with self._lock:
+                self.errors += 1
+            raise SimulatedI2CError("Simulated I2C error: did not receive expected ACK from PN532")
+        return failure
+
+    def _execute(self, command, params, timeout, failure=None):
+        if command == _COMMAND_INLISTPASSIVETARGET:
+            response = self._in_list_passive_target(params, timeout)
+        elif command == _COMMAND_INDATAEXCHANGE:
+            response = self._in_data_exchange(params, nak=failure == "nak")
+        elif command == _COMMAND_INSELECT:
+            response = self._in_select(params)
+        elif command == _COMMAND_GETFIRMWAREVERSION:
+            response = bytes([0x32, 0x01, 0x06, 0x07])
+        elif command == _COMMAND_RFCONFIGURATION:
+            response = self._rf_configuration(params)
+        elif command == _COMMAND_SAMCONFIGURATION:
+            response = b""
+        else:
+            raise RuntimeError(f"Simulated PN532 does not implement command 0x{command:02X}")
+        return response
+
+    def _rf_configuration(self, params):
+        item = params[0] if params else None
+        if item == 0x01 and len(params) >= 2:
+            self._set_rf(bool(params[1] & 0x01))
+        elif item == 0x05 and len(params) >= 4:
+            self.passive_activation_retries = params[3]
+        return b""
+
+    def _set_rf(self, on):
+        with self._lock:
+            now = time.monotonic()
+            if self.rf_on and not on:
+                self._rf_on_time += now - self._rf_on_since
+                # Unpowered tags forget selection and authentication
+                self._selected = []
+            elif on and not self.rf_on:
+                self._rf_on_since = now
+            self.rf_on = on
+
+    @property
+    def rf_on_seconds(self):
+        with self._lock:
+            return self._rf_on_time + (time.monotonic() - self._rf_on_since if self.rf_on else 0.0)
+
+    def _activation_time(self):
+        """How long InListPassiveTarget looks for a tag, None for forever"""
+        if self.passive_activation_retries == _RETRY_FOREVER:
+            return None
+        return (self.passive_activation_retries + 1) * _ACTIVATION_ATTEMPT
+
+    # Interrupt-driven use: send_command, wait for IRQ, process_response
+
+    def attach_irq(self, gpio, pin):
+        """Wire the IRQ output to pin of a SimulatedGPIO (idle high, low when a response is ready)"""
+        self._irq = (gpio, pin)
+        gpio.drive(pin, gpio.HIGH)
+
+    def _set_irq(self, level):
+        if self._irq:
+            gpio, pin = self._irq
+            gpio.drive(pin, level)
+
+    def send_command(self, command, params=(), timeout=1):
+        """Send a command and return once it is ACKed; the response is fetched with process_response"""
+        params = bytes(params)
+        failure = self._start_frame(params)
+        self._delay(len(params))
+        self._response_ready.clear()
+        with self._lock:
+            self._pending = object()
+            pending = self._pending
+        if command == _COMMAND_INLISTPASSIVETARGET:
+            # Armed: the PN532 keeps looking for a tag until one shows up or the host aborts
+            threading.Thread(target=self._wait_for_field, args=(pending, params), daemon=True,
+                             name="sim-pn532-irq").start()
+        else:
+            self._respond(pending, self._execute(command, params, timeout, failure))
+        return True
+
+    def _wait_for_field(self, pending, params):
+        self._set_rf(True)
+        activation = self._activation_time()
+        deadline = None if activation is None else time.monotonic() + activation
+        with self._field_changed:
+            while self._pending is pending and not self.field:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                # Wake up for the next scripted arrival; field applies it
+                waits = [t for t in (self._next_event_in(), remaining) if t is not None]
+                self._field_changed.wait(min(waits) if waits else None)
+            if self._pending is not pending:
+                return
+        self._respond(pending, self._in_list_passive_target(params, 0) or b"\x00")
+
+    def _respond(self, pending, response):
+        with self._lock:
+            if self._pending is not pending:
+                return
+            self._response = response
+        self._response_ready.set()
+        self._set_irq(0)
+
+    def process_response(self, command, response_length=0, timeout=1):
+        """The response to the last send_command, waiting up to timeout for it"""
+        if not self._wait_ready(timeout):
+            return None
+        with self._lock:
+            response, self._response, self._pending = self._response, None, None
+        self._set_irq(1)
+        self._delay(len(response or b""))
+        return response
+
+    def _write_data(self, data):
+        # Only the ACK frame is understood: it aborts the pending command
+        if bytes(data) == _ACK:
+            with self._lock:
+                self._pending = None
+                self._response = None
+                self._field_changed.notify_all()
+            self._response_ready.clear()
+            self._set_irq(1)
+
+    def _wait_ready(self, timeout):
+        """The driver's status byte polling: one bus read every 10 ms until ready"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self.status_reads += 1
+                self.bytes += 2
+            if self._response_ready.is_set():
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._response_ready.wait(min(_STATUS_POLL_INTERVAL, remaining))
+
+    def _delay(self, data_bytes):
+        delay = self.frame_latency + (data_bytes + _FRAME_OVERHEAD_BYTES) * self.byte_latency
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self.bytes += data_bytes + _FRAME_OVERHEAD_BYTES
+
+    def _in_list_passive_target(self, params, timeout):
+        max_targets = params[0] if params else 1
+        self._set_rf(True)
+        activation = self._activation_time()
+        deadline = time.monotonic() + (timeout if activation is None else min(timeout, activation))
+        while True:
+            tags = self.field[:max(1, min(max_targets, 2))]
+            if tags:
+                break
+            # The driver polls the status byte until a tag shows up or the timeout passes
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                with self._lock:
+                    self._selected = []
+                # Out of retries, the PN532 answers with zero targets; otherwise the host gave up
+                return None if activation is None or activation > timeout else b"\x00"
+            with self._lock:
+                self.status_reads += 1
+                self.bytes += 2
+            with self._field_changed:
+                self._field_changed.wait(min(remaining, _STATUS_POLL_INTERVAL))
+
+        response = bytearray([len(tags)])
+        for tg, tag in enumerate(tags, 1):
+            tag.reset()
+            response += bytes([tg]) + tag.atqa.to_bytes(2, "big") + bytes([tag.sak, len(tag.uid)]) + tag.uid
+        with self._lock:
+            self._selected = tags
+        return bytes(response)
+
+    def _in_select(self, params):
+        tg = params[0] if params else 0
+        with self._lock:
+            selected = self._selected
+        tag = selected[tg - 1] if 0 < tg <= len(selected) else None
+        if tag is None or tag not in self.field:
+            return bytes([_STATUS_TIMEOUT])
+        return bytes([_STATUS_OK])
+
+    def _in_data_exchange(self, params, nak=False):
+        tg, command = params[0], params[1:]
+        with self._lock:
+            selected = self._selected
+        tag = selected[tg - 1] if 0 < tg <= len(selected) else None
+        if tag is None or tag not in self.field:
+            return bytes([_STATUS_TIMEOUT])
+        answer = None if nak else tag.transceive(command)
+        if answer is None:
+            # A NAK or failed authentication sends the tag back to IDLE until it is
+            # selected again; the other target keeps its logical number
+            with self._lock:
+                self._selected = [t if t is not tag else None for t in self._selected]
+            return bytes([_STATUS_AUTH_ERROR if command[0] in (KEY_A, KEY_B) else _STATUS_TIMEOUT])
+        return bytes([_STATUS_OK]) + answer
+
+    # The adafruit driver's high-level API, built on the frames above
+
+    @property
+    def firmware_version(self):
+        response = self.call_function(_COMMAND_GETFIRMWAREVERSION, response_length=4)
+        return tuple(response)
+
+    def SAM_configuration(self):
+        self.call_function(_COMMAND_SAMCONFIGURATION, params=[0x01, 0x14, 0x01])
+        # Like a PN532 reset, forget the selected targets
+        with self._lock:
+            self._selected = []
+
+    def read_passive_target(self, card_baud=0x00, timeout=1):
+        response = self.call_function(_COMMAND_INLISTPASSIVETARGET, params=[0x01, card_baud],
+                                      response_length=19, timeout=timeout)
+        if not response or response[0] != 1:
+            return None
+        return bytearray(response[6:6 + response[5]])
+
+    def mifare_classic_authenticate_block(self, uid, block_number, key_number, key):
+        uidlen = len(uid)
+        params = bytes([0x01, key_number & 0xFF, block_number & 0xFF]) + bytes(key) + bytes(uid[uidlen - 4:])
+        response = self.call_function(_COMMAND_INDATAEXCHANGE, params=params, response_length=1)
+        return response[0] == _STATUS_OK
+
+    def mifare_classic_read_block(self, block_number):
+        response = self.call_function(_COMMAND_INDATAEXCHANGE, params=[0x01, 0x30, block_number & 0xFF],
+                                      response_length=17)
+        if response[0] != _STATUS_OK:
+            return None
+        return response[1:]
+
+    def mifare_classic_write_block(self, block_number, data):
+        params = bytes([0x01, 0xA0, block_number & 0xFF]) + bytes(data)
+        response = self.call_function(_COMMAND_INDATAEXCHANGE, params=params, response_length=1)
+        return response[0] == _STATUS_OK
+
+    def ntag2xx_read_block(self, block_number):
+        block = self.mifare_classic_read_block(block_number)
+        if block is None:
+            return None
+        return block[0:4]
+
+    def ntag2xx_write_block(self, block_number, data):
+        params = bytes([0x01, 0xA2, block_number & 0xFF]) + bytes(data)
+        response = self.call_function(_COMMAND_INDATAEXCHANGE, params=params, response_length=1)
+        return response[0] == _STATUS_OK
+
+    def stats(self):
+        return {"frames": self.frames, "bytes": self.bytes, "errors": self.errors,
+                "status_reads": self.status_reads, "rf_on_seconds": round(self.rf_on_seconds, 3)}
+
+
+class SimulatedGPIO:
+    """Minimal RPi.GPIO stand-in that records pin levels
+
+    Inputs are driven from the simulated side with drive(); a falling edge
+    calls the add_event_detect callback on the driving thread.
+    """
+
+    BCM = "BCM"
+    OUT = "OUT"
+    IN = "IN"
+    HIGH = 1
+    LOW = 0
+    PUD_UP = "PUD_UP"
+    FALLING = "FALLING"
+
+    def __init__(self):
+        self.levels = {}
+        self._callbacks = {}
+
+    def setmode(self, mode):
+        pass
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, mode, initial=LOW, pull_up_down=None):
+        if mode == self.IN:
+            self.levels.setdefault(pin, self.HIGH if pull_up_down == self.PUD_UP else self.LOW)
+        else:
+            self.levels[pin] = initial
+
+    def output(self, pin, level):
+        self.levels[pin] = level
+
+    def input(self, pin):
+        return self.levels.get(pin, self.LOW)
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        if edge != self.FALLING:
+            raise ValueError("SimulatedGPIO only detects falling edges")
+        self._callbacks[pin] = callback
+
+    def remove_event_detect(self, pin):
+        self._callbacks.pop(pin, None)
+
+    def drive(self, pin, level):
+        """Set an input from outside, like the PN532 pulling its IRQ line"""
+        previous = self.levels.get(pin, self.HIGH)
+        self.levels[pin] = level
+        callback = self._callbacks.get(pin)
+        if callback and previous == self.HIGH and level == self.LOW:
+            callback(pin)
+
+    def cleanup(self):
+        self.levels.clear()
+        self._callbacks.clear()
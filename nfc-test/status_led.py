@@ -0,0 +1,103 @@
+"""Status LED patterns, driven from a background thread.
+
+The scripts used to switch the LED with GPIO.output and then sleep
+0.5-1 s so it stayed on long enough to be seen, which made every tag
+operation that much slower. A StatusLed plays patterns on its own thread;
+callers just post a state and carry on:
+
+    led = StatusLed(GPIO, 17)
+    led.set(BUSY)      # solid while a tag is handled
+    led.set(SUCCESS)   # one long blink, then back to the idle heartbeat
+    ...
+    led.stop()
+
+A new state interrupts the running pattern at once. Without GPIO (or
+with no pin, or a negative one) set() does nothing, so callers need no
+checks of their own.
+"""
+import logging
+import threading
+
+OFF = "off"
+IDLE = "idle"
+BUSY = "busy"
+SUCCESS = "success"
+TIMEOUT = "timeout"
+ERROR = "error"
+
+log = logging.getLogger(__name__)
+
+# state -> (steps of (led on, seconds), state that follows); a step of
+# None seconds holds until the next set()
+PATTERNS = {
+    OFF: ([(False, None)], None),
+    IDLE: ([(True, 0.05), (False, 1.95)], IDLE),  # Heartbeat: short flash every 2 s
+    BUSY: ([(True, None)], None),
+    SUCCESS: ([(True, 0.6), (False, 0.3)], IDLE),
+    TIMEOUT: ([(True, 0.15), (False, 0.15)] * 2 + [(False, 0.5)], IDLE),
+    ERROR: ([(True, 0.08), (False, 0.08)] * 5 + [(False, 0.5)], IDLE),
+}
+
+
+class StatusLed:
+    """One LED on a GPIO pin; set(state) from any thread"""
+
+    def __init__(self, gpio, pin, initial=IDLE, name="status-led"):
+        self._gpio = gpio
+        self._pin = pin
+        self._cond = threading.Condition()
+        self._state = initial
+        self._generation = 0  # Bumped by set(), so re-posting a state restarts it
+        self._stopped = False
+        self._thread = None
+        if self.enabled:
+            self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+            self._thread.start()
+
+    @property
+    def enabled(self):
+        return self._gpio is not None and self._pin is not None and self._pin >= 0
+
+    @property
+    def state(self):
+        return self._state
+
+    def set(self, state):
+        """Play state's pattern from now on"""
+        if state not in PATTERNS:
+            raise ValueError(f"Unknown LED state {state!r}, expected one of {', '.join(PATTERNS)}")
+        with self._cond:
+            self._state = state
+            self._generation += 1
+            self._cond.notify()
+
+    def stop(self):
+        """Switch the LED off and end the thread (before GPIO.cleanup)"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+            self._output(False)
+
+    def _output(self, on):
+        try:
+            self._gpio.output(self._pin, self._gpio.HIGH if on else self._gpio.LOW)
+        except RuntimeError as e:
+            # GPIO was cleaned up under us; nothing left to show
+            log.warning("Status LED on GPIO %s unavailable: %s", self._pin, e)
+            self._stopped = True
+
+    def _run(self):
+        with self._cond:
+            while not self._stopped:
+                generation = self._generation
+                steps, then = PATTERNS[self._state]
+                for on, seconds in steps:
+                    self._output(on)
+                    if self._cond.wait_for(lambda: self._stopped or self._generation != generation, seconds):
+                        break
+                else:
+                    if then is not None:
+                        self._state = then
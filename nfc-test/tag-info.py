@@ -1,18 +1,23 @@
-import board
-import busio
-from adafruit_pn532.i2c import PN532_I2C
-import RPi.GPIO as GPIO
-import time
+from detect import open_detector
+from reader import open_gpio, open_pn532
+from status_led import BUSY, SUCCESS, StatusLed
+from tagid import identify
 
 LED_PIN = 17  # GPIO pin connected to LED
 
-# Initialize I2C communication
-i2c = busio.I2C(board.SCL, board.SDA)
-pn532 = PN532_I2C(i2c, debug=False)
+# Initialize the PN532 (I2C, or the simulator with NFC_BACKEND=sim)
+pn532 = open_pn532()
 
+GPIO = open_gpio()
 GPIO.setmode(GPIO.BCM)  # Use BCM GPIO numbering
 GPIO.setup(LED_PIN, GPIO.OUT)  # Set pin as output
 
+# Heartbeat while idle, solid while a tag is handled, blink codes for the outcome
+led = StatusLed(GPIO, LED_PIN)
+
+# Wait for tags on the PN532 IRQ line when NFC_IRQ_PIN is set, polling otherwise
+detector = open_detector(pn532, GPIO)
+
 # Get firmware version
 ic, ver, rev, support = pn532.firmware_version
 print(f"Found PN532 with firmware version: {ver}.{rev}")
@@ -23,21 +28,24 @@ pn532.SAM_configuration()
 print("Waiting for an NFC tag to analyze...")
 
 while True:
-    uid = pn532.read_passive_target(timeout=0.5)
-    if uid:
+    target = detector.wait(timeout=0.5)
+    if target:
+        uid = target.uid
         print(f"\n=== NFC TAG INFORMATION ===")
         print(f"UID: {uid.hex().upper()}")
         print(f"UID Length: {len(uid)} bytes")
+        print(f"ATQA: {target.atqa:04X}")
+        print(f"SAK: {target.sak:02X}")
         
-        GPIO.output(LED_PIN, GPIO.HIGH)
+        led.set(BUSY)
         
-        # Determine likely tag type based on UID length
-        if len(uid) == 4:
-            print("Likely tag type: Mifare Classic 1K")
-        elif len(uid) == 7:
-            print("Likely tag type: NTAG2xx or Mifare Classic 4K")
-        else:
-            print(f"Unknown tag type (UID length: {len(uid)})")
+        # Identify the tag from SAK, GET_VERSION and the capability container
+        # (always probed here, this script is for looking at tags)
+        info = identify(pn532, target)
+        print(f"Tag type: {info.tag_type}")
+        if info.version:
+            print(f"GET_VERSION: {info.version.hex().upper()}")
+        print(f"User memory: {info.user_bytes} bytes")
         
         # Try to read different blocks to understand the tag structure
         print("\n=== ATTEMPTING TO READ BLOCKS ===")
@@ -87,16 +95,11 @@ while True:
                 print(f"Block {block_num}: Error - {e}")
                 break
         
-        GPIO.output(LED_PIN, GPIO.LOW)
+        led.set(SUCCESS)
         print(f"\n=== ANALYSIS COMPLETE ===")
         print("Remove the tag to analyze another one...")
         
         # Wait for tag removal
-        while True:
-            check_uid = pn532.read_passive_target(timeout=0.5)
-            if not check_uid:
-                break
-            time.sleep(0.2)
+        detector.wait_removed()
         
         print("\nWaiting for next tag...")
-        time.sleep(1)
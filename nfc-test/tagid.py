@@ -0,0 +1,294 @@
+"""Tag identification from SAK/ATQA, GET_VERSION and the capability container.
+
+read_passive_target only hands back the UID, which is why the scripts
+used to guess the tag type from the UID length. select_target sends the
+same InListPassiveTarget but keeps ATQA and SAK, and identify() turns
+them into a TagInfo with the exact user memory size:
+
+- SAK 0x08 / 0x18 / 0x09: Mifare Classic 1K / 4K / Mini
+- SAK 0x00: Ultralight/NTAG family, told apart with GET_VERSION; tags
+  without GET_VERSION (original Ultralight / Ultralight C) are sized
+  from the capability container in page 3
+
+select_targets lists up to two tags at once (InListPassiveTarget with
+MaxTg=2). The helpers all address logical target 1, so TargetView
+points them at another target number after an InSelect.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+from dataclasses import dataclass
+from typing import Optional
+
+from ntag import PAGE_SIZE, USER_START_PAGE, read_four_pages
+
+try:
+    from adafruit_pn532.adafruit_pn532 import BusyError
+except ImportError:
+    class BusyError(Exception):
+        """Stand-in when the adafruit driver is not installed"""
+
+_COMMAND_INLISTPASSIVETARGET = 0x4A
+_COMMAND_INSELECT = 0x54
+_MIFARE_ISO14443A = 0x00
+_NTAG_CMD_GET_VERSION = 0x60
+_COMMAND_INDATAEXCHANGE = 0x40
+
+# GET_VERSION storage size byte -> user memory pages from page 4
+_NTAG_VERSIONS = {
+    0x0B: ("NTAG210", 12),
+    0x0E: ("NTAG212", 32),
+    0x0F: ("NTAG213", 36),
+    0x11: ("NTAG215", 126),
+    0x13: ("NTAG216", 222),
+}
+# Largest user memory of any supported tag (NTAG216, 888 bytes)
+MAX_USER_BYTES = max(pages for _, pages in _NTAG_VERSIONS.values()) * PAGE_SIZE
+_ULTRALIGHT_EV1_VERSIONS = {
+    0x0B: ("Mifare Ultralight EV1 (MF0UL11)", 12),
+    0x0E: ("Mifare Ultralight EV1 (MF0UL21)", 32),
+}
+_CLASSIC_SAKS = {
+    0x09: ("Mifare Classic Mini", 5),
+    0x08: ("Mifare Classic 1K", 16),
+    0x18: ("Mifare Classic 4K", 40),
+}
+
+# tg is the PN532 logical target number (1 or 2) from InListPassiveTarget
+Target = namedtuple("Target", "uid atqa sak tg", defaults=(1,))
+
+# The PN532 can keep at most two ISO14443A targets listed at once
+MAX_TARGETS = 2
+
+
+class UnsupportedTagError(RuntimeError):
+    """The tag in the field is not one the operation can handle"""
+
+
+@dataclass(frozen=True)
+class TagInfo:
+    """What kind of tag is in the field and how much user memory it has"""
+    uid: bytes
+    atqa: int
+    sak: int
+    tag_type: str  # e.g. "NTAG215", "Mifare Classic 4K"
+    family: str  # "ntag", "ultralight", "classic" or "unknown"
+    user_pages: int = 0  # NTAG/Ultralight user memory in 4-byte pages from page 4
+    sectors: int = 0  # Mifare Classic sector count
+    version: Optional[bytes] = None  # Raw GET_VERSION response if the tag supports it
+
+    @property
+    def user_start_page(self):
+        return USER_START_PAGE
+
+    @property
+    def user_bytes(self):
+        if self.family == "classic":
+            # 3 data blocks per 4-block sector, 15 per 16-block sector, minus manufacturer block 0
+            return sum(3 if s < 32 else 15 for s in range(self.sectors)) * 16 - 16
+        return self.user_pages * PAGE_SIZE
+
+    @property
+    def key_family(self):
+        """Card family name used by the Mifare Classic key cache"""
+        return self.tag_type.replace("Mifare Classic ", "classic-").lower()
+
+    def as_dict(self):
+        return {
+            "uid": self.uid.hex().upper(),
+            "atqa": f"{self.atqa:04X}",
+            "sak": f"{self.sak:02X}",
+            "tag_type": self.tag_type,
+            "family": self.family,
+            "user_bytes": self.user_bytes,
+            "version": self.version.hex().upper() if self.version else None,
+        }
+
+
+def select_targets(pn532, max_targets=MAX_TARGETS, timeout=0.5):
+    """InListPassiveTarget for up to max_targets ISO14443A targets, keeping ATQA and SAK
+
+    Returns a list of Targets (empty if no tag answered within timeout).
+    """
+    try:
+        response = pn532.call_function(
+            _COMMAND_INLISTPASSIVETARGET,
+            params=[min(max_targets, MAX_TARGETS), _MIFARE_ISO14443A],
+            response_length=64,
+            timeout=timeout,
+        )
+    except BusyError:
+        # Same as read_passive_target: a busy PN532 just means no tag this time
+        return []
+    return parse_targets(response)
+
+
+def parse_targets(response):
+    """Targets from an InListPassiveTarget response (also used by detect.py)"""
+    # [NbTg, then per target: Tg, ATQA(2), SAK, UID length, UID..., (ATS if SAK says ISO-DEP)]
+    if not response or not 1 <= response[0] <= MAX_TARGETS:
+        return []
+    targets = []
+    pos = 1
+    for _ in range(response[0]):
+        if pos + 5 > len(response):
+            break
+        uid_length = response[pos + 4]
+        if uid_length > 10:
+            break
+        targets.append(Target(
+            uid=bytearray(response[pos + 5:pos + 5 + uid_length]),
+            atqa=int.from_bytes(response[pos + 1:pos + 3], "big"),
+            sak=response[pos + 3],
+            tg=response[pos],
+        ))
+        pos += 5 + uid_length
+        if targets[-1].sak & 0x20 and pos < len(response):
+            pos += response[pos]  # Skip the ATS, its first byte is its length
+    return targets
+
+
+def select_target(pn532, timeout=0.5):
+    """InListPassiveTarget for one ISO14443A target, keeping ATQA and SAK
+
+    Returns a Target, or None if no tag answered within timeout.
+    """
+    targets = select_targets(pn532, 1, timeout)
+    if not targets or len(targets[0].uid) > 7:
+        return None
+    return targets[0]
+
+
+def in_select(pn532, tg):
+    """InSelect: make logical target tg the active one; True if it answered"""
+    response = pn532.call_function(_COMMAND_INSELECT, params=[tg], response_length=1)
+    return bool(response) and response[0] == 0x00
+
+
+class TargetView:
+    """A pn532 whose InDataExchange frames go to logical target tg instead of 1
+
+    ntag, framing, journal and identify() all address target 1; wrapping
+    the reader in a TargetView lets them work on the second of two tags
+    listed together. Re-selecting (after a NAK) lists both tags again and
+    follows this tag's UID to its new target number.
+    """
+
+    def __init__(self, pn532, target):
+        self._pn532 = pn532
+        self.uid = bytes(target.uid)
+        self.tg = target.tg
+
+    def __getattr__(self, name):
+        return getattr(self._pn532, name)
+
+    def activate(self):
+        return in_select(self._pn532, self.tg)
+
+    def call_function(self, command, response_length=0, params=(), timeout=1):
+        params = list(params)
+        if command == _COMMAND_INDATAEXCHANGE and params:
+            params[0] = self.tg
+        return self._pn532.call_function(command, response_length=response_length,
+                                         params=params, timeout=timeout)
+
+    def read_passive_target(self, card_baud=_MIFARE_ISO14443A, timeout=1):
+        for target in select_targets(self._pn532, MAX_TARGETS, timeout):
+            if bytes(target.uid) == self.uid:
+                self.tg = target.tg
+                return bytearray(target.uid)
+        return None
+
+    def ntag2xx_read_block(self, block_number):
+        response = self.call_function(_COMMAND_INDATAEXCHANGE, params=[self.tg, 0x30, block_number & 0xFF],
+                                      response_length=17)
+        if not response or response[0] != 0x00:
+            return None
+        return response[1:5]
+
+    def ntag2xx_write_block(self, block_number, data):
+        response = self.call_function(_COMMAND_INDATAEXCHANGE,
+                                      params=[self.tg, 0xA2, block_number & 0xFF] + list(data),
+                                      response_length=1)
+        return bool(response) and response[0] == 0x00
+
+
+def _get_version(pn532):
+    response = pn532.call_function(
+        _COMMAND_INDATAEXCHANGE,
+        params=[0x01, _NTAG_CMD_GET_VERSION],
+        response_length=9,
+    )
+    if not response or response[0] != 0x00 or len(response) < 9:
+        return None
+    return bytes(response[1:9])
+
+
+def identify(pn532, target):
+    """Work out the tag type of a freshly selected target"""
+    base = dict(uid=bytes(target.uid), atqa=target.atqa, sak=target.sak)
+
+    # The upper SAK bits only flag Infineon/SmartMX variants of the same Classic layouts
+    classic = _CLASSIC_SAKS.get(target.sak & 0x1F)
+    if classic:
+        return TagInfo(tag_type=classic[0], family="classic", sectors=classic[1], **base)
+
+    if target.sak != 0x00:
+        return TagInfo(tag_type=f"Unknown (SAK {target.sak:02X})", family="unknown", **base)
+
+    # A NAK comes back as None; bus errors propagate rather than pass for an older tag
+    version = _get_version(pn532)
+    if version:
+        product, storage = version[2], version[6]
+        if product == 0x04 and storage in _NTAG_VERSIONS:
+            name, pages = _NTAG_VERSIONS[storage]
+            return TagInfo(tag_type=name, family="ntag", user_pages=pages, version=version, **base)
+        if product == 0x03 and storage in _ULTRALIGHT_EV1_VERSIONS:
+            name, pages = _ULTRALIGHT_EV1_VERSIONS[storage]
+            return TagInfo(tag_type=name, family="ultralight", user_pages=pages, version=version, **base)
+        # Unknown type 2 tag: the storage byte says the user memory is at least 2^(n >> 1) bytes
+        pages = (1 << (storage >> 1)) // PAGE_SIZE
+        family = "ntag" if product == 0x04 else "ultralight"
+        return TagInfo(tag_type=f"Type 2 tag ({version.hex().upper()})", family=family,
+                       user_pages=pages, version=version, **base)
+
+    # No GET_VERSION (original Ultralight / Ultralight C): the tag NAKed and
+    # went back to IDLE, so select it again and size it from the capability container
+    user_pages = 12  # Original Ultralight
+    if pn532.read_passive_target(timeout=0.2):
+        cc = read_four_pages(pn532, 3)
+        if cc and cc[0] == 0xE1 and cc[2]:
+            # CC byte 2 is the data area size in units of 8 bytes
+            user_pages = cc[2] * 8 // PAGE_SIZE
+    name = "Mifare Ultralight" if user_pages <= 12 else "Mifare Ultralight C"
+    return TagInfo(tag_type=name, family="ultralight", user_pages=user_pages, **base)
+
+
+class TagIdentifier:
+    """identify() with results cached per UID, so repeat presentations skip probing
+
+    Only types read from the SAK or a GET_VERSION answer are cached. The
+    capability container fallback is a guess that a dropped GET_VERSION
+    frame can also lead to, so it is probed again on the next presentation.
+    """
+
+    def __init__(self, max_entries=256):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def identify(self, pn532, target):
+        uid_hex = target.uid.hex().upper()
+        with self._lock:
+            info = self._entries.get(uid_hex)
+            # A different SAK means a different card that happens to share the UID
+            if info and info.sak == target.sak:
+                self._entries.move_to_end(uid_hex)
+                return info
+        info = identify(pn532, target)
+        if info.sak == 0x00 and not info.version:
+            return info
+        with self._lock:
+            self._entries[uid_hex] = info
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return info
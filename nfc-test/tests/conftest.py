@@ -0,0 +1,13 @@
+import os
+import sys
+
+# The modules are flat scripts next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# main.py builds its reader pool on import: simulated readers with an empty
+# field, and no scan log file next to the scripts
+os.environ["NFC_BACKEND"] = "sim"
+os.environ["NFC_SIM_TAGS"] = ""
+os.environ["NFC_SCAN_LOG"] = "0"
+os.environ.pop("NFC_READERS", None)
+os.environ.pop("NFC_IRQ_PIN", None)
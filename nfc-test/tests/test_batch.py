@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+from batch import BatchProvisioner
+from detect import TagDetector
+from framing import FORMAT_FRAMED, FORMAT_RAW, FORMATS, read_payload
+from journal import WriteJournal
+from simulator import SimulatedGPIO, SimulatedPN532, make_tag
+from tagid import select_target
+
+
+def test_unsuitable_tags_are_turned_away_without_a_write():
+    payload = bytes(range(1, 201))
+    batch = BatchProvisioner([payload.hex()])
+    journal = WriteJournal()
+    classic = make_tag("classic-1k:A1B2C3D4")
+    small = make_tag("ntag213:04000000000001")
+    pn532 = SimulatedPN532(tags=[classic])
+    detector = TagDetector(pn532)
+
+    assert batch.provision_next(pn532, detector, journal, timeout=0.5) == "A1B2C3D4"
+    assert "not supported" in batch.failures[-1]["error"]
+    # Still on the reader: not counted again for the same payload
+    assert batch.provision_next(pn532, detector, journal, timeout=0.3) is None
+
+    pn532.present(small)
+    assert batch.provision_next(pn532, detector, journal, timeout=0.5) == "04000000000001"
+    assert "do not fit the 144 bytes" in batch.failures[-1]["error"]
+    assert small.user_data() == bytes(len(small.user_data()))
+    assert batch.next_index == 0 and len(batch.failures) == 2
+
+    tag = make_tag("ntag215:04000000000002")
+    pn532.present(tag)
+    assert batch.provision_next(pn532, detector, journal, timeout=0.5) == "04000000000002"
+    select_target(pn532)
+    assert read_payload(pn532, 126)[:2] == (payload, FORMAT_FRAMED)
+    assert batch.finished
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_payloads_are_encoded_in_the_requested_format(fmt):
+    # Repetitive enough that compressed really deflates
+    payload = b"batch-" * 20
+    batch = BatchProvisioner([payload.hex()], fmt=fmt)
+    pn532 = SimulatedPN532(tags=[make_tag("ntag215:04000000000003")])
+
+    assert batch.provision_next(pn532, TagDetector(pn532), WriteJournal(), timeout=0.5) == "04000000000003"
+    select_target(pn532)
+    assert read_payload(pn532, 126)[:2] == (payload, fmt)
+
+
+def test_invalid_format_or_oversized_payload_is_refused():
+    with pytest.raises(ValueError, match="Unknown payload format"):
+        BatchProvisioner(["00"], fmt="base64")
+    with pytest.raises(ValueError, match="Payload 1 takes 892 bytes as framed"):
+        BatchProvisioner(["01", "ab" * 888])
+    # Raw only has to fit unframed
+    BatchProvisioner(["ab" * 888], fmt=FORMAT_RAW)
+
+
+def test_batch_sleeps_on_the_irq_line_until_a_tag_arrives():
+    batch = BatchProvisioner([b"irq".hex()])
+    pn532 = SimulatedPN532()
+    gpio = SimulatedGPIO()
+    pn532.attach_irq(gpio, 25)
+    detector = TagDetector(pn532)
+    assert detector.enable_irq(gpio, 25)
+
+    threading.Timer(0.2, pn532.present, [make_tag("ntag213:04000000000004")]).start()
+    frames = pn532.frames
+    assert batch.provision_next(pn532, detector, WriteJournal(), timeout=2.0) == "04000000000004"
+    assert batch.finished
+    assert detector.wakeups >= 1 and detector.polls == 0
+    # One armed InListPassiveTarget instead of a poll every 100 ms while the field was empty
+    assert pn532.frames - frames < 10
@@ -0,0 +1,103 @@
+import asyncio
+import contextlib
+import io
+import time
+
+import httpx
+
+import cache
+from cache import TagCache
+from framing import FORMAT_FRAMED, encode
+from simulator import SimNtag
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import main
+
+UID = "04A1B2C3D4E5F6"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    tag_cache = TagCache(ttl=30.0)
+    tag_cache.put("A", 1)
+    clock.now += 29.9
+    assert tag_cache.get("A") == 1
+    clock.now += 0.2
+    assert tag_cache.get("A") is None
+    assert tag_cache.stats()["entries"] == 0
+    assert (tag_cache.hits, tag_cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    tag_cache = TagCache(max_entries=2)
+    tag_cache.put("A", 1)
+    tag_cache.put("B", 2)
+    assert tag_cache.get("A") == 1  # B is now the least recently used
+    tag_cache.put("C", 3)
+    assert tag_cache.get("B") is None
+    assert (tag_cache.get("A"), tag_cache.get("C")) == (1, 3)
+    tag_cache.invalidate("A")
+    assert tag_cache.get("A") is None
+
+
+async def until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_cache_is_dropped_on_write_and_removal_and_etag_gives_304():
+    slot = main.pool.default
+    tag = SimNtag(bytes.fromhex(UID), "ntag215", data=encode(b"hello", FORMAT_FRAMED))
+
+    async def run():
+        await main.startup_event()
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+                slot.pn532.driver.present(tag)
+                # The presence tracker prefetches the tag as soon as it arrives
+                await until(lambda: main.tag_cache.get(UID) is not None)
+                hits = main.tag_cache.hits
+                first = await client.get("/read-pk")
+                served_from_cache = main.tag_cache.hits > hits
+
+                etag = first.headers["ETag"]
+                not_modified = await client.get("/read-pk", headers={"If-None-Match": f'"other", W/{etag}'})
+
+                written = await client.post("/write-pk", json={"hex_string": "0102"})
+                after_write = main.tag_cache.get(UID)
+                fresh = await client.get("/read-pk", headers={"If-None-Match": etag})
+                before_removal = main.tag_cache.get(UID)
+
+                slot.pn532.driver.remove()
+                await until(lambda: slot.tracker.current is None)
+                after_removal = main.tag_cache.get(UID)
+        finally:
+            await main.shutdown_event()
+        return (first, served_from_cache, not_modified, written, after_write, fresh, before_removal,
+                after_removal)
+
+    (first, served_from_cache, not_modified, written, after_write, fresh, before_removal,
+     after_removal) = asyncio.run(run())
+    assert first.status_code == 200 and first.json()["hex_data"] == b"hello".hex()
+    assert served_from_cache
+    assert not_modified.status_code == 304 and not_modified.headers["ETag"] == first.headers["ETag"]
+    assert not_modified.content == b""
+
+    assert written.status_code == 200
+    assert after_write is None
+    # New contents, new ETag: the old one no longer matches
+    assert fresh.status_code == 200 and fresh.json()["hex_data"] == "0102"
+    assert fresh.headers["ETag"] != first.headers["ETag"]
+    assert before_removal is not None and after_removal is None
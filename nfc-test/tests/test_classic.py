@@ -0,0 +1,60 @@
+from classic import DEFAULT_KEYS, KEY_A, KEY_B, KeyCache, authenticate_sector, read_sector
+from simulator import SimClassic, SimulatedPN532
+
+UID = bytes.fromhex("A1B2C3D4")
+OTHER_UID = bytes.fromhex("11223344")
+FAMILY = "classic-1k"
+KEY = bytes.fromhex("123456789ABC")
+# Every default key as A and B fails first, then KEY as key A opens the sector
+DICTIONARY_WALK = 2 * len(DEFAULT_KEYS) + 1
+
+
+def card(uid):
+    # Sector 1 is locked with a key that is not a default one, the rest use the factory key
+    return SimClassic(uid, "classic-1k", keys={1: (KEY, KEY)}, data=b"sector one data!" * 4)
+
+
+def authenticate(pn532, uid, sector, key_cache):
+    assert pn532.read_passive_target(timeout=0.1) == uid
+    return authenticate_sector(pn532, uid, sector, FAMILY, key_cache)
+
+
+def test_remembered_key_is_tried_first_and_survives_a_restart(tmp_path):
+    path = str(tmp_path / "mifare-keys.json")
+    key_cache = KeyCache(path)
+    key_cache.add_keys([KEY])
+    pn532 = SimulatedPN532(tags=[card(UID)])
+
+    key, key_type, attempts = authenticate(pn532, UID, 1, key_cache)
+    assert (bytes(key), key_type, attempts) == (KEY, KEY_A, DICTIONARY_WALK)
+    assert read_sector(pn532, 1)[0][1] == b"sector one data!"
+    key_cache.save()
+
+    # A new process loads the file and opens the sector with the first key it tries
+    reloaded = KeyCache(path)
+    assert reloaded.candidates(UID, 1, FAMILY)[0] == (list(KEY), KEY_A)
+    assert authenticate(pn532, UID, 1, reloaded)[2] == 1
+    # Other sectors of the card try its known key first, then the dictionary
+    assert reloaded.candidates(UID, 0, FAMILY)[0] == (list(KEY), KEY_A)
+    assert authenticate(pn532, UID, 0, reloaded)[2] == 2
+
+
+def test_family_hits_help_a_new_card_of_the_same_family(tmp_path):
+    key_cache = KeyCache(str(tmp_path / "mifare-keys.json"))
+    key_cache.add_keys([KEY])
+    pn532 = SimulatedPN532(tags=[card(UID)])
+    for _ in range(2):
+        assert authenticate(pn532, UID, 1, key_cache)[0] is not None
+
+    pn532.present(card(OTHER_UID))
+    # Never seen this UID, but KEY opened most sectors of this family so far
+    assert key_cache.candidates(OTHER_UID, 1, FAMILY)[0] == (list(KEY), KEY_A)
+    assert authenticate(pn532, OTHER_UID, 1, key_cache)[2] == 1
+
+
+def test_unknown_key_gives_up_after_the_dictionary():
+    pn532 = SimulatedPN532(tags=[card(UID)])
+    key_cache = KeyCache()
+    key, key_type, attempts = authenticate(pn532, UID, 1, key_cache)
+    assert (key, key_type, attempts) == (None, None, 2 * len(DEFAULT_KEYS))
+    assert key_cache.candidates(UID, 1, FAMILY)[-1] == (DEFAULT_KEYS[-1], KEY_B)
@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from detect import TagDetector
+from reader import ReaderUnavailableError
+from simulator import SimulatedGPIO, SimulatedI2CError, SimulatedPN532, make_tag
+
+UID = "04A1B2C3D4E5F6"
+IRQ_PIN = 25
+
+
+def irq_detector(pn532):
+    gpio = SimulatedGPIO()
+    pn532.attach_irq(gpio, IRQ_PIN)
+    detector = TagDetector(pn532)
+    assert detector.enable_irq(gpio, IRQ_PIN)
+    assert detector.mode == "irq"
+    return detector
+
+
+def test_irq_wakes_up_for_an_arriving_tag():
+    pn532 = SimulatedPN532()
+    detector = irq_detector(pn532)
+
+    threading.Timer(0.1, pn532.present, [make_tag(f"ntag215:{UID}")]).start()
+    target = detector.wait(timeout=2.0)
+    assert target is not None and target.uid.hex().upper() == UID
+    assert detector.wakeups == 1 and detector.polls == 0
+
+
+def test_irq_timeout_aborts_the_armed_command():
+    pn532 = SimulatedPN532()
+    detector = irq_detector(pn532)
+
+    assert detector.wait(timeout=0.1) is None
+    # The aborted InListPassiveTarget does not block the next wait
+    pn532.present(make_tag(f"ntag215:{UID}"))
+    assert detector.wait(timeout=1.0).uid.hex().upper() == UID
+
+
+def test_bus_error_while_aborting_is_a_reader_error(monkeypatch):
+    pn532 = SimulatedPN532()
+    detector = irq_detector(pn532)
+
+    def lost_ack(data):
+        raise SimulatedI2CError("Simulated I2C error: did not receive expected ACK from PN532")
+
+    monkeypatch.setattr(pn532, "_write_data", lost_ack)
+    with pytest.raises(ReaderUnavailableError):
+        detector.wait(timeout=0.1)
@@ -0,0 +1,176 @@
+import random
+import zlib
+
+import pytest
+
+from framing import (CODEC_DEFLATE, CODEC_RAW, FORMAT_COMPRESSED, FORMAT_FRAMED, FORMAT_NDEF, FORMAT_RAW, FORMATS,
+                     FRAME_HEADER_SIZE, IncompleteReadError, PayloadDecodeError, encode, encode_framed,
+                     read_payload)
+from ntag import PAGE_SIZE, USER_START_PAGE
+from simulator import SimNtag, SimulatedPN532
+
+UID = bytes.fromhex("04A1B2C3D4E5F6")
+# User memory in bytes
+CAPACITY = {"ntag213": 144, "ntag215": 504, "ntag216": 888}
+
+
+def write_pages(pn532, encoded):
+    assert pn532.read_passive_target(timeout=0.1) is not None
+    for offset in range(0, len(encoded), PAGE_SIZE):
+        assert pn532.ntag2xx_write_block(USER_START_PAGE + offset // PAGE_SIZE, encoded[offset:offset + PAGE_SIZE])
+
+
+def round_trip(payload, fmt, model="ntag216", stale=b""):
+    """Encode payload, write it over a tag holding stale, read it back: (payload, fmt)"""
+    encoded = encode(payload, fmt)
+    assert len(encoded) % PAGE_SIZE == 0
+    assert len(encoded) <= CAPACITY[model], f"{len(payload)} bytes as {fmt} do not fit an {model}"
+    tag = SimNtag(UID, model, data=stale)
+    pn532 = SimulatedPN532(tags=[tag])
+    write_pages(pn532, encoded)
+
+    assert pn532.read_passive_target(timeout=0.1) is not None
+    result, result_fmt, _ = read_payload(pn532, tag.user_pages)
+    return result, result_fmt
+
+
+def expected_format(payload, fmt):
+    # Compression that saves no page is stored as a plain frame and reads back as one
+    if fmt == FORMAT_COMPRESSED and encode(payload, fmt)[1] == CODEC_RAW:
+        return FORMAT_FRAMED
+    return fmt
+
+
+def random_payload(rng, size, zero_runs=False):
+    data = bytearray(rng.randrange(256) for _ in range(size))
+    if zero_runs:
+        # Runs of zeros, some spanning whole pages, anywhere including both ends
+        for _ in range(rng.randrange(1, 4)):
+            start = rng.randrange(size)
+            length = rng.randrange(1, 3 * PAGE_SIZE)
+            data[start:start + length] = bytes(len(data[start:start + length]))
+    return bytes(data)
+
+
+def payload_cases(seed):
+    rng = random.Random(seed)
+    sizes = [1, 3, 4, 5, 12, 13, 63, 64, 65, 250, 251, 252, 253, 254, 255, 256, 257, 500, 880]
+    for size in sizes:
+        yield random_payload(rng, size)
+        yield random_payload(rng, size, zero_runs=True)
+    yield bytes(64)
+    yield b"\x00" * 3 + b"\x01"
+    yield b"\x01" + b"\x00" * 40
+
+
+CASES = list(payload_cases(2025))
+
+
+@pytest.mark.parametrize("fmt", [FORMAT_FRAMED, FORMAT_COMPRESSED, FORMAT_NDEF])
+def test_binary_payloads_round_trip(fmt):
+    for payload in CASES:
+        if len(encode(payload, fmt)) > CAPACITY["ntag216"]:
+            continue
+        assert round_trip(payload, fmt) == (payload, expected_format(payload, fmt)), payload.hex()
+
+
+def test_raw_round_trips_without_zero_bytes():
+    # Raw ends at the first empty page and drops trailing zeros, so only zero-free payloads survive
+    rng = random.Random(7)
+    for size in (1, 3, 4, 5, 143, 144, 500, 888):
+        payload = bytes(rng.randrange(1, 256) for _ in range(size))
+        assert round_trip(payload, FORMAT_RAW) == (payload, FORMAT_RAW)
+    assert round_trip(b"\x01\x02\x00\x00", FORMAT_RAW) == (b"\x01\x02", FORMAT_RAW)
+
+
+def largest_fitting(fmt, capacity):
+    """Largest zero-free random payload that fits; random, so compression gains nothing"""
+    rng = random.Random(capacity)
+    payload = bytes(rng.randrange(1, 256) for _ in range(capacity))
+    while len(encode(payload, fmt)) > capacity:
+        payload = payload[:-1]
+    return payload
+
+
+@pytest.mark.parametrize("model", sorted(CAPACITY))
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_payloads_filling_user_memory_exactly(model, fmt):
+    capacity = CAPACITY[model]
+    payload = largest_fitting(fmt, capacity)
+    if fmt in (FORMAT_FRAMED, FORMAT_COMPRESSED):
+        assert len(payload) == capacity - FRAME_HEADER_SIZE
+    if fmt == FORMAT_RAW:
+        assert len(payload) == capacity
+    assert round_trip(payload, fmt, model) == (payload, expected_format(payload, fmt))
+
+
+@pytest.mark.parametrize("model", sorted(CAPACITY))
+def test_compressed_payloads_larger_than_the_tag(model):
+    payload = b"".join(b'{"serial":"%06d","status":"ok"},' % (i % 4) for i in range(200))
+    assert len(payload) > CAPACITY[model]
+    assert round_trip(payload, FORMAT_COMPRESSED, model) == (payload, FORMAT_COMPRESSED)
+
+
+@pytest.mark.parametrize("fmt", [FORMAT_FRAMED, FORMAT_COMPRESSED, FORMAT_NDEF])
+def test_shorter_payload_over_stale_data(fmt):
+    rng = random.Random(11)
+    stale = bytes(rng.randrange(1, 256) for _ in range(CAPACITY["ntag215"]))
+    payload = random_payload(rng, 100, zero_runs=True) + bytes(8)
+    assert round_trip(payload, fmt, "ntag215", stale) == (payload, expected_format(payload, fmt))
+
+
+class LiftedAfterHeader:
+    """PN532 whose tag leaves the field right after the first exchange, the header read"""
+
+    def __init__(self, pn532):
+        self._pn532 = pn532
+        self._exchanges = 0
+
+    def __getattr__(self, name):
+        return getattr(self._pn532, name)
+
+    def call_function(self, command, *args, **kwargs):
+        response = self._pn532.call_function(command, *args, **kwargs)
+        if command == 0x40:  # InDataExchange
+            self._exchanges += 1
+            if self._exchanges == 1:
+                self._pn532.remove()
+        return response
+
+
+@pytest.mark.parametrize("fmt", [FORMAT_FRAMED, FORMAT_NDEF])
+def test_tag_lifted_after_the_header_is_an_incomplete_read(fmt):
+    rng = random.Random(3)
+    payload = bytes(rng.randrange(1, 256) for _ in range(200))
+    tag = SimNtag(UID, "ntag215")
+    pn532 = SimulatedPN532(tags=[tag])
+    write_pages(pn532, encode(payload, fmt))
+
+    assert pn532.read_passive_target(timeout=0.1) is not None
+    with pytest.raises(IncompleteReadError) as e:
+        read_payload(LiftedAfterHeader(pn532), tag.user_pages)
+    assert e.value.read_bytes == 16 and e.value.total_bytes > 200
+
+
+def read_back(encoded, model="ntag215"):
+    tag = SimNtag(UID, model, data=encoded)
+    pn532 = SimulatedPN532(tags=[tag])
+    assert pn532.read_passive_target(timeout=0.1) is not None
+    return read_payload(pn532, tag.user_pages)
+
+
+def test_body_that_does_not_inflate_is_a_decode_error():
+    with pytest.raises(PayloadDecodeError):
+        read_back(encode_framed(b"\xff" * 40, CODEC_DEFLATE))
+
+    # Cut short, e.g. written by a tool that got the length wrong
+    body = zlib.compressobj(9, zlib.DEFLATED, -15, 9)
+    body = body.compress(b"abc" * 100) + body.flush()
+    with pytest.raises(PayloadDecodeError):
+        read_back(encode_framed(body[:-2], CODEC_DEFLATE))
+
+
+def test_data_that_only_looks_like_an_ndef_tlv_reads_as_raw():
+    # NDEF TLV tag and length, but no valid record behind them
+    data = bytes([0x03, 0x08, 0x01, 0x02, 0x03, 0x04, 0x05, 0x06, 0x07, 0x08])
+    assert read_back(data)[:2] == (data, FORMAT_RAW)
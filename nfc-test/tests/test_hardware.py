@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from hardware import PRIORITY_POLL, PRIORITY_READ, PRIORITY_WRITE, HardwareWorker, QueueFullError
+
+
+def blocked_worker(**kwargs):
+    """Started worker busy with a job that runs until the returned event is set"""
+    worker = HardwareWorker(**kwargs)
+    worker.start()
+    release = threading.Event()
+    running = threading.Event()
+
+    def hold():
+        running.set()
+        release.wait(5)
+
+    worker.submit(hold)
+    assert running.wait(5)
+    return worker, release
+
+
+def test_higher_priority_runs_first_fifo_within_a_priority():
+    worker, release = blocked_worker()
+    order = []
+    futures = [worker.submit(order.append, name, priority=priority) for name, priority in
+               [("poll", PRIORITY_POLL), ("read 1", PRIORITY_READ), ("write", PRIORITY_WRITE), ("read 2", PRIORITY_READ)]]
+    release.set()
+    for future in futures:
+        future.result(5)
+    worker.stop(5)
+    assert order == ["write", "read 1", "read 2", "poll"]
+
+
+def test_full_queue_rejects_jobs():
+    worker, release = blocked_worker(max_pending=2)
+    worker.submit(lambda: None)
+    worker.submit(lambda: None)
+    with pytest.raises(QueueFullError):
+        worker.submit(lambda: None)
+    assert worker.stats()["rejected"] == 1
+    release.set()
+    worker.stop(5)
+
+
+def test_jobs_with_the_same_key_share_one_result():
+    worker, release = blocked_worker()
+    calls = []
+
+    def read():
+        calls.append(1)
+        return len(calls)
+
+    first = worker.submit(read, key="read")
+    second = worker.submit(read, key="read")
+    other = worker.submit(read, key="other")
+    assert second is first
+    release.set()
+    assert first.result(5) == 1 and other.result(5) == 2
+    # Once the shared job has finished, the key starts a fresh one
+    assert worker.submit(read, key="read").result(5) == 3
+    worker.stop(5)
+    assert worker.stats()["coalesced"] == 1
+
+
+def test_stop_finishes_the_queued_jobs():
+    worker, release = blocked_worker()
+    futures = [worker.submit(lambda i=i: i, priority=PRIORITY_POLL) for i in range(5)]
+    threading.Timer(0.05, release.set).start()
+    worker.stop(5)
+    assert [future.result(0) for future in futures] == list(range(5))
+    assert worker.stats()["queue_depth"] == 0
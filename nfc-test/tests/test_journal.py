@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+from journal import IncompleteWriteError, WriteJournal, journaled_write
+from ntag import USER_START_PAGE
+from reader import ReaderUnavailableError
+from simulator import SimulatedPN532, make_tag
+
+UID = "04A1B2C3D4E5F6"
+
+
+def select(pn532):
+    uid = pn532.read_passive_target(timeout=0.1)
+    assert uid is not None
+    return uid
+
+
+def test_diff_write_skips_unchanged_pages():
+    tag = make_tag(f"ntag215:{UID}")
+    pn532 = SimulatedPN532(tags=[tag])
+    journal = WriteJournal()
+    data = os.urandom(64)
+
+    written, resumed_from = journaled_write(pn532, journal, select(pn532), USER_START_PAGE, data)
+    assert len(written) == 16 and resumed_from is None
+
+    # Same payload again: nothing to write
+    assert journaled_write(pn532, journal, select(pn532), USER_START_PAGE, data) == ([], None)
+
+    # One changed page: only that page is written
+    changed = data[:20] + bytes(4) + data[24:]
+    written, _ = journaled_write(pn532, journal, select(pn532), USER_START_PAGE, changed)
+    assert written == [USER_START_PAGE + 5]
+    assert tag.user_data()[:64] == changed
+
+
+class LiftedAfter:
+    """PN532 whose tag leaves the field after a number of page writes"""
+
+    def __init__(self, pn532, writes):
+        self._pn532 = pn532
+        self._writes = writes
+
+    def __getattr__(self, name):
+        return getattr(self._pn532, name)
+
+    def ntag2xx_write_block(self, page, data):
+        if self._writes == 0:
+            self._pn532.remove()
+        self._writes -= 1
+        return self._pn532.ntag2xx_write_block(page, data)
+
+
+def test_interrupted_write_resumes_from_the_journal(tmp_path):
+    tag = make_tag(f"ntag215:{UID}")
+    pn532 = SimulatedPN532(tags=[tag])
+    journal = WriteJournal(str(tmp_path / "journal.json"))
+    data = bytes(range(1, 65))
+
+    with pytest.raises(IncompleteWriteError) as e:
+        journaled_write(LiftedAfter(pn532, 5), journal, select(pn532), USER_START_PAGE, data)
+    assert e.value.next_page == USER_START_PAGE + 5
+
+    # Confirmed pages survive a restart through the journal file
+    journal = WriteJournal(str(tmp_path / "journal.json"))
+    pn532.present(tag)
+    written, resumed_from = journaled_write(pn532, journal, select(pn532), USER_START_PAGE, data)
+    assert resumed_from == USER_START_PAGE + 5
+    assert written == list(range(USER_START_PAGE + 5, USER_START_PAGE + 16))
+    assert tag.user_data()[:64] == data
+    assert journal.resume_page(UID, "anything") is None
+
+
+def test_driver_error_on_a_page_is_retried():
+    tag = make_tag(f"ntag215:{UID}")
+    pn532 = SimulatedPN532(tags=[tag])
+    data = bytes(range(1, 17))
+
+    uid = select(pn532)
+    pn532.fail_next(kind="i2c")
+    written, _ = journaled_write(pn532, WriteJournal(), uid, USER_START_PAGE, data, diff=False)
+    assert written == list(range(USER_START_PAGE, USER_START_PAGE + 4))
+    assert tag.user_data()[:16] == data
+
+
+class FailingWrites:
+    """PN532 whose page writes fail with error"""
+
+    def __init__(self, pn532, error):
+        self._pn532 = pn532
+        self._error = error
+
+    def __getattr__(self, name):
+        return getattr(self._pn532, name)
+
+    def ntag2xx_write_block(self, page, data):
+        raise self._error
+
+
+@pytest.mark.parametrize("error", [ReaderUnavailableError("NFC reader is recovering"), OSError(121, "Remote I/O error")])
+def test_reader_and_bus_failures_are_not_taken_for_a_lifted_tag(error):
+    pn532 = SimulatedPN532(tags=[make_tag(f"ntag215:{UID}")])
+    with pytest.raises(type(error)):
+        journaled_write(FailingWrites(pn532, error), WriteJournal(), select(pn532), USER_START_PAGE,
+                        bytes(range(1, 17)), diff=False)
+
+
+def test_unreadable_journal_is_logged_and_ignored(tmp_path, caplog):
+    path = tmp_path / "journal.json"
+    path.write_text("{not json")
+    with caplog.at_level("WARNING", logger="journal"):
+        journal = WriteJournal(str(path))
+    assert journal.resume_page(bytes.fromhex(UID), b"\x01" * 16) is None
+    assert "Ignoring unreadable write journal" in caplog.text
@@ -0,0 +1,36 @@
+import pytest
+
+from ntag import USER_START_PAGE, read_pages
+from simulator import SimNtag, SimulatedI2CError, SimulatedPN532
+
+UID = bytes.fromhex("04A1B2C3D4E5F6")
+DATA = bytes(range(1, 145))
+
+
+def selected(model):
+    pn532 = SimulatedPN532(tags=[SimNtag(UID, model, data=DATA)])
+    assert pn532.read_passive_target(timeout=0.1) is not None
+    return pn532
+
+
+def test_tag_without_fast_read_falls_back_to_read():
+    pn532 = selected("ultralight-c")
+    assert read_pages(pn532, USER_START_PAGE, 36) == DATA
+
+
+def test_naked_fast_read_is_retried_with_read_and_a_lifted_tag_reads_nothing():
+    pn532 = selected("ntag213")
+    pn532.fail_next(kind="nak")
+    frames = pn532.frames
+    assert read_pages(pn532, USER_START_PAGE, 36) == DATA
+    assert pn532.frames > frames + 2  # Went through READ after the NAKed FAST_READ
+
+    pn532.remove()
+    assert read_pages(pn532, USER_START_PAGE, 36) == b""
+
+
+def test_bus_error_is_raised_not_taken_for_a_nak():
+    pn532 = selected("ntag213")
+    pn532.fail_next(kind="i2c")
+    with pytest.raises(SimulatedI2CError):
+        read_pages(pn532, USER_START_PAGE, 36)
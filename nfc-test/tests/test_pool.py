@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import pytest
+
+from pool import ANY_READER, ReaderPool, parse_reader_specs
+
+
+def test_reader_specs_with_options():
+    specs = parse_reader_specs(" gate1=I2C , gate2=i2c:bus=3:led=27,bench=sim:tags=ntag216:mx_rty_atr=16,")
+    assert specs == [
+        ("gate1", "i2c", {}),
+        ("gate2", "i2c", {"bus": "3", "led": "27"}),
+        ("bench", "sim", {"tags": "ntag216", "mx_rty_atr": "16"}),
+    ]
+
+
+@pytest.mark.parametrize("text, message", [
+    ("gate1=i2c,gate1=sim", "must be unique"),
+    ("gate1=nfc", "Unknown backend 'nfc' for reader 'gate1'"),
+    ("gate1", "should look like name=backend"),
+    ("=i2c", "should look like name=backend"),
+    ("gate1=i2c:bus", "Reader option 'bus'"),
+])
+def test_invalid_reader_specs(text, message):
+    with pytest.raises(ValueError, match=message):
+        parse_reader_specs(text)
+
+
+def sim_pool(*names):
+    return ReaderPool([(name, "sim", {}) for name in names])
+
+
+def queue_jobs(slot, count):
+    # The worker is not started, so the jobs stay queued and count as load
+    for _ in range(count):
+        slot.hardware.submit(lambda: None)
+
+
+def test_any_prefers_a_reader_with_a_tag_then_the_least_busy():
+    pool = sim_pool("a", "b", "c")
+    a, b, c = pool
+    queue_jobs(a, 2)
+    queue_jobs(c, 1)
+    assert [pool.pick(ANY_READER) for _ in range(3)] == [b, b, b]
+
+    # A tag in the field wins over a shorter queue
+    c.tracker = SimpleNamespace(current={"uid": "04A1B2C3D4E5F6"})
+    assert pool.pick(ANY_READER) is c
+    assert pool.pick() is c
+    # Among readers with a tag, the least busy one
+    a.tracker = SimpleNamespace(current={"uid": "04112233445566"})
+    queue_jobs(c, 2)
+    assert pool.pick(ANY_READER) is a
+
+
+def test_any_rotates_between_equally_busy_readers():
+    pool = sim_pool("a", "b")
+    assert {pool.pick(ANY_READER).name for _ in range(2)} == {"a", "b"}
+
+
+def test_named_reader():
+    pool = sim_pool("a", "b")
+    assert pool.pick("b") is pool.get("b")
+    with pytest.raises(KeyError, match="Unknown reader 'x'"):
+        pool.pick("x")
@@ -0,0 +1,72 @@
+import asyncio
+import contextlib
+import io
+
+import httpx
+import pytest
+
+from rfconfig import FIELDS, RFSettings
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import main
+
+
+@pytest.mark.parametrize("values, message", [
+    ({"mx_rty_passive_activation": 16, "rety_timeout": 5}, "Unknown RF setting rety_timeout"),
+    ({"mx_rty_passive_activation": 0x100}, "between 0 and 255"),
+    ({"retry_timeout": 0x11}, "between 0 and 16"),
+    ({"retry_timeout": "fast"}, "should be a number"),
+    ({"field_off_idle": "maybe"}, "true or false"),
+    ({"default_deadline": 20, "max_deadline": 15}, "longer than max_deadline"),
+    ({"max_deadline": 5}, "longer than max_deadline"),
+])
+def test_invalid_update_changes_nothing(values, message):
+    settings = RFSettings()
+    before = settings.as_dict()
+    with pytest.raises(ValueError, match=message):
+        settings.update(values)
+    assert settings.as_dict() == before
+
+
+def test_update_converts_strings_from_the_environment():
+    settings = RFSettings(mx_rty_passive_activation="0x10", field_off_idle="on", poll_timeout="0.2")
+    assert (settings.mx_rty_passive_activation, settings.field_off_idle, settings.poll_timeout) == (16, True, 0.2)
+    assert set(settings.as_dict()) == set(FIELDS)
+
+
+def test_rf_config_endpoint_validates_and_bounds_deadlines():
+    async def run():
+        await main.startup_event()
+        original = main.pool.default.rf.as_dict()
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+                rejected = [await client.put("/config/rf", json=body) for body in (
+                    {"colour": "blue"},
+                    {"retry_timeout": 0x20},
+                    {"mx_rty_atr": -1},
+                    {"default_deadline": 30, "max_deadline": 20},
+                    [1, 2],
+                )]
+                unchanged = (await client.get("/config/rf")).json()
+
+                updated = await client.put("/config/rf", json={"default_deadline": 0.2, "max_deadline": 1})
+                too_long = await client.get("/read-pk", params={"timeout": 2})
+                within = await client.get("/uid", params={"timeout": 0.1})
+                by_default = await client.get("/uid")
+                await client.put("/config/rf", json=original)
+        finally:
+            await main.shutdown_event()
+        return original, rejected, unchanged, updated, too_long, within, by_default
+
+    original, rejected, unchanged, updated, too_long, within, by_default = asyncio.run(run())
+    assert [r.status_code for r in rejected] == [422] * 5
+    assert "Unknown RF setting colour" in rejected[0].json()["detail"]
+    assert unchanged[main.pool.default.name] == original
+
+    assert updated.status_code == 200
+    assert updated.json()[main.pool.default.name]["max_deadline"] == 1
+    assert too_long.status_code == 422 and "at most 1 seconds" in too_long.json()["detail"]
+    # Nothing in the field: both time out after their deadline rather than being refused
+    assert within.status_code == 408
+    assert by_default.status_code == 408 and "0.2 seconds" in by_default.json()["detail"]
@@ -0,0 +1,82 @@
+import contextlib
+import sqlite3
+import time
+
+from scanlog import EMPTY, OK, TIMEOUT, ScanLog
+
+UID = "04A1B2C3D4E5F6"
+OTHER_UID = "04112233445566"
+
+
+def stored_payloads(path):
+    with contextlib.closing(sqlite3.connect(path)) as db:
+        return db.execute("SELECT COUNT(*) FROM payloads").fetchone()[0]
+
+
+def test_query_filters(tmp_path):
+    scan_log = ScanLog(str(tmp_path / "scans.db"))
+    scan_log.start()
+    scan_log.record(OK, uid=UID, payload=b"\x01\x02", duration=0.03)
+    scan_log.record(TIMEOUT, duration=1.0)
+    scan_log.stop()
+    boundary = time.time()
+
+    scan_log.start()
+    scan_log.record(OK, uid=OTHER_UID, payload=b"\x03", cached=True)
+    scan_log.record(EMPTY, uid=UID)
+    scan_log.stop()
+
+    assert scan_log.written == 4
+    assert [s["outcome"] for s in scan_log.query()] == [EMPTY, OK, TIMEOUT, OK]
+    assert [s["outcome"] for s in scan_log.query(uid=UID.lower())] == [EMPTY, OK]
+    assert [s["uid"] for s in scan_log.query(since=boundary)] == [UID, OTHER_UID]
+    assert [s["uid"] for s in scan_log.query(until=boundary)] == [None, UID]
+    assert [s["uid"] for s in scan_log.query(outcome=OK)] == [OTHER_UID, UID]
+    assert [s["outcome"] for s in scan_log.query(limit=2)] == [EMPTY, OK]
+
+    first = scan_log.query(uid=UID, outcome=OK, payloads=True)[0]
+    assert first["payload"] == b"\x01\x02" and first["payload_size"] == 2
+    assert first["duration_ms"] == 30.0 and not first["cached"]
+    assert scan_log.query(uid=OTHER_UID)[0]["cached"]
+
+
+def test_payloads_are_stored_once(tmp_path):
+    path = str(tmp_path / "scans.db")
+    scan_log = ScanLog(path)
+    scan_log.start()
+    for _ in range(50):
+        scan_log.record(OK, uid=UID, payload=b"same contents")
+    scan_log.record(OK, uid=OTHER_UID, payload=b"other contents")
+    scan_log.stop()
+
+    assert scan_log.written == 51
+    assert stored_payloads(path) == 2
+    scans = scan_log.query(uid=UID, limit=1000)
+    assert len(scans) == 50 and len({s["payload_hash"] for s in scans}) == 1
+
+
+def test_compact_deletes_scans_past_retention(tmp_path):
+    path = str(tmp_path / "scans.db")
+    scan_log = ScanLog(path, retention_days=30)
+    scan_log.start()
+    scan_log.record(OK, uid=UID, payload=b"old")
+    scan_log.stop()
+    boundary = time.time()
+    scan_log.start()
+    scan_log.record(OK, uid=OTHER_UID, payload=b"new")
+    scan_log.stop()
+
+    # Nothing is older than 30 days yet
+    assert scan_log.compact() == 0
+    # 30 days after the boundary only the first scan has expired, and its payload with it
+    assert scan_log.compact(now=boundary + 30 * 86400) == 1
+    assert [s["uid"] for s in scan_log.query()] == [OTHER_UID]
+    assert stored_payloads(path) == 1
+
+
+def test_disabled_log_records_nothing():
+    scan_log = ScanLog(None)
+    scan_log.start()
+    scan_log.record(OK, uid=UID)
+    scan_log.stop()
+    assert scan_log.query() == [] and scan_log.compact() == 0
@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from simulator import SimulatedI2CError, SimulatedPN532, make_tag
+
+UID = "04A1B2C3D4E5F6"
+OTHER_UID = "DEADBEEF"
+
+
+def wait_for_field(pn532, present, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while bool(pn532.field) != present:
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_scripted_tags_arrive_and_leave():
+    pn532 = SimulatedPN532(script=[(0.05, make_tag(f"ntag215:{UID}")), (0.15, None),
+                                   (0.25, make_tag(f"classic-1k:{OTHER_UID}"))])
+    assert pn532.field == []
+    # A tag wait picks up the scripted arrival instead of timing out
+    assert bytes(pn532.read_passive_target(timeout=1)).hex().upper() == UID
+    wait_for_field(pn532, present=False)
+    assert pn532.read_passive_target(timeout=0.01) is None
+    assert bytes(pn532.read_passive_target(timeout=1)).hex().upper() == OTHER_UID
+
+
+def test_script_from_the_environment(monkeypatch):
+    monkeypatch.setenv("NFC_SIM_SCRIPT", f"0=ntag213:{UID},0.05=")
+    pn532 = SimulatedPN532.from_env()
+    assert [bytes(tag.uid).hex().upper() for tag in pn532.field] == [UID]
+    wait_for_field(pn532, present=False)
+
+
+def failing_frames(seed, frames=200):
+    pn532 = SimulatedPN532(error_rate=0.2, seed=seed)
+    failed = []
+    for frame in range(frames):
+        try:
+            pn532.firmware_version
+        except SimulatedI2CError:
+            failed.append(frame)
+    assert pn532.errors == len(failed) and pn532.frames == frames
+    return failed
+
+
+def test_seeded_error_rate_is_reproducible():
+    failed = failing_frames(seed=42)
+    assert failing_frames(seed=42) == failed
+    assert failing_frames(seed=43) != failed
+    assert 20 <= len(failed) <= 60
+
+
+def test_injected_failures_hit_the_next_frames_only():
+    pn532 = SimulatedPN532(tags=[make_tag(f"ntag215:{UID}")])
+    pn532.fail_next(2)
+    for _ in range(2):
+        with pytest.raises(SimulatedI2CError):
+            pn532.firmware_version
+    assert pn532.firmware_version == (0x32, 0x01, 0x06, 0x07)
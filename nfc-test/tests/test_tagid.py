@@ -0,0 +1,70 @@
+import pytest
+
+from framing import FORMAT_FRAMED, encode, read_payload
+from simulator import SimNtag, SimulatedI2CError, SimulatedPN532, make_tag
+from tagid import TagIdentifier, TargetView, identify, select_target, select_targets
+
+UID = "04A1B2C3D4E5F6"
+
+
+def test_bus_error_during_get_version_propagates_and_is_not_cached():
+    pn532 = SimulatedPN532(tags=[make_tag(f"ntag215:{UID}")])
+    tag_ids = TagIdentifier()
+
+    target = select_target(pn532)
+    pn532.fail_next(kind="i2c")
+    with pytest.raises(SimulatedI2CError):
+        tag_ids.identify(pn532, target)
+
+    info = tag_ids.identify(pn532, select_target(pn532))
+    assert (info.tag_type, info.user_bytes) == ("NTAG215", 504)
+
+
+def test_capability_container_guess_is_probed_again():
+    pn532 = SimulatedPN532(tags=[make_tag(f"ntag215:{UID}")])
+    tag_ids = TagIdentifier()
+
+    # A lost GET_VERSION answer looks like an original Ultralight; the CC then reads as Ultralight C
+    target = select_target(pn532)
+    pn532.fail_next(kind="nak")
+    info = tag_ids.identify(pn532, target)
+    assert info.family == "ultralight" and info.version is None
+
+    info = tag_ids.identify(pn532, select_target(pn532))
+    assert (info.tag_type, info.user_bytes) == ("NTAG215", 504)
+
+    # Now known from GET_VERSION: served from the cache without a frame
+    frames = pn532.frames
+    assert tag_ids.identify(pn532, select_target(pn532)) is info
+    assert pn532.frames == frames + 1  # Just the InListPassiveTarget of select_target
+
+
+def test_two_tags_in_the_field_are_read_in_one_session():
+    ntag = SimNtag(bytes.fromhex(UID), "ntag215", data=encode(b"first tag", FORMAT_FRAMED))
+    ultralight = SimNtag(bytes.fromhex("04112233445566"), "ultralight-c", data=encode(b"second tag", FORMAT_FRAMED))
+    pn532 = SimulatedPN532(tags=[ntag, ultralight])
+
+    targets = select_targets(pn532)
+    assert [(t.tg, bytes(t.uid)) for t in targets] == [(1, ntag.uid), (2, ultralight.uid)]
+    payloads = []
+    for target in targets:
+        view = TargetView(pn532, target)
+        assert view.activate()
+        info = identify(view, target)
+        payloads.append(read_payload(view, info.user_pages)[0])
+    assert payloads == [b"first tag", b"second tag"]
+
+
+def test_second_tag_is_followed_to_its_new_target_number():
+    ntag = SimNtag(bytes.fromhex(UID), "ntag215")
+    ultralight = SimNtag(bytes.fromhex("04112233445566"), "ultralight-c", data=encode(b"second tag", FORMAT_FRAMED))
+    pn532 = SimulatedPN532(tags=[ntag, ultralight])
+    second = select_targets(pn532)[1]
+    view = TargetView(pn532, second)
+    assert view.activate()
+
+    # The first tag leaves; re-selecting after a NAK finds the second one as target 1
+    pn532.present(ultralight)
+    pn532.fail_next(kind="nak")
+    assert read_payload(view, 36)[0] == b"second tag"
+    assert view.tg == 1
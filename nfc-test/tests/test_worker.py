@@ -0,0 +1,44 @@
+import asyncio
+import contextlib
+import io
+import time
+
+import httpx
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import main
+
+
+def test_root_latency_stays_flat_while_reads_are_pending():
+    """PN532 calls run on the worker thread, so waiting reads do not block the event loop"""
+
+    async def run():
+        await main.startup_event()
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+                # Nothing in the field: each read holds the worker for its whole timeout.
+                # Different timeouts keep them from being coalesced into one job
+                reads = [asyncio.create_task(client.get("/read-pk", params={"timeout": 0.1 + i / 100}))
+                         for i in range(10)]
+                await asyncio.sleep(0.05)
+
+                latencies = []
+                for _ in range(20):
+                    start = time.perf_counter()
+                    response = await client.get("/")
+                    latencies.append(time.perf_counter() - start)
+                    assert response.status_code == 200
+                pending = sum(not read.done() for read in reads)
+                responses = await asyncio.gather(*reads)
+        finally:
+            await main.shutdown_event()
+        return latencies, pending, responses
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        latencies, pending, responses = asyncio.run(run())
+
+    assert pending >= 9
+    assert [r.status_code for r in responses] == [408] * 10
+    # The reads take over a second on the worker; "/" never waits for them
+    assert max(latencies) < 0.05
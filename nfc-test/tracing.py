@@ -0,0 +1,180 @@
+"""Operation tracing into a ring buffer, and the log level for per-block output.
+
+An operation is one API request (or one presence-tracker prefetch) and
+holds the spans recorded while it ran: tag detection, identification,
+each bulk read and page write, LED switching and building the response.
+Timestamps come from time.perf_counter(), so span durations are exact
+even when the wall clock is adjusted:
+
+    with operation("read-pk", reader="gate1"):
+        with span("detect"):
+            target = detector.wait(timeout)
+
+The current operation lives in a ContextVar. hardware.HardwareWorker runs
+each job in the context it was submitted from, so spans recorded on a
+reader's worker thread land in the request that queued the job. span()
+outside an operation does nothing. The last CAPACITY operations are kept
+and served by main.py at /debug/trace, as JSON or in the Chrome trace
+event format (load it in chrome://tracing or ui.perfetto.dev).
+
+NFC_TRACE=0 turns tracing off. Per-block lines go through the "nfc"
+logger at DEBUG; NFC_LOG_LEVEL=DEBUG shows them.
+"""
+import collections
+import contextlib
+import contextvars
+import itertools
+import logging
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("NFC_TRACE", "1").strip().lower() not in ("0", "false", "no", "off")
+CAPACITY = int(os.environ.get("NFC_TRACE_CAPACITY", "256"))
+LOG_LEVEL_ENV = "NFC_LOG_LEVEL"
+
+log = logging.getLogger("nfc")
+
+_current = contextvars.ContextVar("nfc_operation", default=None)
+_ids = itertools.count(1)
+_lock = threading.Lock()
+_finished = collections.deque(maxlen=CAPACITY)
+
+
+def setup_logging():
+    """Log to stderr at NFC_LOG_LEVEL (default INFO), message only like the prints around it
+
+    The level goes on the root logger, so it covers the module loggers
+    (main, scanlog) as well as "nfc".
+    """
+    level = os.environ.get(LOG_LEVEL_ENV, "INFO").strip().upper()
+    logging.basicConfig(format="%(message)s")
+    value = logging.getLevelName(level)  # The number for known names
+    logging.getLogger().setLevel(value if isinstance(value, int) else logging.INFO)
+
+
+class Operation:
+    """One traced request; spans are (name, start, end, attrs) tuples"""
+
+    def __init__(self, name, attrs):
+        self.id = next(_ids)
+        self.name = name
+        self.attrs = attrs
+        self.wall_time = time.time()
+        self.start = time.perf_counter()
+        self.end = None
+        self.spans = []  # Appended from the event loop and the worker thread
+
+    def as_dict(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return {
+            "id": self.id,
+            "name": self.name,
+            "started_at": self.wall_time,
+            "duration_ms": round((end - self.start) * 1000, 3),
+            **self.attrs,
+            "spans": [
+                {"name": name, "start_ms": round((start - self.start) * 1000, 3),
+                 "duration_ms": round((stop - start) * 1000, 3), **attrs}
+                for name, start, stop, attrs in sorted(self.spans, key=lambda s: s[1])
+            ],
+        }
+
+    def chrome_events(self):
+        """Complete ("X") events on one row per operation, times in microseconds"""
+        end = self.end if self.end is not None else time.perf_counter()
+        row = f"{self.name} #{self.id}"
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": self.id, "args": {"name": row}},
+            {"name": self.name, "cat": "operation", "ph": "X", "pid": 1, "tid": self.id,
+             "ts": round(self.start * 1e6, 1), "dur": round((end - self.start) * 1e6, 1), "args": self.attrs},
+        ]
+        for name, start, stop, attrs in self.spans:
+            events.append({"name": name, "cat": "span", "ph": "X", "pid": 1, "tid": self.id,
+                           "ts": round(start * 1e6, 1), "dur": round((stop - start) * 1e6, 1), "args": attrs})
+        return events
+
+
+@contextlib.contextmanager
+def operation(name, keep_empty=True, **attrs):
+    """Record the with-block as an Operation; without spans it is dropped unless keep_empty"""
+    if not ENABLED:
+        yield None
+        return
+    op = Operation(name, attrs)
+    token = _current.set(op)
+    try:
+        yield op
+    finally:
+        _current.reset(token)
+        op.end = time.perf_counter()
+        if op.spans or keep_empty:
+            with _lock:
+                _finished.append(op)
+
+
+class _Span:
+    __slots__ = ("_op", "_name", "_attrs", "_start")
+
+    def __init__(self, op, name, attrs):
+        self._op = op
+        self._name = name
+        self._attrs = attrs
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        attrs = self._attrs
+        if exc_type is not None:
+            attrs = dict(attrs, error=exc_type.__name__)
+        self._op.spans.append((self._name, self._start, time.perf_counter(), attrs))
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, **attrs):
+    """Time the with-block as a span of the current operation (a no-op without one)"""
+    op = _current.get()
+    if op is None:
+        return _NO_SPAN
+    return _Span(op, name, attrs)
+
+
+def record(name, start, end, **attrs):
+    """Add a span measured elsewhere (perf_counter start and end) to the current operation"""
+    op = _current.get()
+    if op is not None:
+        op.spans.append((name, start, end, attrs))
+
+
+def annotate(**attrs):
+    """Add attributes to the current operation, e.g. the UID once it is known"""
+    op = _current.get()
+    if op is not None:
+        op.attrs.update(attrs)
+
+
+def recent(limit=None):
+    """The last limit finished operations, oldest first"""
+    with _lock:
+        ops = list(_finished)
+    return ops[-limit:] if limit else ops
+
+
+def chrome_trace(ops):
+    """ops as a Chrome trace event JSON object"""
+    return {"traceEvents": [event for op in ops for event in op.chrome_events()], "displayTimeUnit": "ms"}
@@ -1,19 +1,38 @@
-import board
-import busio
-from digitalio import DigitalInOut
-from adafruit_pn532.i2c import PN532_I2C
-import RPi.GPIO as GPIO
-import time
+import argparse
+import os
+
+from detect import open_detector
+from framing import FORMAT_FRAMED, FORMATS, encode
+from journal import IncompleteWriteError, WriteJournal, journaled_write
+from ntag import PAGE_SIZE, USER_START_PAGE
+from reader import open_gpio, open_pn532
+from status_led import BUSY, ERROR, SUCCESS, StatusLed
+from tracing import log, setup_logging
 
 LED_PIN = 17  # GPIO pin connected to LED
 
-# Initialize I2C communication
-i2c = busio.I2C(board.SCL, board.SDA)
-pn532 = PN532_I2C(i2c, debug=False)
+# Per-block lines are logged at DEBUG, NFC_LOG_LEVEL=DEBUG shows them
+setup_logging()
+
+parser = argparse.ArgumentParser(description="Write a hex string to an NTAG2xx tag")
+parser.add_argument("--format", choices=FORMATS, default=FORMAT_FRAMED,
+                    help="framed: 4-byte length header, compressed: framed and deflated if that saves pages, "
+                         "ndef: NDEF message, raw: zero padded (default: framed)")
+args = parser.parse_args()
 
+# Initialize the PN532 (I2C, or the simulator with NFC_BACKEND=sim)
+pn532 = open_pn532()
+
+GPIO = open_gpio()
 GPIO.setmode(GPIO.BCM)  # Use BCM GPIO numbering
 GPIO.setup(LED_PIN, GPIO.OUT)  # Set pin as output
 
+# Heartbeat while idle, solid while a tag is handled, blink codes for the outcome
+led = StatusLed(GPIO, LED_PIN)
+
+# Wait for tags on the PN532 IRQ line when NFC_IRQ_PIN is set, polling otherwise
+detector = open_detector(pn532, GPIO)
+
 # Get firmware version
 ic, ver, rev, support = pn532.firmware_version
 print(f"Found PN532 with firmware version: {ver}.{rev}")
@@ -21,6 +40,9 @@ print(f"Found PN532 with firmware version: {ver}.{rev}")
 # Configure PN532 to read RFID/NFC tags
 pn532.SAM_configuration()
 
+# Progress of interrupted writes, so re-presenting the tag resumes them
+journal = WriteJournal(os.path.join(os.path.dirname(os.path.abspath(__file__)), "write-pk.journal.json"))
+
 # Prompt user for hex string input
 print("Enter the hex string to write to NFC tag:")
 hex_string = input("Hex string: ").strip()
@@ -42,50 +64,47 @@ except ValueError as e:
     print("Please ensure the string contains only valid hexadecimal characters (0-9, a-f, A-F)")
     exit(1)
 
-# Ensure data is padded to a multiple of 4 bytes for NFC writing
-if len(data_bytes) % 4 != 0:
-    padding = 4 - (len(data_bytes) % 4)
-    data_bytes = data_bytes + (b'\x00' * padding)
-    print(f"Padded to {len(data_bytes)} bytes with {padding} null bytes")
+# Add the length header / NDEF TLV and pad to a multiple of 4 bytes for NFC writing
+data_bytes = encode(data_bytes, args.format)
+print(f"Encoded as {args.format}: {len(data_bytes)} bytes")
 
 print("Waiting for an NFC tag...")
 
 while True:
-    uid = pn532.read_passive_target(timeout=0.5)
+    target = detector.wait(timeout=0.5)
+    uid = target.uid if target else None
     if uid:
         print(f"Found NFC card with UID: {uid.hex().upper()}")
-        GPIO.output(LED_PIN, GPIO.HIGH)
-        time.sleep(1)
+        led.set(BUSY)
 
         try:
-            # Write in 4-byte chunks
+            # Write in 4-byte chunks, only the blocks that differ from the tag, then verify
             total_blocks = len(data_bytes) // 4
             print(f"Writing {len(data_bytes)} bytes in {total_blocks} blocks...")
+            written, resumed_from = journaled_write(pn532, journal, uid, USER_START_PAGE, data_bytes, diff=True)
+            if resumed_from is not None:
+                print(f"Resumed an interrupted write at block {resumed_from}")
             
-            for i in range(0, len(data_bytes), 4):
-                block_number = 4 + (i // 4)  # Start at block 4, increment every 4 bytes
-                chunk = data_bytes[i:i+4]
-                # Get the original hex string chunk (preserving case)
-                start_pos = i * 2
-                end_pos = (i + 4) * 2
-                original_chunk = hex_string[start_pos:end_pos] if end_pos <= len(hex_string) else hex_string[start_pos:]
-                print(f"Writing to block {block_number}: {original_chunk}")
-                pn532.ntag2xx_write_block(block_number, chunk)
-
-            print("Write successful! Hex string written to NFC tag.")
+            for block_number in written:
+                start_pos = (block_number - USER_START_PAGE) * PAGE_SIZE
+                log.debug("Wrote block %d: %s", block_number, data_bytes[start_pos:start_pos + PAGE_SIZE].hex())
+            print(f"{len(written)} blocks written, {total_blocks - len(written)} unchanged")
+
+            if written:
+                print("Write successful! Hex string written to NFC tag.")
+            else:
+                print("Tag already contains this hex string, nothing written.")
             print("Remove the NFC tag.")
+            led.set(SUCCESS)
             
+        except IncompleteWriteError as e:
+            print(f"Write interrupted: {e}. Present the same tag again to resume from block {e.next_page}.")
+            led.set(ERROR)
         except Exception as e:
             print(f"Error writing to NFC tag: {e}")
-        
-        GPIO.output(LED_PIN, GPIO.LOW)
+            led.set(ERROR)
         
         # Wait for card to be removed before starting next cycle
         print("Waiting for card to be removed...")
-        while True:
-            check_uid = pn532.read_passive_target(timeout=0.5)
-            if not check_uid:
-                print("Card removed! Ready for next tag.")
-                time.sleep(1)  # Brief pause before starting next cycle
-                break
-            time.sleep(0.2)  # Small delay before checking again
+        detector.wait_removed()
+        print("Card removed! Ready for next tag.")
@@ -1,19 +1,26 @@
-import board
-import busio
-from digitalio import DigitalInOut
-from adafruit_pn532.i2c import PN532_I2C
-import RPi.GPIO as GPIO
-import time
+from detect import open_detector
+from reader import open_gpio, open_pn532
+from status_led import BUSY, SUCCESS, StatusLed
+from tracing import log, setup_logging
 
 LED_PIN = 17  # GPIO pin connected to LED
 
-# Initialize I2C communication
-i2c = busio.I2C(board.SCL, board.SDA)
-pn532 = PN532_I2C(i2c, debug=False)
+# Per-block lines are logged at DEBUG, NFC_LOG_LEVEL=DEBUG shows them
+setup_logging()
 
+# Initialize the PN532 (I2C, or the simulator with NFC_BACKEND=sim)
+pn532 = open_pn532()
+
+GPIO = open_gpio()
 GPIO.setmode(GPIO.BCM)  # Use BCM GPIO numbering
 GPIO.setup(LED_PIN, GPIO.OUT)  # Set pin as output
 
+# Heartbeat while idle, solid while a tag is handled, blink codes for the outcome
+led = StatusLed(GPIO, LED_PIN)
+
+# Wait for tags on the PN532 IRQ line when NFC_IRQ_PIN is set, polling otherwise
+detector = open_detector(pn532, GPIO)
+
 # Get firmware version
 ic, ver, rev, support = pn532.firmware_version
 print(f"Found PN532 with firmware version: {ver}.{rev}")
@@ -33,28 +40,23 @@ if len(data_bytes) % 4 != 0:
 print("Waiting for an NFC tag...")
 
 while True:
-    uid = pn532.read_passive_target(timeout=0.5)
+    target = detector.wait(timeout=0.5)
+    uid = target.uid if target else None
     if uid:
         print(f"Found NFC card with UID: {uid.hex().upper()}")
-        GPIO.output(LED_PIN, GPIO.HIGH)
-        time.sleep(1)
+        led.set(BUSY)
 
         # Write in 4-byte chunks
         for i in range(0, len(data_bytes), 4):
             block_number = 4 + (i // 4)  # Start at block 4, increment every 4 bytes
             chunk = data_bytes[i:i+4]
-            print(f"Writing to block {block_number}: {chunk}")
+            log.debug("Writing to block %d: %s", block_number, chunk)
             pn532.ntag2xx_write_block(block_number, chunk)
 
         print("Write successful! Remove the NFC tag.")
-        GPIO.output(LED_PIN, GPIO.LOW)
+        led.set(SUCCESS)
         
         # Wait for card to be removed before starting next cycle
         print("Waiting for card to be removed...")
-        while True:
-            check_uid = pn532.read_passive_target(timeout=0.5)
-            if not check_uid:
-                print("Card removed! Ready for next tag.")
-                time.sleep(1)  # Brief pause before starting next cycle
-                break
-            time.sleep(0.2)  # Small delay before checking again
\ No newline at end of file
+        detector.wait_removed()
+        print("Card removed! Ready for next tag.")
\ No newline at end of file